@@ -0,0 +1,105 @@
+# -*- code: utf-8 -*-
+"""
+This module provides asyncio helpers for executing commands on many nodes.
+
+The SSH transport is blocking, hence the commands are offloaded to a thread
+pool and awaited from the event loop. A semaphore bounds the number of
+commands in flight so that large clusters do not exhaust the SSH sessions.
+The pool threads inherit the deadline and the command metrics test binding of
+the thread running the event loop.
+
+run_on_nodes can be called from synchronous code only, when an event loop is
+already running in the calling thread the commands are executed by a plain
+thread pool instead.
+
+Example::
+
+    async def sweep(nodes):
+        uptime = await nodes[0].aexec(cmd="uptime")
+        return await gather_on_nodes(nodes, "ceph -s", limit=8, sudo=True)
+
+    results = run_on_nodes(nodes, "rpm -qa | grep ceph", limit=10)
+    for shortname, (out, err) in results.items():
+        ...
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from ceph.command_metrics import COMMAND_METRICS
+from utility.poll import propagate
+
+DEFAULT_LIMIT = 16
+
+
+async def aexec(node, executor=None, **kw):
+    """Execute the command on the node without blocking the event loop.
+
+    Args:
+        node: object providing exec_command (CephNode, CephObject, ...).
+        executor: concurrent.futures executor to use, default loop executor if None.
+        kw: exec_command arguments.
+
+    Returns:
+        exec_command result
+    """
+    loop = asyncio.get_running_loop()
+    _fun = COMMAND_METRICS.propagate(propagate(partial(node.exec_command, **kw)))
+    return await loop.run_in_executor(executor, _fun)
+
+
+async def gather_on_nodes(
+    nodes, cmd, limit=DEFAULT_LIMIT, return_exceptions=False, **kw
+):
+    """Execute the command on all the nodes concurrently.
+
+    Args:
+        nodes: list of objects providing exec_command.
+        cmd: command to be executed.
+        limit: maximum number of commands executing at the same time.
+        return_exceptions: return the exceptions as results instead of raising
+        kw: additional exec_command arguments.
+
+    Returns:
+        dict of node shortname and exec_command result in the order of nodes
+    """
+    semaphore = asyncio.Semaphore(limit)
+    executor = ThreadPoolExecutor(max_workers=limit)
+
+    async def _exec(node):
+        async with semaphore:
+            return await aexec(node, executor=executor, cmd=cmd, **kw)
+
+    try:
+        results = await asyncio.gather(
+            *[_exec(node) for node in nodes], return_exceptions=return_exceptions
+        )
+    finally:
+        # Waiting for the threads here would block the event loop
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return {node.shortname: result for node, result in zip(nodes, results)}
+
+
+def _run_in_threads(nodes, cmd, limit=DEFAULT_LIMIT, **kw):
+    """Executes the command on all the nodes using a thread pool, no event loop."""
+    with ThreadPoolExecutor(max_workers=limit) as executor:
+        futures = [
+            executor.submit(
+                COMMAND_METRICS.propagate(propagate(node.exec_command)), cmd=cmd, **kw
+            )
+            for node in nodes
+        ]
+        return {node.shortname: f.result() for node, f in zip(nodes, futures)}
+
+
+def run_on_nodes(nodes, cmd, limit=DEFAULT_LIMIT, **kw):
+    """Blocking wrapper of gather_on_nodes for synchronous callers."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(gather_on_nodes(nodes, cmd, limit=limit, **kw))
+
+    # asyncio.run cannot nest in a running event loop
+    return _run_in_threads(nodes, cmd, limit=limit, **kw)
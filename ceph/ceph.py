@@ -3,13 +3,21 @@
 import base64
 import codecs
 import datetime
+import io
 import json
+import mmap
 import os
 import pickle
 import random
 import re
+import select
+import shlex
 import socket
 import subprocess
+import tempfile
+import threading
+import uuid
+from collections import deque
 from time import sleep, time
 
 import cryptography
@@ -18,7 +26,15 @@ import requests
 import yaml
 from looseversion import LooseVersion
 
+from ceph.async_exec import aexec
+from ceph.command_metrics import COMMAND_METRICS
 from ceph.parallel import parallel
+from ceph.remote_agent import (
+    RemoteAgent,
+    RemoteAgentError,
+    RemoteAgentTimeout,
+    RemoteAgentUnavailable,
+)
 from cli.ceph.ceph import Ceph as CephCli
 from utility import lvm_utils
 from utility.log import Log
@@ -26,6 +42,8 @@ from utility.utils import custom_ceph_config
 
 logger = Log(__name__)
 
+BATCH_MARKER = "__CEPHCI_BATCH_{}__"
+
 
 class SocketTimeoutException(Exception):
     pass
@@ -699,6 +717,18 @@ class Ceph(object):
             logger.info("All osds are up and in")
             return 0
 
+    def watcher(self, **kw):
+        """
+        Returns the background watcher streaming the state of the cluster
+        Args:
+            **kw: ClusterWatcher options used when the watcher is started
+        Returns:
+            ClusterWatcher
+        """
+        from ceph.cluster_watcher import get_watcher
+
+        return get_watcher(self, **kw)
+
     def check_health(self, rhbuild, cluster_name=None, client=None, timeout=300):
         """
         Check if ceph is in healthy state
@@ -719,29 +749,37 @@ class Ceph(object):
                 else self.get_ceph_object("mon")
             )
 
-        timeout = datetime.timedelta(seconds=timeout)
-        starttime = datetime.datetime.now()
-        pending_states = ["peering", "activating", "creating"]
-        valid_states = ["active+clean"]
-
-        out = str()
-        while datetime.datetime.now() - starttime <= timeout:
-            cmd = "ceph -s"
-            if cluster_name is not None:
-                cmd += f" --cluster {cluster_name}"
-            if pacific:
-                cmd = f"cephadm shell -- {cmd}"
-
-            out, _ = client.exec_command(cmd=cmd, sudo=True)
-
-            if not any(state in out for state in pending_states):
-                if all(state in out for state in valid_states):
-                    break
-            sleep(5)
-        logger.info(out)
-        if not all(state in out for state in valid_states):
-            logger.error("Valid States are not found in the health check")
-            return 1
+        if pacific and cluster_name is None:
+            # The watcher streams the status instead of a ceph -s per poll
+            watcher = self.watcher()
+            if not watcher.await_pgs_clean(timeout=timeout):
+                logger.error("Valid States are not found in the health check")
+                return 1
+            out = str(watcher.state.health)
+        else:
+            timeout = datetime.timedelta(seconds=timeout)
+            starttime = datetime.datetime.now()
+            pending_states = ["peering", "activating", "creating"]
+            valid_states = ["active+clean"]
+
+            out = str()
+            while datetime.datetime.now() - starttime <= timeout:
+                cmd = "ceph -s"
+                if cluster_name is not None:
+                    cmd += f" --cluster {cluster_name}"
+                if pacific:
+                    cmd = f"cephadm shell -- {cmd}"
+
+                out, _ = client.exec_command(cmd=cmd, sudo=True)
+
+                if not any(state in out for state in pending_states):
+                    if all(state in out for state in valid_states):
+                        break
+                sleep(5)
+            logger.info(out)
+            if not all(state in out for state in valid_states):
+                logger.error("Valid States are not found in the health check")
+                return 1
 
         self.osd_check(client, rhbuild=rhbuild, cluster_name=cluster_name)
 
@@ -1183,6 +1221,37 @@ def check_timeout(end_time, timeout):
         raise TimeoutException("Command exceed the allocated execution time.")
 
 
+def wait_for_channel(channel, end_time, timeout, interval=1.0):
+    """Blocks until the channel has data to read or the command has exited.
+
+    The paramiko channel exposes a file descriptor that becomes readable when
+    stdout/stderr data arrives or the remote end closes the stream, hence the
+    caller is woken up as soon as there is something to process instead of
+    sleeping for a fixed interval.
+
+    Args:
+      channel: the paramiko.Channel object to be watched.
+      end_time: maximum allocated time for the command execution.
+      timeout: Flag to check if timeout must be enforced.
+      interval: upper bound in seconds for a single wait. Default is 1 second.
+    """
+    if channel.recv_ready() or channel.recv_stderr_ready():
+        return
+
+    _wait = interval
+    if timeout and end_time:
+        _remaining = (end_time - datetime.datetime.now()).total_seconds()
+        _wait = max(0, min(interval, _remaining))
+
+    # Once EOF is received the descriptor stays readable, wait for the exit
+    # status instead of spinning on select.
+    if channel.eof_received:
+        channel.status_event.wait(_wait)
+        return
+
+    select.select([channel], [], [], _wait)
+
+
 def read_stream(channel, end_time, timeout, stderr=False, log=True):
     """Reads the data from the given channel.
 
@@ -1221,6 +1290,264 @@ def read_stream(channel, end_time, timeout, stderr=False, log=True):
         return _output.decode("utf-8", errors="replace")  # Fallback to safe decode
 
 
+class CommandStream(object):
+    """Iterator over the output of a remote command as it arrives.
+
+    Data is read from the channel only when the consumer asks for the next
+    item, hence a slow consumer applies backpressure on the remote command
+    through the SSH flow control window. Memory usage is bounded by
+    max_line_bytes for stdout and max_stderr_bytes for the tail of stderr.
+
+    The exit status is available once the iteration completes. close() can be
+    called from any thread, the iteration stops at its next step.
+
+    Example::
+
+        stream = node.exec_stream(cmd="ceph -w", timeout=300)
+        for line in stream:
+            if "HEALTH_OK" in line:
+                stream.close()
+        print(stream.exit_status, stream.stderr)
+    """
+
+    def __init__(
+        self,
+        channel,
+        cmd,
+        timeout=None,
+        chunks=False,
+        check_ec=False,
+        max_line_bytes=1048576,
+        max_stderr_bytes=1048576,
+        chunk_size=32768,
+        release=None,
+    ):
+        """Initialize the stream.
+
+        Args:
+          channel: the paramiko.Channel on which the command is executing.
+          cmd: the command being executed.
+          timeout: maximum allowed execution time, None for no limit.
+          chunks: yield raw byte chunks instead of decoded lines.
+          check_ec: raise CommandFailed at the end for non-zero exit status.
+          max_line_bytes: longer lines are yielded in pieces of this size.
+          max_stderr_bytes: only the tail of stderr up to this size is kept.
+          chunk_size: maximum bytes read from the channel at once.
+          release: callable closing the channel, defaults to channel.close.
+        """
+        self.cmd = cmd
+        self.exit_status = None
+        self._channel = channel
+        self._timeout = timeout
+        self._chunks = chunks
+        self._check_ec = check_ec
+        self._max_line = max_line_bytes
+        self._max_stderr = max_stderr_bytes
+        self._chunk_size = chunk_size
+        self._release = release
+        self._closed = threading.Event()
+        self._release_lock = threading.Lock()
+        self._stderr = bytearray()
+        self._iter = self._read()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._iter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def stderr(self):
+        """Returns the tail of stderr received so far."""
+        return self._stderr.decode("utf-8", errors="replace")
+
+    @property
+    def closed(self):
+        return self._closed.is_set()
+
+    def close(self):
+        """Stops reading and closes the channel.
+
+        The generator is not closed here, it may be executing in another
+        thread. Closing the channel wakes it up and it returns on its own.
+        """
+        self._closed.set()
+        self._close_channel()
+
+    def _close_channel(self):
+        with self._release_lock:
+            release, self._release = self._release, None
+            if release:
+                release(self._channel)
+            elif not self._channel.closed:
+                self._channel.close()
+
+    def _read_stderr(self):
+        self._stderr.extend(self._channel.recv_stderr(self._chunk_size))
+        if len(self._stderr) > self._max_stderr:
+            del self._stderr[: len(self._stderr) - self._max_stderr]
+
+    def _read(self):
+        channel = self._channel
+        end_time = None
+        if self._timeout:
+            end_time = datetime.datetime.now() + datetime.timedelta(
+                seconds=self._timeout
+            )
+
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        pending = bytearray()
+        try:
+            while True:
+                if self.closed:
+                    return
+
+                # Checked on every step, a command printing without pause
+                # must still time out
+                check_timeout(end_time, self._timeout)
+
+                if channel.recv_stderr_ready():
+                    self._read_stderr()
+
+                if channel.recv_ready():
+                    data = channel.recv(self._chunk_size)
+                    if self._chunks:
+                        yield data
+                        continue
+
+                    pending.extend(data)
+                    start = 0
+                    idx = pending.find(b"\n")
+                    while idx >= 0:
+                        yield decoder.decode(pending[start:idx])
+                        start = idx + 1
+                        idx = pending.find(b"\n", start)
+                    del pending[:start]
+
+                    if len(pending) >= self._max_line:
+                        yield decoder.decode(pending)
+                        pending.clear()
+                    continue
+
+                if channel.eof_received and channel.exit_status_ready():
+                    if not channel.recv_stderr_ready():
+                        break
+
+                wait_for_channel(channel, end_time, self._timeout)
+
+            if pending and not self.closed:
+                yield decoder.decode(pending, final=True)
+        except TimeoutException as tex:
+            self._close_channel()
+            logger.error("%s failed to execute within %ds.", self.cmd, self._timeout)
+            raise CommandFailed(tex)
+
+        self.exit_status = channel.recv_exit_status()
+        self._close_channel()
+        if self._check_ec and self.exit_status != 0:
+            raise CommandFailed(
+                f"{self.cmd} returned {self.stderr} and code {self.exit_status}"
+            )
+
+
+class SpooledOutput(object):
+    """Command output kept in memory up to a size and spilled to disk after.
+
+    The object mimics the parts of the str API used by the callers to check
+    the output and provides file, mmap, line and json accessors, so that huge
+    outputs are never duplicated in memory.
+
+    Example::
+
+        out, _ = node.exec_command(cmd="ceph pg dump -f json", spool_size=2**24)
+        pg_dump = out.json()
+    """
+
+    def __init__(self, max_size=16777216):
+        """Initialize the output.
+
+        Args:
+          max_size: bytes kept in memory before the data is spilled to disk.
+        """
+        self.file = tempfile.SpooledTemporaryFile(max_size=max_size)
+        self.max_size = max_size
+        self.size = 0
+        self._spilled = False
+
+    def __str__(self):
+        return f"<SpooledOutput {self.size} bytes>"
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def spilled(self):
+        """Returns True when the data has been written to disk."""
+        return self._spilled
+
+    def write(self, data):
+        self.file.write(data)
+        self.size += len(data)
+        # SpooledTemporaryFile rolls over once its size exceeds max_size
+        if self.size > self.max_size:
+            self._spilled = True
+
+    def seek(self, offset=0):
+        self.file.seek(offset)
+        return self.file
+
+    def isspace(self, chunk_size=65536):
+        """Same as str.isspace without loading the whole output."""
+        if not self.size:
+            return False
+
+        self.seek()
+        for chunk in iter(lambda: self.file.read(chunk_size), b""):
+            if chunk.strip():
+                return False
+
+        return True
+
+    def text(self):
+        """Returns the complete output as a string."""
+        return self.seek().read().decode("utf-8", errors="replace")
+
+    def lines(self):
+        """Yields the decoded lines without line terminator."""
+        for line in self.seek():
+            yield line.decode("utf-8", errors="replace").rstrip("\n")
+
+    def mmap(self):
+        """Returns a read-only memory map of the output spilling it if required.
+
+        An empty output cannot be mapped, empty bytes are returned instead.
+        """
+        if not self.size:
+            return b""
+
+        self.file.rollover()
+        self._spilled = True
+        self.file.flush()
+        return mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def json(self, **kwargs):
+        """Parses the output as a JSON document read from the file."""
+        reader = io.TextIOWrapper(self.seek(), encoding="utf-8", errors="replace")
+        try:
+            return json.load(reader, **kwargs)
+        finally:
+            reader.detach()
+
+    def close(self):
+        self.file.close()
+
+
 class RolesContainer(object):
     """
     Container for single or multiple node roles.
@@ -1295,6 +1622,18 @@ class NodeVolume(object):
 
 
 class SSHConnectionManager(object):
+    """Manages the SSH connections of a user to a node.
+
+    Command channels are opened using open_channel which spreads them over at
+    most pool_size transports with up to max_channels channels each, so that
+    concurrent callers never exceed the sshd MaxSessions limit. Callers wait
+    in FIFO order when all the transports are busy.
+
+    Long-lived channels like the remote agent, the persistent cephadm shells
+    and the streams of the cluster watcher are opened the same way, hence they
+    hold a slot for as long as they are open.
+    """
+
     def __init__(
         self,
         ip_address,
@@ -1304,6 +1643,9 @@ class SSHConnectionManager(object):
         private_key_file_path="",
         private_key_password=None,
         outage_timeout=600,
+        pool_size=2,
+        max_channels=8,
+        keepalive=15,
     ):
         self.ip_address = ip_address
         self.username = username
@@ -1324,18 +1666,170 @@ class SSHConnectionManager(object):
         self.__transport = None
         self.__outage_start_time = None
         self.outage_timeout = datetime.timedelta(seconds=outage_timeout)
+        self.pool_size = pool_size
+        self.max_channels = max_channels
+        self.keepalive = keepalive
+        self._init_pool()
+
+    def _init_pool(self):
+        """Initialize the channel pool book keeping."""
+        self.__pool_cond = threading.Condition()
+        self.__waiters = deque()
+        # Slot 0 is the primary client, the others are created on demand
+        self.__clients = [None]
+        self.__channels = [0]
+        # Serializes the (re)connection of the client of each slot
+        self.__slot_locks = [threading.RLock()]
+        self.reconnects = 0
 
     @property
     def client(self):
         return self.get_client()
 
     def get_client(self):
-        if not (self.__transport and self.__transport.is_active()):
-            self.__connect()
-            self.__transport = self.__client.get_transport()
+        with self.__slot_locks[0]:
+            if not (self.__transport and self.__transport.is_active()):
+                if self.__transport:
+                    self.reconnects += 1
+                self.__connect()
+                self.__transport = self.__client.get_transport()
+                if self.keepalive:
+                    self.__transport.set_keepalive(self.keepalive)
 
         return self.__client
 
+    def _get_pool_client(self, slot):
+        """Returns the connected client of the given pool slot."""
+        if slot == 0:
+            return self.get_client()
+
+        # Checked under the slot lock, concurrent callers finding the slot empty
+        # must not connect twice and leak a client
+        with self.__slot_locks[slot]:
+            client = self.__clients[slot]
+            transport = client.get_transport() if client else None
+            if not (transport and transport.is_active()):
+                if client:
+                    self.reconnects += 1
+                    client.close()
+
+                client = paramiko.SSHClient()
+                client.set_missing_host_key_policy(paramiko.MissingHostKeyPolicy())
+                self.__connect(client)
+                if self.keepalive:
+                    client.get_transport().set_keepalive(self.keepalive)
+                self.__clients[slot] = client
+
+        return client
+
+    def _free_slot(self):
+        """Returns the least loaded slot with capacity, None if all are busy."""
+        slot = min(range(len(self.__channels)), key=self.__channels.__getitem__)
+        if self.__channels[slot] < self.max_channels:
+            return slot
+
+        if len(self.__channels) < self.pool_size:
+            self.__clients.append(None)
+            self.__channels.append(0)
+            self.__slot_locks.append(threading.RLock())
+            return len(self.__channels) - 1
+
+        return None
+
+    def open_channel(self, timeout=None):
+        """Opens a session channel honoring the pool limits.
+
+        Args:
+            timeout: maximum time to wait for a free slot and to open the channel.
+
+        Returns:
+            paramiko.Channel which must be returned using release_channel.
+
+        Raises:
+            TimeoutException: when no slot is available within the timeout.
+        """
+        ticket = object()
+        end_time = (time() + timeout) if timeout else None
+        with self.__pool_cond:
+            self.__waiters.append(ticket)
+            try:
+                while True:
+                    slot = self._free_slot() if self.__waiters[0] is ticket else None
+                    if slot is not None:
+                        break
+
+                    remaining = (end_time - time()) if end_time else None
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutException(
+                            f"No SSH channel available on {self.ip_address} "
+                            f"within {timeout}s."
+                        )
+                    self.__pool_cond.wait(remaining)
+            finally:
+                self.__waiters.remove(ticket)
+                self.__pool_cond.notify_all()
+
+            self.__channels[slot] += 1
+
+        try:
+            transport = self._get_pool_client(slot).get_transport()
+            channel = transport.open_session(timeout=timeout)
+        except BaseException:
+            self._release_slot(slot)
+            raise
+
+        channel.pool_slot = slot
+        return channel
+
+    def _release_slot(self, slot):
+        with self.__pool_cond:
+            self.__channels[slot] -= 1
+            self.__pool_cond.notify_all()
+
+    def release_channel(self, channel):
+        """Closes the channel and returns its slot to the pool."""
+        slot = getattr(channel, "pool_slot", None)
+        channel.close()
+        if slot is not None:
+            channel.pool_slot = None
+            self._release_slot(slot)
+
+    @property
+    def metrics(self):
+        """Returns the pool usage metrics."""
+        with self.__pool_cond:
+            return {
+                "transports": len(self.__channels),
+                "open_channels": sum(self.__channels),
+                "waiters": len(self.__waiters),
+                "reconnects": self.reconnects,
+            }
+
+    def check_health(self):
+        """Verifies the transports are alive and reconnects the broken ones.
+
+        A SSH ignore message is sent over every established transport, a
+        failure marks the transport for reconnection.
+        """
+        for slot in range(len(self.__channels)):
+            client = self.__client if slot == 0 else self.__clients[slot]
+            transport = client.get_transport() if client else None
+            if not transport:
+                continue
+
+            try:
+                if transport.is_active():
+                    transport.send_ignore()
+                    continue
+            except Exception as err:
+                logger.warning("SSH transport to %s broken: %s", self.ip_address, err)
+
+            transport.close()
+            if slot == 0:
+                self.get_client()
+            else:
+                self._get_pool_client(slot)
+
     def _get_ssh_key(self, private_key_file_path):
         """Get SSH key based on file type"""
         passphrase = self._private_key_password
@@ -1396,17 +1890,21 @@ class SSHConnectionManager(object):
 
     def close(self):
         """Close the SSH connection."""
-        try:
-            if self.__client:
-                self.__client.close()
-        except Exception:
-            pass
+        for client in [self.__client] + self.__clients[1:]:
+            try:
+                if client:
+                    client.close()
+            except Exception:
+                pass
         self.__transport = None
 
-    def __connect(self):
+    def __connect(self, client=None):
         """Establishes a connection with the remote host using the IP Address."""
-        end_time = datetime.datetime.now() + self.outage_timeout
+        client = client or self.__client
+        start_time = datetime.datetime.now()
+        end_time = start_time + self.outage_timeout
         last_error = None
+        retry_interval = 1
         while end_time > datetime.datetime.now():
             try:
                 auth = (
@@ -1436,8 +1934,13 @@ class SSHConnectionManager(object):
                     connect_kw["passphrase"] = self._private_key_password
                 else:
                     connect_kw["pkey"] = self.pkey
-                self.__client.connect(**connect_kw)
-                logger.info("SSH connected to %s as %s", self.ip_address, self.username)
+                client.connect(**connect_kw)
+                logger.info(
+                    "SSH connected to %s as %s in %.2f seconds",
+                    self.ip_address,
+                    self.username,
+                    (datetime.datetime.now() - start_time).total_seconds(),
+                )
                 self.__outage_start_time = None
                 return
             except Exception as e:
@@ -1453,8 +1956,10 @@ class SSHConnectionManager(object):
                 if not self.__outage_start_time:
                     self.__outage_start_time = datetime.datetime.now()
 
-                logger.debug("Retrying connection in 10 seconds")
-                sleep(10)
+                # Back off exponentially, capped at 10 seconds between attempts
+                logger.debug("Retrying connection in %d seconds", retry_interval)
+                sleep(retry_interval)
+                retry_interval = min(retry_interval * 2, 10)
 
         hint = ""
         err_str = str(last_error).lower() if last_error else ""
@@ -1508,6 +2013,8 @@ class SSHConnectionManager(object):
         # pkey (paramiko/cryptography key) is not picklable; recreated in __setstate__
         if pickle_dict.get("pkey") is not None:
             del pickle_dict["pkey"]
+        for attr in ("pool_cond", "waiters", "clients", "channels", "slot_locks"):
+            pickle_dict.pop(f"_SSHConnectionManager__{attr}", None)
         return pickle_dict
 
     def __setstate__(self, state):
@@ -1519,6 +2026,10 @@ class SSHConnectionManager(object):
         self.pkey = (
             self._get_ssh_key(key_path) if self.look_for_keys and key_path else None
         )
+        self.__dict__.setdefault("pool_size", 2)
+        self.__dict__.setdefault("max_channels", 8)
+        self.__dict__.setdefault("keepalive", 15)
+        self._init_pool()
 
 
 class CephNode(object):
@@ -1544,6 +2055,9 @@ class CephNode(object):
                     root_password='passwd', ipv4_address='...', ipv4_subnet='...',
                     hostname='hostname', role='mon|osd|client', no_of_volumes=3,
                     ceph_vmnode='ref_to_libcloudvm')
+
+        Set use_agent=True to execute commands through a persistent remote
+        agent (see ceph.remote_agent) instead of a new SSH session per command.
         """
         self.username = kw["username"]
         self.password = kw["password"]
@@ -1637,6 +2151,9 @@ class CephNode(object):
         self.ssh = self.connection.get_client
         self.ssh_transport = self.connection.get_transport
         self.run_once = False
+        self.use_agent = kw.get("use_agent", False)
+        self._agents = {}
+        self._agent_lock = threading.Lock()
 
     @property
     def distro_info(self):
@@ -1706,7 +2223,7 @@ class CephNode(object):
         if _is_onecloud_bootstrap:
             pass  # skip initial Paramiko connect; subprocess handles it below
         else:
-            self.rssh().exec_command("dmesg")
+            self.rssh()
             self.rssh_transport().set_keepalive(15)
 
         # OneCloud: bootstrap via system SSH (OpenSSH supports CISO certificates,
@@ -1911,12 +2428,8 @@ class CephNode(object):
             logger.info(stdout.readlines())
         # TCP keepalive (applies to both IPv4 and IPv6 on Linux)
         self.rssh().exec_command(
-            f"echo 120 | {sudo_prefix}tee /proc/sys/net/ipv4/tcp_keepalive_time"
-        )
-        self.rssh().exec_command(
-            f"echo 60 | {sudo_prefix}tee /proc/sys/net/ipv4/tcp_keepalive_intvl"
-        )
-        self.rssh().exec_command(
+            f"echo 120 | {sudo_prefix}tee /proc/sys/net/ipv4/tcp_keepalive_time; "
+            f"echo 60 | {sudo_prefix}tee /proc/sys/net/ipv4/tcp_keepalive_intvl; "
             f"echo 20 | {sudo_prefix}tee /proc/sys/net/ipv4/tcp_keepalive_probes"
         )
         self.exec_command(cmd="ls / ; uptime ; date")
@@ -1945,6 +2458,10 @@ class CephNode(object):
         else:
             self.pkg_type = "deb"
 
+        if self.use_agent:
+            self._remote_agent(sudo=False)
+            self._remote_agent(sudo=True)
+
         logger.info("finished connect")
         self.run_once = True
 
@@ -1989,7 +2506,7 @@ class CephNode(object):
         cmd = kw["cmd"]
         _end_time = None
         _verbose = kw.get("verbose", False)
-        ssh = self.rssh if kw.get("sudo") else self.ssh
+        connection = self.root_connection if kw.get("sudo") else self.connection
         long_running = kw.get("long_running", False)
         if "timeout" in kw:
             timeout = None if kw["timeout"] == "notimeout" else kw["timeout"]
@@ -1997,8 +2514,22 @@ class CephNode(object):
             # Set defaults if long_running then 1h else 5m
             timeout = 3600 if kw.get("long_running", False) else 600
 
+        agent = self._remote_agent(kw.get("sudo")) if self.use_agent else None
+        if agent:
+            try:
+                return self._agent_long_running(
+                    agent, cmd, timeout, long_running or _verbose
+                )
+            except RemoteAgentUnavailable as err:
+                logger.warning(
+                    "Remote agent on %s is unavailable, using a new session: %s",
+                    self.hostname,
+                    err,
+                )
+
+        channel = None
         try:
-            channel = ssh().get_transport().open_session(timeout=timeout)
+            channel = connection.open_channel(timeout=timeout)
             channel.settimeout(timeout)
 
             logger.info(
@@ -2015,22 +2546,25 @@ class CephNode(object):
                     seconds=timeout
                 )
 
-            _out = ""
-            _err = ""
+            # Collect the chunks and join once, avoids quadratic concatenation
+            _out = []
+            _err = []
             while not channel.exit_status_ready():
-                # Prevent high resource consumption
-                sleep(1)
+                # Wake up on data or exit status instead of polling every second
+                wait_for_channel(channel, _end_time, timeout)
 
                 # Check the streams for data and log in debug mode only if it
                 # is a long running command else don't log.
                 # Fixme: logging must happen in debug irrespective of type.
                 _verbose = True if long_running else _verbose
                 if channel.recv_ready():
-                    _out += read_stream(channel, _end_time, timeout, log=_verbose)
+                    _out.append(read_stream(channel, _end_time, timeout, log=_verbose))
 
                 if channel.recv_stderr_ready():
-                    _err += read_stream(
-                        channel, _end_time, timeout, stderr=True, log=_verbose
+                    _err.append(
+                        read_stream(
+                            channel, _end_time, timeout, stderr=True, log=_verbose
+                        )
                     )
 
                 check_timeout(_end_time, timeout)
@@ -2050,25 +2584,132 @@ class CephNode(object):
             #   - race condition between data read and exit ready
             try:
                 _new_timeout = datetime.datetime.now() + datetime.timedelta(seconds=10)
-                _out += read_stream(channel, _new_timeout, timeout=True)
-                _err += read_stream(channel, _new_timeout, timeout=True, stderr=True)
+                _out.append(read_stream(channel, _new_timeout, timeout=True))
+                _err.append(
+                    read_stream(channel, _new_timeout, timeout=True, stderr=True)
+                )
             except CommandFailed:
                 logger.debug("Encountered a timeout during read post execution.")
             except BaseException as be:
                 logger.debug("Encountered an unknown exception during last read.\n", be)
 
             _exit = channel.recv_exit_status()
-            return _out, _err, _exit, _time
+            return "".join(_out), "".join(_err), _exit, _time
         except socket.timeout as terr:
             logger.error("%s failed to execute within %d seconds.", cmd, timeout)
             raise SocketTimeoutException(terr)
         except TimeoutException as tex:
-            channel.close()
             logger.error("%s failed to execute within %ds.", cmd, timeout)
             raise CommandFailed(tex)
         except BaseException as be:  # noqa
             logger.exception(be)
             raise CommandFailed(be)
+        finally:
+            if channel:
+                connection.release_channel(channel)
+
+    def _remote_agent(self, sudo=False):
+        """Returns the running remote agent for the user, starting it if required.
+
+        Args:
+            sudo: return the agent serving the root connection.
+
+        Returns:
+            RemoteAgent or None when the agent could not be started.
+        """
+        key = "root" if sudo else "user"
+        with self._agent_lock:
+            agent = self._agents.get(key)
+            if agent and agent.is_alive:
+                return agent
+
+            if agent:
+                # Returns the channel slot of the dead agent
+                agent.close()
+
+            agent = RemoteAgent(
+                self.rssh if sudo else self.ssh,
+                connection=self.root_connection if sudo else self.connection,
+            )
+            try:
+                agent.start()
+            except BaseException as be:  # noqa
+                logger.warning(
+                    "Unable to start the remote agent on %s, disabling it: %s",
+                    self.hostname,
+                    be,
+                )
+                self.use_agent = False
+                return None
+
+            self._agents[key] = agent
+            return agent
+
+    def _agent_long_running(self, agent, cmd, timeout, log_output):
+        """Execute the command using the remote agent.
+
+        Args:
+            agent: the RemoteAgent to be used.
+            cmd: the command to be executed.
+            timeout: maximum allowed execution time, None for no limit.
+            log_output: log the command output.
+
+        Returns:
+            tuple of stdout, stderr, exit code and duration
+        """
+        logger.info(
+            "Execute %s on %s [%s] via remote agent",
+            cmd,
+            self.hostname,
+            self.ip_address,
+        )
+        try:
+            _out, _err, _exit, _time = agent.execute(
+                cmd, timeout=timeout, log_output=log_output
+            )
+        except RemoteAgentTimeout as tex:
+            logger.error("%s failed to execute within %ds.", cmd, timeout)
+            raise CommandFailed(tex)
+        except RemoteAgentUnavailable:
+            raise
+        except RemoteAgentError as err:
+            logger.error("%s failed on %s: %s", cmd, self.hostname, err)
+            raise CommandFailed(err)
+
+        logger.info(
+            "Execution of %s took %s seconds on %s [%s] via remote agent",
+            cmd,
+            str(_time),
+            self.hostname,
+            self.ip_address,
+        )
+        return _out, _err, _exit, _time
+
+    def _spooled_long_running(self, **kw):
+        """Execute the command capturing stdout in a SpooledOutput.
+
+        Returns:
+            tuple of SpooledOutput, stderr, exit code and duration
+        """
+        _out = SpooledOutput(max_size=kw["spool_size"])
+        _start = datetime.datetime.now()
+        timeout = kw.get("timeout", 3600 if kw.get("long_running") else 600)
+        stream = self.exec_stream(
+            cmd=kw["cmd"], sudo=kw.get("sudo"), timeout=timeout, chunks=True
+        )
+        for chunk in stream:
+            _out.write(chunk)
+
+        _time = (datetime.datetime.now() - _start).total_seconds()
+        logger.info(
+            "Execution of %s took %s seconds on %s [%s], %d bytes spooled",
+            kw["cmd"],
+            str(_time),
+            self.hostname,
+            self.ip_address,
+            _out.size,
+        )
+        return _out, stream.stderr, stream.exit_status, _time
 
     def exec_command(self, **kw):
         """Execute the given command on the remote host.
@@ -2080,6 +2721,8 @@ class CephNode(object):
           timeout: Max time to wait for command to complete. Default is 600 seconds.
           pretty_print: Bool flag to indicate if the output should be pretty printed.
           verbose: Bool flag to indicate if the command output should be printed.
+          spool_size: Capture stdout in a SpooledOutput keeping up to the given
+                      bytes in memory and spilling the rest to a temporary file.
 
         Returns:
           Exit code when long_running is used
@@ -2100,8 +2743,28 @@ class CephNode(object):
             self.rssh_transport().set_keepalive(15)
 
         cmd = kw["cmd"]
-        _out, _err, _exit, _time = self.long_running(**kw)
+        _user = "root" if kw.get("sudo") else self.username
+        _start = datetime.datetime.now()
+        try:
+            if kw.get("spool_size"):
+                _out, _err, _exit, _time = self._spooled_long_running(**kw)
+            else:
+                _out, _err, _exit, _time = self.long_running(**kw)
+        except CommandFailed:
+            _time = (datetime.datetime.now() - _start).total_seconds()
+            COMMAND_METRICS.record(self.hostname, _user, cmd, _time, None, 0, 0)
+            raise
+
         self.exit_status = _exit
+        COMMAND_METRICS.record(
+            self.hostname,
+            _user,
+            cmd,
+            _time,
+            _exit,
+            _out.size if isinstance(_out, SpooledOutput) else len(_out.encode()),
+            len(_err.encode()),
+        )
 
         if kw.get("pretty_print"):
             msg = f"\nCommand:    {cmd}"
@@ -2138,6 +2801,152 @@ class CephNode(object):
 
         return _out, _err
 
+    def exec_stream(self, **kw):
+        """Execute the command and stream its output as it arrives.
+
+        Args:
+          cmd: The command that needs to be executed on the remote host.
+          sudo: Execute the command as root.
+          timeout: Max time for the command to complete, notimeout to wait forever.
+                   Default is 3600 seconds.
+          chunks: Yield raw byte chunks instead of decoded lines.
+          check_ec: Raise CommandFailed at the end when the exit code is non-zero.
+          max_line_bytes: Lines longer than this are yielded in pieces.
+          max_stderr_bytes: Size of the stderr tail retained.
+
+        Returns:
+          CommandStream yielding lines (without line terminator) or byte chunks.
+
+        Examples:
+            for line in node.exec_stream(cmd="rados bench -p rbd 60 write"):
+                log.info(line)
+        """
+        cmd = kw["cmd"]
+        connection = self.root_connection if kw.get("sudo") else self.connection
+        timeout = kw.get("timeout", 3600)
+        timeout = None if timeout == "notimeout" else timeout
+
+        logger.info("Stream %s on %s [%s]", cmd, self.hostname, self.ip_address)
+        channel = connection.open_channel(timeout=timeout)
+        try:
+            channel.exec_command(cmd)
+        except BaseException:
+            connection.release_channel(channel)
+            raise
+
+        return CommandStream(
+            channel,
+            cmd,
+            timeout=timeout,
+            chunks=kw.get("chunks", False),
+            check_ec=kw.get("check_ec", False),
+            max_line_bytes=kw.get("max_line_bytes", 1048576),
+            max_stderr_bytes=kw.get("max_stderr_bytes", 1048576),
+            release=connection.release_channel,
+        )
+
+    def exec_batch(
+        self, cmds, sudo=False, stop_on_error=True, check_ec=True, timeout=600
+    ):
+        """Execute the commands one after the other in a single remote session.
+
+        The commands are sent as one script in which every command is followed
+        by a marker carrying its exit code and timestamps, hence a batch costs a
+        single session setup and round trip instead of one per command.
+
+        Args:
+          cmds: list of commands to be executed in order.
+          sudo: Execute the commands as root.
+          stop_on_error: Do not execute the remaining commands after a failure.
+          check_ec: Raise CommandFailed when a command returns non-zero.
+          timeout: Max time for the whole batch to complete.
+
+        Returns:
+          list of (stdout, stderr, exit code, duration) of the executed commands
+
+        Raises:
+          CommandFailed: when a command fails and check_ec is enabled or the
+                         session terminates before the batch is complete.
+
+        Examples:
+            results = node.exec_batch(
+                ["pvcreate -ff /dev/vdb", "vgcreate vg1 /dev/vdb"], sudo=True
+            )
+        """
+        if not cmds:
+            return []
+
+        marker = BATCH_MARKER.format(uuid.uuid4().hex)
+        script = []
+        for idx, cmd in enumerate(cmds):
+            # Subshell keeps `exit` in a command from ending the batch
+            script.append(
+                f"__s=$(date +%s.%N); ( {cmd}\n) </dev/null; __rc=$?; "
+                f"printf '\\n{marker} {idx} %d %s %s\\n' $__rc $__s $(date +%s.%N); "
+                f"printf '\\n{marker} {idx}\\n' >&2"
+            )
+            if stop_on_error:
+                script.append("[ $__rc -eq 0 ] || exit 0")
+
+        _out, _err, _, _ = self.exec_command(
+            cmd=f"bash -c {shlex.quote(chr(10).join(script))}",
+            sudo=sudo,
+            timeout=timeout,
+            check_ec=False,
+            verbose=True,
+        )
+
+        results = []
+        out_pattern = re.compile(rf"\n{marker} (\d+) (-?\d+) (\S+) (\S+)\n".encode())
+        _out, _err = _out.encode(), _err.encode()
+        out_start = err_start = 0
+        for match in out_pattern.finditer(_out):
+            idx, rc, start, end = match.groups()
+            err_marker = f"\n{marker} {int(idx)}\n".encode()
+            err_end = _err.find(err_marker, err_start)
+            err_end = len(_err) if err_end < 0 else err_end
+            results.append(
+                (
+                    _out[out_start : match.start()].decode("utf-8", errors="replace"),
+                    _err[err_start:err_end].decode("utf-8", errors="replace"),
+                    int(rc),
+                    round(float(end) - float(start), 3),
+                )
+            )
+            out_start = match.end()
+            err_start = err_end + len(err_marker)
+
+        failed = [idx for idx, result in enumerate(results) if result[2] != 0]
+        if check_ec and failed:
+            idx = failed[0]
+            raise CommandFailed(
+                f"{cmds[idx]} returned {results[idx][1]} and code {results[idx][2]} "
+                f"on {self.hostname} [{self.ip_address}]"
+            )
+
+        if len(results) < len(cmds) and not (stop_on_error and failed):
+            raise CommandFailed(
+                f"Batch terminated after {len(results)} of {len(cmds)} commands "
+                f"on {self.hostname} [{self.ip_address}]"
+            )
+
+        return results
+
+    async def aexec(self, executor=None, **kw):
+        """Asynchronous counterpart of exec_command.
+
+        Args:
+          executor: executor running the blocking call, loop default if None.
+          **kw: exec_command arguments.
+
+        Returns:
+          exec_command result
+
+        Examples:
+            out, err = await node.aexec(cmd="uptime")
+        """
+        return await aexec(self, executor=executor, **kw)
+
     def remote_file(self, **kw):
         """Return contents of the remote file."""
         client = self.rssh if kw.get("sudo", False) else self.ssh
@@ -2148,10 +2957,15 @@ class CephNode(object):
 
         return remote_file
 
-    def _keep_alive(self):
+    def _keep_alive(self, interval=60):
+        """Checks the SSH transports periodically and reconnects broken ones."""
         while True:
-            self.exec_command(cmd="uptime", check_ec=False)
-            sleep(60)
+            for connection in (self.root_connection, self.connection):
+                try:
+                    connection.check_health()
+                except BaseException as be:  # noqa
+                    logger.warning("Keepalive failed for %s: %s", self.ip_address, be)
+            sleep(interval)
 
     def reconnect(self):
         """Re-establish the connections."""
@@ -2180,6 +2994,9 @@ class CephNode(object):
         if d.get("connection"):
             del d["connection"]
 
+        d.pop("_agents", None)
+        d.pop("_agent_lock", None)
+
         return d
 
     def __setstate__(self, pickle_dict):
@@ -2205,6 +3022,9 @@ class CephNode(object):
         self.ssh = self.connection.get_client
         self.rssh_transport = self.root_connection.get_transport
         self.ssh_transport = self.connection.get_transport
+        self.__dict__.setdefault("use_agent", False)
+        self._agents = {}
+        self._agent_lock = threading.Lock()
 
     def get_ceph_objects(self, role=None):
         """
@@ -2517,21 +3337,23 @@ class CephNode(object):
             lvm_volms.append(existing_osd_scenarios)
             fileObject.close()
         else:
+            cmds = []
             for dev in devices:
                 number = devices.index(dev) if not num else num
-                logger.info("creating pv on %s" % self.hostname)
-                lvm_utils.pvcreate(self, dev)
-                logger.info("creating vg  %s" % self.hostname)
-                vgname = lvm_utils.vgcreate(self, self.LvmConfig.vg_name % number, dev)
-                logger.info("creating lv %s" % self.hostname)
-                lvname = lvm_utils.lvcreate(
-                    self,
-                    self.LvmConfig.lv_name % number,
-                    self.LvmConfig.vg_name % number,
-                    self.LvmConfig.size.format(100),
-                )
+                vgname = self.LvmConfig.vg_name % number
+                lvname = self.LvmConfig.lv_name % number
+                cmds += [
+                    lvm_utils.pvcreate_cmd(dev),
+                    lvm_utils.vgcreate_cmd(vgname, dev),
+                    lvm_utils.lvcreate_cmd(
+                        lvname, vgname, self.LvmConfig.size.format(100)
+                    ),
+                ]
                 lvm_volms.append({"data": lvname, "data_vg": vgname})
 
+            logger.info("creating pv, vg and lv on %s" % self.hostname)
+            self.exec_batch(cmds)
+
         if check_lvm:
             fileObject = open(file_Name % self.hostname, "wb")
             pickle.dump(lvm_volms, fileObject)
@@ -2740,6 +3562,43 @@ class CephObject(object):
         """
         return self.node.exec_command(cmd=cmd, **kw)
 
+    def exec_stream(self, cmd, **kw):
+        """
+        Proxy to node's exec_stream
+        Args:
+            cmd(str): command to execute
+            **kw: options
+
+        Returns:
+            node's exec_stream result
+        """
+        return self.node.exec_stream(cmd=cmd, **kw)
+
+    def exec_batch(self, cmds, **kw):
+        """
+        Proxy to node's exec_batch
+        Args:
+            cmds(list): commands to execute
+            **kw: options
+
+        Returns:
+            node's exec_batch result
+        """
+        return self.node.exec_batch(cmds, **kw)
+
+    async def aexec(self, cmd, executor=None, **kw):
+        """
+        Asynchronous counterpart of exec_command
+        Args:
+            cmd(str): command to execute
+            executor: executor running the blocking call, loop default if None
+            **kw: options
+
+        Returns:
+            exec_command result
+        """
+        return await aexec(self, executor=executor, cmd=cmd, **kw)
+
     def create_dirs(self, dir_path, sudo=False):
         """
         Proxy to node's create_dirs
@@ -0,0 +1,222 @@
+"""Time bound cache of read-only ceph command results.
+
+Tests often run the same read-only query like ``ceph osd tree`` or
+``ceph orch ps`` back to back. When enabled using the test configuration
+``command_cache`` (and optionally ``command_cache_ttl`` in seconds), the
+results of such queries executed through the cephadm shell are served from
+this cache until the TTL expires.
+
+Any command which is not recognised as a query is treated as a mutation and
+drops the cached results of the cluster, so a ``ceph osd pool set`` is always
+followed by a fresh ``ceph osd pool ls detail``. Volatile queries like
+``ceph -s`` or ``ceph pg dump`` are used for polling, they are never cached
+but do not drop the cached results either.
+
+The commands are observed when executed through ShellMixin.shell and
+RadosOrchestrator.run_ceph_command. Commands executed directly with
+CephNode.exec_command are not, a test mutating the cluster that way while
+the cache is enabled calls ``COMMAND_CACHE.invalidate(cluster_name)``.
+
+Example::
+
+    cache = CommandCache(ttl=30)
+    out = cache.get("ceph", "ceph osd tree -f json")
+    if out is None:
+        out = run(...)
+        cache.put("ceph", "ceph osd tree -f json", out)
+"""
+
+import re
+import threading
+from time import monotonic
+
+from utility.log import Log
+
+LOG = Log(__name__)
+
+DEFAULT_TTL = 30
+
+READ_ONLY_VERBS = {
+    "dump",
+    "get",
+    "get-quota",
+    "getcrushmap",
+    "list",
+    "ls",
+    "ls-pools",
+    "ps",
+    "show",
+    "tree",
+    "versions",
+}
+VOLATILE = {
+    "-s",
+    "-w",
+    "df",
+    "health",
+    "pg",
+    "progress",
+    "stat",
+    "status",
+    "top",
+}
+# Queries whose result changes by itself, in addition to READ_ONLY_VERBS
+QUERY_VERBS = {
+    "df",
+    "detail",
+    "du",
+    "health",
+    "info",
+    "ls-by-osd",
+    "ls-by-pool",
+    "ls-by-primary",
+    "lspools",
+    "progress",
+    "query",
+    "stat",
+    "status",
+    "top",
+}
+# Verbs turning a query into a mutation e.g. ceph health mute
+MUTATION_VERBS = {
+    "add",
+    "apply",
+    "clear",
+    "create",
+    "deep-scrub",
+    "destroy",
+    "disable",
+    "enable",
+    "import",
+    "mksnap",
+    "mute",
+    "purge",
+    "put",
+    "redeploy",
+    "remove",
+    "rename",
+    "repair",
+    "reset",
+    "restart",
+    "reweight",
+    "rm",
+    "rmsnap",
+    "rollback",
+    "scrub",
+    "set",
+    "start",
+    "stop",
+    "unmute",
+}
+QUERY_TOOLS = ("ceph", "rados", "rbd")
+STATUS_FLAGS = {"-s", "-w", "--status", "--watch"}
+FORMAT_FLAG = re.compile(r"(--format[ =]|-f )(\S+)")
+
+
+def normalize(cmd):
+    """Returns the canonical form of the command used as cache key."""
+    cmd = " ".join(cmd.split())
+    return FORMAT_FLAG.sub(r"-f \2", cmd)
+
+
+def is_read_only(cmd):
+    """Returns True when the command is a cacheable read-only ceph query."""
+    tokens = normalize(cmd).split()
+    if not tokens or tokens[0] != "ceph" or VOLATILE.intersection(tokens):
+        return False
+
+    words = [token for token in tokens[1:] if not token.startswith("-")]
+    return bool(READ_ONLY_VERBS.intersection(words))
+
+
+def is_query(cmd):
+    """Returns True when the command only reads the cluster, volatile queries included."""
+    tokens = normalize(cmd).split()
+    if not tokens or tokens[0] not in QUERY_TOOLS:
+        return False
+
+    # The output format is the only flag whose value is not a command word
+    words = [
+        token
+        for token in FORMAT_FLAG.sub("", " ".join(tokens[1:])).split()
+        if not token.startswith("-")
+    ]
+    if MUTATION_VERBS.intersection(words):
+        return False
+
+    if not words:
+        return bool(STATUS_FLAGS.intersection(tokens))
+
+    return bool(READ_ONLY_VERBS.union(QUERY_VERBS).intersection(words))
+
+
+class CommandCache:
+    """Thread safe TTL cache keyed by cluster and normalized command."""
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._entries = dict()
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def get(self, cluster, cmd, ttl=None):
+        """Returns the cached result or None on a miss.
+
+        Args:
+            cluster: name of the cluster
+            cmd: the ceph command
+            ttl: maximum age in seconds of the result, the cache TTL if None
+        """
+        ttl = self.ttl if ttl is None else ttl
+        key = (cluster, normalize(cmd))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and monotonic() - entry[0] < ttl:
+                self.hits += 1
+                return entry[1]
+
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def put(self, cluster, cmd, result):
+        with self._lock:
+            self._entries[(cluster, normalize(cmd))] = (monotonic(), result)
+
+    def invalidate(self, cluster=None):
+        """Drops the cached results of the cluster, all clusters when None."""
+        with self._lock:
+            keys = [key for key in self._entries if cluster in (None, key[0])]
+            for key in keys:
+                del self._entries[key]
+
+            if keys:
+                self.invalidations += 1
+
+    def observe(self, cluster, cmd):
+        """Drops the cached results of the cluster when the command is a mutation."""
+        if not is_query(cmd):
+            self.invalidate(cluster)
+
+    def clear(self):
+        """Drops all the cached results and resets the statistics."""
+        self.invalidate()
+        self.reset_stats()
+
+
+COMMAND_CACHE = CommandCache()
@@ -3,9 +3,12 @@
 from copy import deepcopy
 from typing import Dict, List
 
+from ceph.ceph import CommandFailed
 from utility.log import Log
 
+from .command_cache import COMMAND_CACHE, DEFAULT_TTL, is_read_only
 from .common import config_dict_to_string
+from .shell_pool import get_shell_pool, poolable
 from .typing_ import CephAdmProtocol
 
 LOG = Log(__name__)
@@ -13,7 +16,64 @@ BASE_CMD = ["cephadm", "shell"]
 
 
 class ShellMixin:
-    """Interface to shell CLI."""
+    """Interface to shell CLI.
+
+    When the test configuration has ``persistent_shell`` enabled, commands are
+    executed in a pooled long-lived cephadm shell instead of starting a new
+    container per call. Commands with redirections, pipes or host paths still
+    start their own container, refer shell_pool module.
+
+    When ``command_cache`` is enabled, the results of read-only queries are
+    reused for ``command_cache_ttl`` seconds, refer command_cache module.
+    """
+
+    def _cache_cluster(self: CephAdmProtocol) -> str:
+        """Returns the cluster name the cached results are kept against."""
+        return getattr(getattr(self, "cluster", None), "name", "ceph")
+
+    def _command_cache_ttl(self: CephAdmProtocol):
+        """Returns the TTL of the cached results, None if the cache is disabled."""
+        config = getattr(self, "config", None) or {}
+        if str(config.get("command_cache", False)).lower() not in ("true", "1", "yes"):
+            return None
+
+        return float(config.get("command_cache_ttl", DEFAULT_TTL))
+
+    def _use_persistent_shell(self: CephAdmProtocol) -> bool:
+        """Returns True when the pooled cephadm shell is enabled."""
+        config = getattr(self, "config", None) or {}
+        return str(config.get("persistent_shell", False)).lower() in (
+            "true",
+            "1",
+            "yes",
+        )
+
+    def _pooled_shell(
+        self: CephAdmProtocol,
+        args: List[str],
+        check_status: bool = True,
+        timeout: int = 600,
+        pretty_print: bool = False,
+    ):
+        """Executes the ceph command using the pooled cephadm shell."""
+        node = self.installer.node
+        cmd = " ".join(args)
+        LOG.info("Execute %s in cephadm shell on %s", cmd, node.hostname)
+        out, err, rc, duration = get_shell_pool(node).execute(cmd, timeout=timeout)
+        node.exit_status = rc
+
+        if pretty_print:
+            LOG.info(
+                f"\nCommand:    {cmd}\nDuration:   {duration} seconds"
+                f"\nExit Code:  {rc}\nStdout:     {out}\nStderr:      {err}"
+            )
+
+        if check_status and rc != 0:
+            raise CommandFailed(
+                f"{cmd} returned {err} and code {rc} on {node.hostname} [{node.ip_address}]"
+            )
+
+        return out, err
 
     def shell(
         self: CephAdmProtocol,
@@ -24,6 +84,7 @@ class ShellMixin:
         long_running: bool = False,
         print_output: bool = True,
         pretty_print: bool = False,
+        spool_size: int = None,
     ):
         """
         Ceph orchestrator shell interface to run ceph commands.
@@ -36,12 +97,41 @@ class ShellMixin:
             long_running (Bool): Long running command (default: False)
             print_output (Bool): Flag to decide whether the output should be printed in log or not
             pretty_print (Bool): When enabled, output/error will be pretty printed. Default false.
+            spool_size (Int): return stdout as SpooledOutput holding up to the given bytes in memory
 
         Returns:
             out (Str), err (Str) stdout and stderr response
             rc (Int) exit status code if long_running command
 
         """
+        plain = not base_cmd_args and not long_running and not spool_size
+        cluster = self._cache_cluster()
+        # Mutations drop the cached results, with or without the cache enabled
+        COMMAND_CACHE.observe(cluster, " ".join(args))
+
+        ttl = self._command_cache_ttl() if plain else None
+        cacheable = ttl is not None and is_read_only(" ".join(args))
+        if cacheable:
+            out = COMMAND_CACHE.get(cluster, " ".join(args), ttl=ttl)
+            if out is not None:
+                LOG.debug("Using cached result of %s", " ".join(args))
+                # Only successful results are cached
+                self.installer.node.exit_status = 0
+                return out
+
+        if plain and self._use_persistent_shell() and poolable(" ".join(args)):
+            out = self._pooled_shell(
+                args,
+                check_status=check_status,
+                timeout=timeout,
+                pretty_print=pretty_print,
+            )
+            if print_output:
+                LOG.debug(out[0])
+            if cacheable and self.installer.node.exit_status == 0:
+                COMMAND_CACHE.put(cluster, " ".join(args), out)
+            return out
+
         cmd = deepcopy(BASE_CMD)
 
         if base_cmd_args:
@@ -57,9 +147,12 @@ class ShellMixin:
             check_ec=check_status,
             long_running=long_running,
             pretty_print=pretty_print,
+            spool_size=spool_size,
         )
 
         if isinstance(out, tuple):
             if print_output:
                 LOG.debug(out[0])
+            if cacheable and self.installer.node.exit_status == 0:
+                COMMAND_CACHE.put(cluster, " ".join(args), out)
         return out
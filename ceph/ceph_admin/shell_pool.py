@@ -0,0 +1,306 @@
+"""Pool of long-lived cephadm shell sessions.
+
+Every ``cephadm shell -- <cmd>`` invocation starts a new container which costs
+a few seconds per ceph command. The sessions in this module start the shell
+container once and feed the commands over stdin. Each command is framed with
+a unique marker carrying the exit code, hence the output of consecutive
+commands never mixes.
+
+A pool holds up to ``size`` sessions per installer node, so concurrent callers
+do not serialize on a single shell. Sessions that die are restarted on the
+next request. run.py stops the sessions of all the nodes at the end of the run.
+
+The commands execute inside the shell container. With ``cephadm shell -- <cmd>``
+the redirections, pipes and paths of the command are resolved on the host,
+in the container the host files are not visible. Hence only the commands
+without shell syntax and host paths are sent to the pool, refer poolable().
+
+Example::
+
+    pool = get_shell_pool(installer.node)
+    out, err, rc, duration = pool.execute("ceph osd tree -f json")
+"""
+
+import datetime
+import re
+import threading
+import uuid
+
+from ceph.ceph import CommandFailed, wait_for_channel
+from utility.log import Log
+
+LOG = Log(__name__)
+
+SHELL_CMD = "cephadm shell -- bash -s"
+# Shell syntax resolved on the host by cephadm shell -- <cmd>
+HOST_SHELL_SYNTAX = re.compile(r"[<>|;&`]|\$\(")
+# Arguments referring to files of the host
+HOST_PATH = re.compile(r"(^|[\s=])(/|~|\./|\.\./)")
+MARKER = "__CEPHCI_SHELL_{}__"
+DEFAULT_POOL_SIZE = 2
+
+_pools = dict()
+_pools_lock = threading.Lock()
+
+
+def poolable(cmd):
+    """Returns True when the command behaves the same in the shell container.
+
+    Args:
+        cmd (Str): command to be executed.
+    """
+    return not (HOST_SHELL_SYNTAX.search(cmd) or HOST_PATH.search(cmd))
+
+
+class ShellSessionError(Exception):
+    """The shell terminated while a command was executing."""
+
+    pass
+
+
+class ShellSessionUnavailable(ShellSessionError):
+    """The shell could not accept the command, it is safe to retry."""
+
+    pass
+
+
+class CephadmShellSession:
+    """A single long-lived cephadm shell container."""
+
+    def __init__(self, node):
+        """Initialize the session.
+
+        Args:
+            node (CephNode): node on which the shell has to be started.
+        """
+        self.node = node
+        self._channel = None
+        self._out = bytearray()
+        self._err = bytearray()
+
+    @property
+    def is_alive(self):
+        return bool(
+            self._channel
+            and not self._channel.closed
+            and not self._channel.exit_status_ready()
+        )
+
+    def start(self, timeout=600):
+        """Starts the shell container and waits until it accepts commands."""
+        # The shell holds a channel slot of the root connection while alive
+        self._channel = self.node.root_connection.open_channel(timeout=timeout)
+        self._channel.exec_command(SHELL_CMD)
+
+        # Drain the container startup messages like "Inferring fsid"
+        self.execute("true", timeout=timeout)
+        LOG.info("Started persistent cephadm shell on %s", self.node.hostname)
+
+    def close(self):
+        if self._channel:
+            self.node.root_connection.release_channel(self._channel)
+        self._channel = None
+
+    def execute(self, cmd, timeout=600):
+        """Executes the command in the shell.
+
+        Args:
+            cmd (Str): command to be executed.
+            timeout (Int): Maximum time allowed for execution.
+
+        Returns:
+            out (Str), err (Str), rc (Int), duration (Float)
+
+        Raises:
+            ShellSessionUnavailable: when the command could not be sent.
+            ShellSessionError: when the shell terminates during execution.
+            CommandFailed: when the command exceeds the timeout.
+        """
+        marker = MARKER.format(uuid.uuid4().hex)
+        out_marker = f"\n{marker} ".encode()
+        err_marker = f"\n{marker}\n".encode()
+
+        # Subshell keeps `exit` from terminating the session and stdin is
+        # detached so that the command cannot consume the next requests.
+        script = (
+            f"( {cmd}\n) </dev/null; __rc=$?; "
+            f"printf '\\n{marker} %d\\n' $__rc; printf '\\n{marker}\\n' >&2\n"
+        )
+        start_time = datetime.datetime.now()
+        end_time = None
+        if timeout:
+            end_time = start_time + datetime.timedelta(seconds=timeout)
+
+        try:
+            self._channel.sendall(script.encode())
+        except Exception as err:
+            self.close()
+            raise ShellSessionUnavailable(err)
+
+        out = err = rc = None
+        while out is None or err is None:
+            if self._channel.recv_ready():
+                self._out.extend(self._channel.recv(65536))
+
+            if self._channel.recv_stderr_ready():
+                self._err.extend(self._channel.recv_stderr(65536))
+
+            if out is None:
+                idx = self._out.find(out_marker)
+                eol = self._out.find(b"\n", idx + len(out_marker))
+                if idx >= 0 and eol >= 0:
+                    rc = int(self._out[idx + len(out_marker) : eol])
+                    out = bytes(self._out[:idx])
+                    del self._out[: eol + 1]
+
+            if err is None:
+                idx = self._err.find(err_marker)
+                if idx >= 0:
+                    err = bytes(self._err[:idx])
+                    del self._err[: idx + len(err_marker)]
+
+            if out is not None and err is not None:
+                break
+
+            if (
+                self._channel.exit_status_ready()
+                and not self._channel.recv_ready()
+                and not self._channel.recv_stderr_ready()
+            ):
+                self.close()
+                raise ShellSessionError(f"cephadm shell exited while running {cmd}")
+
+            if end_time and datetime.datetime.now() >= end_time:
+                self.close()
+                raise CommandFailed(f"{cmd} failed to execute within {timeout}s.")
+
+            wait_for_channel(self._channel, end_time, timeout)
+
+        duration = (datetime.datetime.now() - start_time).total_seconds()
+        return (
+            out.decode("utf-8", errors="replace"),
+            err.decode("utf-8", errors="replace"),
+            rc,
+            duration,
+        )
+
+
+class CephadmShellPool:
+    """Bounded set of cephadm shell sessions on a node."""
+
+    def __init__(self, node, size=DEFAULT_POOL_SIZE):
+        """Initialize the pool.
+
+        Args:
+            node (CephNode): node on which the shells are started.
+            size (Int): maximum number of concurrent shell sessions.
+        """
+        self.node = node
+        self.size = size
+        self.restarts = 0
+        self._count = 0
+        self._idle = []
+        # Guards _count and _idle, notified whenever a session is returned
+        # or a slot is freed
+        self._cond = threading.Condition()
+
+    def _acquire(self):
+        while True:
+            with self._cond:
+                while not self._idle and self._count >= self.size:
+                    self._cond.wait()
+
+                session = self._idle.pop() if self._idle else None
+                if session is None:
+                    self._count += 1
+
+            if session is None:
+                session = CephadmShellSession(self.node)
+                try:
+                    session.start()
+                except BaseException:
+                    session.close()
+                    self._free_slot()
+                    raise
+
+            if session.is_alive:
+                return session
+
+            LOG.warning("cephadm shell on %s died, restarting", self.node.hostname)
+            session.close()
+            self._free_slot(restart=True)
+
+    def _free_slot(self, restart=False):
+        with self._cond:
+            self._count -= 1
+            self.restarts += int(restart)
+            self._cond.notify()
+
+    def _release(self, session):
+        if session.is_alive:
+            with self._cond:
+                self._idle.append(session)
+                self._cond.notify()
+            return
+
+        session.close()
+        self._free_slot()
+
+    def execute(self, cmd, timeout=600):
+        """Executes the command in one of the pooled shells.
+
+        Args:
+            cmd (Str): command to be executed.
+            timeout (Int): Maximum time allowed for execution.
+
+        Returns:
+            out (Str), err (Str), rc (Int), duration (Float)
+        """
+        for _ in range(2):
+            session = self._acquire()
+            try:
+                return session.execute(cmd, timeout=timeout)
+            except ShellSessionUnavailable as err:
+                LOG.warning("Retrying %s on a new cephadm shell: %s", cmd, err)
+            except ShellSessionError as err:
+                raise CommandFailed(err)
+            finally:
+                self._release(session)
+
+        raise CommandFailed(f"Unable to execute {cmd} in a cephadm shell.")
+
+    def close(self):
+        """Stops all the idle shell sessions."""
+        with self._cond:
+            sessions, self._idle = self._idle, []
+            self._count -= len(sessions)
+            self._cond.notify_all()
+
+        for session in sessions:
+            session.close()
+
+
+def get_shell_pool(node, size=DEFAULT_POOL_SIZE):
+    """Returns the cephadm shell pool of the given node, creating it if needed.
+
+    Args:
+        node (CephNode): installer node.
+        size (Int): maximum number of shell sessions for a new pool.
+
+    Returns:
+        CephadmShellPool
+    """
+    with _pools_lock:
+        pool = _pools.get(node)
+        if pool is None:
+            pool = _pools[node] = CephadmShellPool(node, size=size)
+
+        return pool
+
+
+def close_shell_pools():
+    """Stops the shell sessions of all the nodes."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
@@ -0,0 +1,346 @@
+# -*- code: utf-8 -*-
+"""
+This module stores and restores the cluster state used by --store/--reuse.
+
+The state is written as a versioned JSON document holding only the data
+required to rebuild the Ceph, CephNode and Ceph object graph i.e. node
+identity, roles, addresses, volumes and credential references. SSH
+connections and VM driver objects are never stored, the connections are
+re-established lazily on the first use of a node.
+
+Only the attributes listed in the allow-lists below are stored, an attribute
+added to the classes later is not persisted until it is listed. Passwords are
+never written, the document references the environment variable providing
+them instead, e.g. CEPHCI_ROOT_PASSWORD, which is read when the state is
+loaded. Loading fails when a variable required to connect to a node is not
+set. The built-in passwords of the cephci images are public and are
+referenced as such.
+
+Unlike pickle, the document does not depend on the class layout of the run
+that stored it. Unknown keys are ignored and missing keys fall back to the
+defaults hence a state stored by an older run can be reused by a newer one.
+
+Document layout::
+
+    {
+        "format": "cephci-cluster-state",
+        "version": 1,
+        "created": "2024-01-01T00:00:00",
+        "clusters": {
+            "ceph": {
+                "attributes": {"name": "ceph", ...},
+                "nodes": [
+                    {
+                        "attributes": {"vmname": "node1", "ip_address": ...},
+                        "credentials": {
+                            "root_passwd": {"builtin": "passwd"},
+                            "private_key_password": {"env": "CEPHCI_PRIVATE_KEY_PASSWORD"}
+                        },
+                        "volumes": [{"status": "allocated", "path": null}],
+                        "vm_node": {"node_type": "openstack", ...},
+                        "ceph_objects": [{"role": "mon", "attributes": {...}}]
+                    }
+                ]
+            }
+        }
+    }
+"""
+
+import datetime
+import json
+import os
+import pickle
+
+from ceph.ceph import Ceph, CephNode, CephObjectFactory, CephOsd, NodeVolume
+from utility.log import Log
+
+log = Log(__name__)
+
+FORMAT = "cephci-cluster-state"
+SCHEMA_VERSION = 1
+
+# Mandatory node attributes, a document without them cannot be reused
+NODE_REQUIRED = ("vmname", "ip_address", "username")
+
+# Stored attributes, the connections and runtime objects are rebuilt on load
+CLUSTER_ATTRIBUTES = (
+    "name",
+    "use_cdn",
+    "custom_config_file",
+    "custom_config",
+    "allow_custom_ansible_config",
+    "ceph_nodename",
+    "networks",
+    "use_ipv6",
+)
+NODE_ATTRIBUTES = (
+    "username",
+    "root_username",
+    "look_for_key",
+    "private_key_path",
+    "bootstrap_key_path",
+    "root_login",
+    "private_ip",
+    "ipv4_address",
+    "ipv4_subnet",
+    "ipv6_address",
+    "ipv6_subnet",
+    "use_ipv6",
+    "ip_address",
+    "subnet",
+    "vmname",
+    "ceph_nodename",
+    "vmshortname",
+    "hostname",
+    "shortname",
+    "osd_scenario",
+    "id",
+    "pkg_type",
+    "internal_ip",
+    "eth_interface",
+    "use_agent",
+    "run_once",
+)
+VM_NODE_ATTRIBUTES = (
+    "node_type",
+    "osd_scenario",
+    "volumes",
+    "location",
+    "hostname",
+    "shortname",
+    "ip_address",
+    "subnet",
+    "id",
+)
+CEPH_OBJECT_ATTRIBUTES = (
+    "device",
+    "containerized",
+    "is_active",
+    "ansible_dir",
+    "_CephDemon__custom_container_name",
+)
+
+# Credential attributes of the nodes and the environment variables providing them
+CREDENTIALS = {
+    "password": "CEPHCI_PASSWORD",
+    "root_passwd": "CEPHCI_ROOT_PASSWORD",
+    "private_key_password": "CEPHCI_PRIVATE_KEY_PASSWORD",
+    "bootstrap_key_password": "CEPHCI_BOOTSTRAP_KEY_PASSWORD",
+}
+
+# Credentials without which a node cannot be connected to, by the need of the node
+REQUIRED_CREDENTIALS = {
+    "password": lambda node: not getattr(node, "look_for_key", False),
+    "root_passwd": lambda node: not getattr(node, "look_for_key", False),
+    "private_key_password": lambda node: bool(
+        getattr(node, "look_for_key", False) and getattr(node, "private_key_path", "")
+    ),
+}
+
+# Default passwords of the cephci images set by run.py, they are no secrets
+BUILTIN_PASSWORDS = ("cephuser", "passwd")
+
+
+class ClusterStateError(Exception):
+    """The stored cluster state cannot be used."""
+
+    pass
+
+
+class VMNodeReference(object):
+    """Stored attributes of the VM driver object of a node.
+
+    Provider operations like power_on or shutdown are not available on a
+    reused cluster as the driver is not stored.
+    """
+
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+def _primitives(obj, allowed):
+    """Returns the allowed and JSON serializable attributes of the object."""
+    attributes = dict()
+    for key, value in obj.__dict__.items():
+        if key not in allowed or callable(value):
+            continue
+
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            log.debug(f"Skipping non serializable attribute {key} of {obj}")
+            continue
+
+        attributes[key] = value
+
+    return attributes
+
+
+def _dump_credentials(node):
+    """Returns the references of the credentials of the node."""
+    credentials = dict()
+    for attr, env in CREDENTIALS.items():
+        value = getattr(node, attr, None)
+        if not value or value in BUILTIN_PASSWORDS:
+            credentials[attr] = {"builtin": value}
+        else:
+            credentials[attr] = {"env": env}
+    return credentials
+
+
+def _load_credentials(node, credentials):
+    """Resolves the credential references of the node.
+
+    Raises:
+        ClusterStateError: when a variable required to connect to the node is not set.
+    """
+    for attr, reference in credentials.items():
+        if "env" not in reference:
+            setattr(node, attr, reference.get("builtin"))
+            continue
+
+        value = os.environ.get(reference["env"])
+        required = REQUIRED_CREDENTIALS.get(attr, lambda _: False)
+        if value is None and required(node):
+            raise ClusterStateError(
+                f"{reference['env']} is not set, it provides the {attr} required "
+                f"to connect to {node.vmname}"
+            )
+        if value is None:
+            log.warning(
+                f"{reference['env']} is not set, {attr} of {node.vmname} is unknown"
+            )
+        setattr(node, attr, value)
+
+
+def _dump_node(node):
+    vm_node = getattr(node, "vm_node", None)
+    return {
+        "attributes": _primitives(node, NODE_ATTRIBUTES),
+        "credentials": _dump_credentials(node),
+        "volumes": [
+            {"status": volume.status, "path": volume.path}
+            for volume in node.volume_list
+        ],
+        "vm_node": _primitives(vm_node, VM_NODE_ATTRIBUTES) if vm_node else None,
+        "ceph_objects": [
+            {"role": obj.role, "attributes": _primitives(obj, CEPH_OBJECT_ATTRIBUTES)}
+            for obj in node.ceph_object_list
+            if obj
+        ],
+    }
+
+
+def _load_node(data):
+    attributes = data["attributes"]
+    missing = [key for key in NODE_REQUIRED if key not in attributes]
+    if missing:
+        raise ClusterStateError(f"Node state is missing {missing}")
+
+    node = CephNode.__new__(CephNode)
+    node.__dict__.update(attributes)
+    _load_credentials(node, data.get("credentials", {}))
+    node.volume_list = [
+        NodeVolume(volume["status"], volume.get("path"))
+        for volume in data.get("volumes", [])
+    ]
+    if data.get("vm_node") is not None:
+        node.vm_node = VMNodeReference(**data["vm_node"])
+
+    node.ceph_object_list = []
+    for obj_data in data.get("ceph_objects", []):
+        # Volumes are already allocated, hence OSDs bypass the factory
+        if obj_data["role"] == "osd":
+            obj = CephOsd(node)
+        else:
+            obj = CephObjectFactory(node).create_ceph_object(obj_data["role"])
+        obj.__dict__.update(obj_data.get("attributes", {}))
+        node.ceph_object_list.append(obj)
+
+    # Rebuild the connection managers, connections are opened on first use
+    node.__setstate__({})
+    return node
+
+
+def _dump_cluster(cluster):
+    attributes = _primitives(cluster, CLUSTER_ATTRIBUTES)
+    version = cluster.__dict__.get("_Ceph__rhcs_version")
+    attributes["_Ceph__rhcs_version"] = str(version) if version else None
+    return {
+        "attributes": attributes,
+        "nodes": [_dump_node(node) for node in cluster.node_list],
+    }
+
+
+def _load_cluster(data):
+    cluster = Ceph.__new__(Ceph)
+    cluster.__dict__.update(data.get("attributes", {}))
+    cluster.node_list = [_load_node(node) for node in data.get("nodes", [])]
+    return cluster
+
+
+def dump_cluster_state(ceph_cluster_dict, file_name):
+    """Writes the state of the clusters to the given file.
+
+    Args:
+        ceph_cluster_dict (dict): cluster name and Ceph object
+        file_name (str): destination file
+    """
+    document = {
+        "format": FORMAT,
+        "version": SCHEMA_VERSION,
+        "created": datetime.datetime.now().isoformat(),
+        "clusters": {
+            name: _dump_cluster(cluster) for name, cluster in ceph_cluster_dict.items()
+        },
+    }
+    with open(file_name, "w") as state_file:
+        json.dump(document, state_file, indent=2)
+
+    envs = {
+        reference["env"]
+        for cluster in document["clusters"].values()
+        for node in cluster["nodes"]
+        for reference in node["credentials"].values()
+        if "env" in reference
+    }
+    if envs:
+        log.info(f"Reusing {file_name} requires the variables {sorted(envs)}")
+
+
+def load_cluster_state(file_name):
+    """Returns the clusters stored in the given file.
+
+    Files stored with pickle by earlier runs are still supported.
+
+    Args:
+        file_name (str): file written by dump_cluster_state
+
+    Returns:
+        dict of cluster name and Ceph object
+
+    Raises:
+        ClusterStateError: when the state is of an unsupported version.
+    """
+    with open(file_name, "rb") as state_file:
+        content = state_file.read()
+
+    try:
+        document = json.loads(content)
+    except (UnicodeDecodeError, ValueError):
+        log.warning(f"{file_name} is not a cluster state document, using pickle")
+        return pickle.loads(content)
+
+    if document.get("format") != FORMAT:
+        raise ClusterStateError(f"{file_name} is not a cephci cluster state")
+
+    if document.get("version", 0) > SCHEMA_VERSION:
+        raise ClusterStateError(
+            f"{file_name} has version {document['version']}, "
+            f"supported up to {SCHEMA_VERSION}"
+        )
+
+    return {
+        name: _load_cluster(cluster)
+        for name, cluster in document.get("clusters", {}).items()
+    }
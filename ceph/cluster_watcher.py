@@ -0,0 +1,412 @@
+"""
+Background watcher keeping an in-memory model of the cluster state.
+
+Waiting for the cluster to settle is usually written as a loop running
+``ceph -s`` every few seconds, each iteration opening a new SSH session and
+cephadm shell. A ClusterWatcher instead holds a single streaming session on
+the installer node in which a shell loop prints the cluster status and, at a
+longer interval, the pools and the brief PG dump as one JSON document per
+line::
+
+    status {"health": {...}, "pgmap": {...}, "osdmap": {...}}
+    pools [{"poolnum": 1, "poolname": ".mgr"}]
+    pgs {"pg_stats": [{"pgid": "1.0", "state": "active+clean", ...}]}
+
+Every update replaces the ClusterState of the watcher and wakes the threads
+waiting on it, hence the waits return as soon as the condition holds. A wait
+is only met by a state received after it started, the state preceding an
+action like stopping an OSD does not reflect it yet::
+
+    watcher = ceph_cluster.watcher()
+    if not watcher.await_pgs_clean(pool="rbd", timeout=600):
+        raise TestError("PGs of rbd are not active+clean")
+
+    watcher.await_health_ok(ignore=["POOL_APP_NOT_ENABLED"])
+
+The PG dump is expensive on large clusters, a pool wait is met from the cluster
+status as soon as all the PGs of the cluster are active+clean and only needs
+the dump otherwise.
+
+The stream is restarted when it breaks, the state is reset until the new
+stream reports the cluster again. The waits honour the deadline of the
+executing test and are accounted in the wait metrics.
+"""
+
+import json
+import threading
+import time
+import weakref
+
+from utility.log import Log
+from utility.poll import WAIT_METRICS, Poller, call_site, remaining
+
+log = Log(__name__)
+
+DEFAULT_INTERVAL = 5
+# Seconds between the dumps of the PG states
+DEFAULT_PGS_INTERVAL = 30
+
+WATCH_SCRIPT = (
+    "i=0; while true; do "
+    'echo "status $(ceph status -f json 2>/dev/null)"; '
+    "{pgs}"
+    "i=$((i + 1)); sleep {interval}; "
+    "done"
+)
+PGS_SCRIPT = (
+    "if [ $((i % {every})) -eq 0 ]; then "
+    'echo "pools $(ceph osd lspools -f json 2>/dev/null)"; '
+    'echo "pgs $(ceph pg dump pgs_brief -f json 2>/dev/null)"; '
+    "fi; "
+)
+
+# Ceph objects are not hashable, the watchers are indexed by the object id
+_watchers = dict()
+_watchers_lock = threading.Lock()
+
+
+def is_clean(state):
+    """Returns True for the active+clean PG states, scrubbing ones included."""
+    return {"active", "clean"}.issubset(state.split("+"))
+
+
+class ClusterState:
+    """Cluster status at a point of time."""
+
+    def __init__(self, version=0, status=None, pools=None, pgs=None):
+        status = status or dict()
+        self.version = version
+        self.updated = time.monotonic()
+
+        health = status.get("health", {})
+        self.health = health.get("status") or health.get("overall_status")
+        self.checks = set(health.get("checks", {}))
+
+        pgmap = status.get("pgmap", {})
+        self.num_pgs = pgmap.get("num_pgs", 0)
+        self.pgs_by_state = {
+            s["state_name"]: s["count"] for s in pgmap.get("pgs_by_state", [])
+        }
+
+        # The OSD counts are nested in osdmap up to Octopus
+        osdmap = status.get("osdmap", {})
+        osdmap = osdmap.get("osdmap", osdmap)
+        self.num_osds = osdmap.get("num_osds", 0)
+        self.num_up_osds = osdmap.get("num_up_osds", 0)
+        self.num_in_osds = osdmap.get("num_in_osds", 0)
+
+        self.pools = pools
+        self.pg_states = pgs
+
+    def pgs_clean(self, pool=None):
+        """Returns True when all the PGs of the pool or cluster are active+clean.
+
+        Args:
+            pool (str | int): name or id of the pool, the whole cluster if None
+        """
+        clean = sum(c for s, c in self.pgs_by_state.items() if is_clean(s))
+        cluster_clean = self.health is not None and clean == self.num_pgs
+        if pool is None:
+            return cluster_clean
+
+        # The status is more recent than the PG dump
+        if (
+            cluster_clean
+            and self.pools
+            and pool
+            in (
+                *self.pools.keys(),
+                *self.pools.values(),
+            )
+        ):
+            return True
+
+        states = self.pool_pg_states(pool)
+        return bool(states) and all(is_clean(s) for s in states.values())
+
+    def pool_pg_states(self, pool):
+        """Returns the state of the pool PGs by pgid, empty if unknown."""
+        if self.pools is None or self.pg_states is None:
+            return dict()
+
+        pool_id = self.pools.get(pool, pool)
+        prefix = f"{pool_id}."
+        return {
+            pgid: state
+            for pgid, state in self.pg_states.items()
+            if pgid.startswith(prefix)
+        }
+
+    def health_ok(self, ignore=()):
+        """Returns True when the cluster is healthy apart from the ignored checks."""
+        if self.health == "HEALTH_OK":
+            return True
+
+        return self.health is not None and self.checks.issubset(ignore)
+
+    def __repr__(self):
+        return (
+            f"ClusterState(version={self.version}, health={self.health}, "
+            f"checks={sorted(self.checks)}, pgs={self.pgs_by_state}, "
+            f"osds={self.num_up_osds}/{self.num_in_osds}/{self.num_osds})"
+        )
+
+
+class ClusterWatcher:
+    """Streams the cluster state from a node and waits on it."""
+
+    def __init__(
+        self,
+        node,
+        cephadm=True,
+        pgs=True,
+        interval=DEFAULT_INTERVAL,
+        pgs_interval=DEFAULT_PGS_INTERVAL,
+    ):
+        """Initialize the watcher.
+
+        Args:
+            node (CephNode): node with the ceph client and admin keyring.
+            cephadm (bool): execute the commands in the cephadm shell.
+            pgs (bool): track the state of every PG, required for pool waits.
+            interval (int): seconds between the status updates.
+            pgs_interval (int): seconds between the PG state updates.
+        """
+        self.node = node
+        self.cephadm = cephadm
+        self.pgs = pgs
+        self.interval = interval
+        self.pgs_interval = pgs_interval
+        self.state = ClusterState()
+        self._status = dict()
+        self._pools = None
+        self._condition = threading.Condition()
+        self._stream = None
+        self._stopped = threading.Event()
+        self._thread = None
+        self._poller = None
+
+    @property
+    def command(self):
+        every = max(int(self.pgs_interval // self.interval), 1)
+        script = WATCH_SCRIPT.format(
+            pgs=PGS_SCRIPT.format(every=every) if self.pgs else "",
+            interval=self.interval,
+        )
+        cmd = f"bash -c '{script}'"
+        return f"cephadm shell -- {cmd}" if self.cephadm else cmd
+
+    def start(self):
+        """Starts streaming the cluster state in a background thread."""
+        if self.alive:
+            return self
+
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._watch, name=f"watcher-{self.node.hostname}", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the background thread and closes the stream.
+
+        The thread is signalled through the stopped event, closing the channel of
+        the stream ends the read it is blocked on. Errors are logged, stopping a
+        watcher must not fail the teardown.
+        """
+        self._stopped.set()
+        if self._poller:
+            self._poller.wake()
+
+        self._close_stream()
+
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=10)
+            if self._thread.is_alive():
+                log.warning(f"Cluster watcher on {self.node.hostname} did not stop")
+
+        with self._condition:
+            self._condition.notify_all()
+
+    def _close_stream(self):
+        stream, self._stream = self._stream, None
+        try:
+            if stream:
+                stream.close()
+        except Exception as err:
+            log.warning(
+                f"Failed to close the watcher stream of {self.node.hostname}: {err}"
+            )
+
+    @property
+    def alive(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _watch(self):
+        """Consumes the stream, reconnecting with backoff when it breaks."""
+        self._poller = Poller(
+            timeout=float("inf"), interval=60, site=f"{__name__}:reconnect"
+        )
+        for _ in self._poller:
+            if self._stopped.is_set():
+                break
+
+            try:
+                self._stream = stream = self.node.exec_stream(
+                    cmd=self.command,
+                    sudo=True,
+                    timeout="notimeout",
+                    max_line_bytes=256 * 1048576,
+                )
+                # stop() may have run before the stream was published
+                if self._stopped.is_set():
+                    break
+
+                for line in stream:
+                    self._update(line)
+            except Exception as err:
+                if not self._stopped.is_set():
+                    log.warning(f"Cluster watcher on {self.node.hostname}: {err}")
+            finally:
+                self._close_stream()
+                # The state of a broken stream is no longer tracking the cluster
+                with self._condition:
+                    self.state = ClusterState()
+                    self._status, self._pools = dict(), None
+
+    def _update(self, line):
+        """Applies a line of the stream to the cluster state."""
+        kind, _, payload = line.partition(" ")
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            return
+
+        if kind == "status":
+            self._status = data
+            pgs = self.state.pg_states
+        elif kind == "pools":
+            self._pools = {p["poolname"]: p["poolnum"] for p in data}
+            return
+        elif kind == "pgs":
+            # Up to Octopus the brief dump is a plain list
+            stats = data.get("pg_stats", []) if isinstance(data, dict) else data
+            pgs = {pg["pgid"]: pg["state"] for pg in stats}
+        else:
+            return
+
+        with self._condition:
+            self.state = ClusterState(
+                self.state.version + 1, self._status, self._pools, pgs
+            )
+            self._condition.notify_all()
+
+    def wait_for(self, predicate, timeout=600, description=None):
+        """Waits until the predicate holds for a cluster state received after the call.
+
+        Args:
+            predicate (callable): called with the ClusterState.
+            timeout (int): maximum seconds to wait, bounded by the test deadline.
+            description (str): condition name used in the logs.
+
+        Returns:
+            True when the predicate holds, False on timeout.
+        """
+        self.start()
+        site = call_site(2)
+        _remaining = remaining()
+        if _remaining is not None:
+            timeout = min(timeout, _remaining)
+
+        start = time.monotonic()
+        end = start + timeout
+        updates = 0
+        with self._condition:
+            version = self.state.version
+            while not (
+                self.state.version
+                and self.state.updated > start
+                and predicate(self.state)
+            ):
+                left = end - time.monotonic()
+                if left <= 0 or self._stopped.is_set():
+                    log.error(
+                        f"{description or site} not met within {timeout}s, "
+                        f"last state {self.state}"
+                    )
+                    WAIT_METRICS.record(
+                        site, updates, time.monotonic() - start, "timeout"
+                    )
+                    return False
+
+                self._condition.wait(left)
+                updates += self.state.version != version
+                version = self.state.version
+
+        WAIT_METRICS.record(site, updates + 1, time.monotonic() - start, "completed")
+        log.info(f"{description or site} met, {self.state}")
+        return True
+
+    def await_pgs_clean(self, pool=None, timeout=600):
+        """Waits until all the PGs of the pool or the cluster are active+clean."""
+        return self.wait_for(
+            lambda state: state.pgs_clean(pool),
+            timeout=timeout,
+            description=f"PGs of {pool or 'the cluster'} active+clean",
+        )
+
+    def await_health_ok(self, ignore=(), timeout=600):
+        """Waits until the cluster health is OK apart from the ignored checks."""
+        return self.wait_for(
+            lambda state: state.health_ok(ignore),
+            timeout=timeout,
+            description="HEALTH_OK"
+            + (f" ignoring {', '.join(ignore)}" if ignore else ""),
+        )
+
+    def await_osds(self, up=None, in_=None, timeout=600):
+        """Waits until the number of up and in OSDs reach the given counts."""
+        return self.wait_for(
+            lambda state: (up is None or state.num_up_osds == up)
+            and (in_ is None or state.num_in_osds == in_),
+            timeout=timeout,
+            description=f"OSDs up {up} in {in_}",
+        )
+
+
+def get_watcher(ceph_cluster, **kw):
+    """Returns the running watcher of the cluster, started on its first use.
+
+    Args:
+        ceph_cluster (Ceph): cluster to be watched.
+        kw: ClusterWatcher arguments used when the watcher is created.
+    """
+    with _watchers_lock:
+        cluster_ref, watcher = _watchers.get(id(ceph_cluster), (None, None))
+        if not cluster_ref or cluster_ref() is not ceph_cluster:
+            installer = ceph_cluster.get_nodes(role="installer")
+            node = (
+                installer[0] if installer else ceph_cluster.get_nodes(role="client")[0]
+            )
+            kw.setdefault("cephadm", bool(installer))
+            watcher = ClusterWatcher(node, **kw)
+            _watchers[id(ceph_cluster)] = (weakref.ref(ceph_cluster), watcher)
+
+    return watcher.start()
+
+
+def stop_watchers():
+    """Stops the watchers of all the clusters."""
+    with _watchers_lock:
+        watchers = [watcher for _, watcher in _watchers.values()]
+        _watchers.clear()
+
+    for watcher in watchers:
+        watcher.stop()
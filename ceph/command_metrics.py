@@ -0,0 +1,242 @@
+# -*- code: utf-8 -*-
+"""
+This module records the latency and output size of every remote command.
+
+CephNode.exec_command adds a record to COMMAND_METRICS for each command it
+executes. The commands are grouped by template i.e. the command with numbers,
+addresses, UUIDs and quoted strings replaced by placeholders, hence the calls
+made by a helper in a loop (``ceph pg 1.2f query``, ``ceph pg 1.30 query``)
+are reported together.
+
+run.py binds the current test and cluster before each test and exports the
+summary of the test on every cluster and of the whole run as JSON in the run
+directory.
+
+Summary layout::
+
+    {
+        "test": "test_name",
+        "cluster": "ceph",
+        "commands": 120,
+        "duration": 342.1,
+        "templates": {
+            "ceph pg N.Nf query": {
+                "count": 40,
+                "failures": 0,
+                "duration": {"total": 61.2, "p50": 1.4, "p95": 2.1, "p99": 2.9, "max": 3.1},
+                "stdout_bytes": 81920,
+                "stderr_bytes": 0,
+                "nodes": ["node1"],
+                "users": ["root"]
+            }
+        }
+    }
+"""
+
+import json
+import math
+import os
+import re
+import threading
+from collections import namedtuple
+from functools import wraps
+
+from utility.log import Log
+
+log = Log(__name__)
+
+MAX_TEMPLATE_LENGTH = 256
+
+CommandRecord = namedtuple(
+    "CommandRecord",
+    [
+        "test",
+        "cluster",
+        "node",
+        "user",
+        "template",
+        "duration",
+        "exit_status",
+        "stdout_bytes",
+        "stderr_bytes",
+    ],
+)
+
+# Order matters, quoted strings and compound values go before plain numbers
+PLACEHOLDERS = [
+    (re.compile(r"'[^']*'|\"[^\"]*\""), "'?'"),
+    (
+        re.compile(
+            r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"
+        ),
+        "UUID",
+    ),
+    (re.compile(r"\b\d{1,3}(\.\d{1,3}){3}(:\d+)?\b"), "IP"),
+    (re.compile(r"\b[0-9a-fA-F]{12,}\b"), "HEX"),
+    (re.compile(r"\d+"), "N"),
+]
+
+
+def command_template(cmd):
+    """Returns the command with the variable parts replaced by placeholders."""
+    template = " ".join(str(cmd).split())
+    for pattern, placeholder in PLACEHOLDERS:
+        template = pattern.sub(placeholder, template)
+
+    return template[:MAX_TEMPLATE_LENGTH]
+
+
+def percentile(values, pct):
+    """Returns the nearest-rank percentile of the sorted values."""
+    if not values:
+        return 0.0
+
+    rank = max(math.ceil(pct / 100.0 * len(values)), 1)
+    return values[rank - 1]
+
+
+class CommandMetrics:
+    """Thread safe registry of the executed remote commands."""
+
+    def __init__(self):
+        self.test_name = None
+        self._records = []
+        self._lock = threading.Lock()
+        self._context = threading.local()
+
+    def bind(self, test_name, cluster=None):
+        """Tags the commands of the calling thread with the test and cluster name.
+
+        Used when tests execute concurrently, unbound threads use test_name.
+
+        Returns:
+            the previous binding of the thread as (test_name, cluster)
+        """
+        previous = self._binding()
+        self._context.test_name = test_name
+        self._context.cluster = cluster
+        return previous
+
+    def _binding(self):
+        return (
+            getattr(self._context, "test_name", None),
+            getattr(self._context, "cluster", None),
+        )
+
+    def propagate(self, fun):
+        """Returns a callable executing fun bound to the test of the calling thread.
+
+        Used to hand work over to pool threads without losing the test binding.
+        """
+        binding = self._binding()
+        if binding == (None, None):
+            return fun
+
+        @wraps(fun)
+        def _run(*args, **kwargs):
+            previous = self.bind(*binding)
+            try:
+                return fun(*args, **kwargs)
+            finally:
+                self.bind(*previous)
+
+        return _run
+
+    def record(self, node, user, cmd, duration, exit_status, stdout, stderr):
+        """Adds the execution of the command to the registry.
+
+        Args:
+            node (str): hostname of the node
+            user (str): user executing the command
+            cmd (str): the executed command
+            duration (float): execution time in seconds
+            exit_status (int): exit code of the command
+            stdout (int): number of bytes written to stdout
+            stderr (int): number of bytes written to stderr
+        """
+        record = CommandRecord(
+            getattr(self._context, "test_name", None) or self.test_name,
+            getattr(self._context, "cluster", None),
+            node,
+            user,
+            command_template(cmd),
+            float(duration or 0),
+            exit_status,
+            stdout,
+            stderr,
+        )
+        with self._lock:
+            self._records.append(record)
+
+    def records(self, test=None, cluster=None):
+        """Returns the records of the test on the cluster, all the records if None."""
+        with self._lock:
+            return [
+                r
+                for r in self._records
+                if test in (None, r.test) and cluster in (None, r.cluster)
+            ]
+
+    def summary(self, test=None, cluster=None):
+        """Returns the per template statistics of the test or the whole run."""
+        groups = dict()
+        for record in self.records(test, cluster):
+            groups.setdefault(record.template, []).append(record)
+
+        templates = dict()
+        for template, records in groups.items():
+            durations = sorted(r.duration for r in records)
+            templates[template] = {
+                "count": len(records),
+                "failures": sum(1 for r in records if r.exit_status != 0),
+                "duration": {
+                    "total": round(sum(durations), 3),
+                    "p50": percentile(durations, 50),
+                    "p95": percentile(durations, 95),
+                    "p99": percentile(durations, 99),
+                    "max": durations[-1],
+                },
+                "stdout_bytes": sum(r.stdout_bytes for r in records),
+                "stderr_bytes": sum(r.stderr_bytes for r in records),
+                "nodes": sorted({r.node for r in records}),
+                "users": sorted({r.user for r in records}),
+            }
+
+        # Most expensive templates first
+        ordered = sorted(
+            templates.items(),
+            key=lambda item: item[1]["duration"]["total"],
+            reverse=True,
+        )
+        return {
+            "test": test,
+            "cluster": cluster,
+            "commands": sum(t["count"] for t in templates.values()),
+            "duration": round(
+                sum(t["duration"]["total"] for t in templates.values()), 3
+            ),
+            "templates": dict(ordered),
+        }
+
+    def export(self, file_name, test=None, cluster=None):
+        """Writes the summary of the test or the whole run to the file."""
+        summary = self.summary(test, cluster)
+        if not summary["commands"]:
+            return None
+
+        os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
+        with open(file_name, "w", encoding="utf-8") as metrics_file:
+            json.dump(summary, metrics_file, indent=2)
+
+        log.info(
+            f"{summary['commands']} remote commands took {summary['duration']} "
+            f"seconds, metrics written to {file_name}"
+        )
+        return file_name
+
+    def clear(self):
+        with self._lock:
+            self._records = []
+
+
+COMMAND_METRICS = CommandMetrics()
@@ -36,6 +36,11 @@ In version 2, you can choose whether to use threads or processes by
     with parallel(thread_pool=False, timeout=10) as p:
         _r = [p.spawn(quux, x) for name in names]
 
+The thread pool creates a worker only when a spawned task finds no idle one,
+hence it is sized to the tasks in flight, e.g. one per node for a per node
+fan-out, up to a cap of DEFAULT_MAX_WORKERS threads. The cap defaults to 32
+and can be set with the CEPHCI_MAX_WORKERS environment variable.
+
 You can also specify the maximum number of worker threads/processes:
     with parallel(max_workers=20) as p:
         for foo in bar:
@@ -46,16 +51,61 @@ when iterating over the results, or when the with block ends.
 
 When the scope of with block changes, the main thread waits until all
 spawned functions have completed within the given timeout. On timeout,
-all pending threads/processes are issued shutdown command.
+all pending threads/processes are issued shutdown command and TimeoutError
+is raised.
+
+The results can be consumed as the tasks complete::
+
+    with parallel() as p:
+        for node in nodes:
+            p.spawn(node.exec_command, cmd="uptime")
+        for result in p.as_completed():
+            print(result)
+
+A task can be given its own time limit, measured from the moment it starts
+running. A task exceeding it is abandoned and reported as TimeoutError::
+
+    with parallel(task_timeout=300) as p:
+        p.spawn(quux, foo)
+        p.spawn_task(quux, bar, task_timeout=60)
+
+With fail_fast enabled, the first exception cancels the pending tasks and is
+raised without waiting for the tasks still running::
+
+    with parallel(fail_fast=True) as p:
+        for foo in bar:
+            p.spawn(quux, foo)
 """
 
 import logging
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
-from datetime import datetime, timedelta
-from time import sleep
+import os
+from concurrent.futures import (
+    ALL_COMPLETED,
+    FIRST_EXCEPTION,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import as_completed, wait
+from time import monotonic
+
+from ceph.command_metrics import COMMAND_METRICS
+from utility.poll import propagate
 
 logger = logging.getLogger(__name__)
 
+# Tasks are mostly I/O bound (SSH, REST calls), hence the thread pool allows
+# more workers than the interpreter default of cpu count + 4. Threads are
+# created on demand, so a pool never has more threads than spawned tasks and
+# the cap only matters for fan-outs wider than it. 32 concurrent SSH sessions
+# per run stays well below the sshd limits of a node with the default channel
+# pool (see SSHConnectionManager) while covering the usual cluster sizes.
+DEFAULT_MAX_WORKERS = int(os.environ.get("CEPHCI_MAX_WORKERS", 32))
+
+# Granularity of the per-task timeout checks, a task is considered started
+# when it is seen running.
+TASK_POLL_INTERVAL = 1.0
+
 
 class parallel:
     """This class is a context manager for concurrent method execution."""
@@ -66,6 +116,8 @@ class parallel:
         timeout=None,
         shutdown_cancel_pending=False,
         max_workers=None,
+        task_timeout=None,
+        fail_fast=False,
     ):
         """Object initialization method.
 
@@ -73,16 +125,27 @@ class parallel:
             thread_pool (bool)          Whether to use threads or processes.
             timeout (int | float)       Maximum allowed time.
             shutdown_cancel_pending (bool) If enabled, it would cancel pending tasks.
+            max_workers (int)           Maximum concurrent tasks, DEFAULT_MAX_WORKERS for threads.
+            task_timeout (int | float)  Maximum allowed time for each task.
+            fail_fast (bool)            Cancel the remaining tasks on the first exception.
         """
+        self._thread_pool = thread_pool
         if thread_pool:
-            self._executor = ThreadPoolExecutor(max_workers=max_workers)
+            self._executor = ThreadPoolExecutor(
+                max_workers=max_workers or DEFAULT_MAX_WORKERS
+            )
         else:
             self._executor = ProcessPoolExecutor(max_workers=max_workers)
         self._timeout = timeout
+        self._task_timeout = task_timeout
         self._cancel_pending = shutdown_cancel_pending
+        self._fail_fast = fail_fast
         self._futures = list()
         self._results = list()
         self._iter_index = 0
+        self._tasks = dict()
+        self._started = dict()
+        self._timed_out = set()
 
     @property
     def count(self):
@@ -103,48 +166,146 @@ class parallel:
         Returns:
             None
         """
-        _future = self._executor.submit(fun, *args, **kwargs)
+        self.spawn_task(fun, *args, task_timeout=self._task_timeout, **kwargs)
+
+    def spawn_task(self, fun, *args, task_timeout=None, **kwargs):
+        """Triggers the method with its own time limit.
+
+        Args:
+            func:           Function to be executed.
+            args:           A list of variables to be passed to the function.
+            task_timeout:   Maximum time allowed once the task starts running.
+            kwargs          A dictionary of named variables.
+
+        Returns:
+            None
+        """
+        # Threads wait within the deadline and record under the spawning test
+        _fun = fun
+        if self._thread_pool:
+            _fun = COMMAND_METRICS.propagate(propagate(fun))
+        _future = self._executor.submit(_fun, *args, **kwargs)
         self._futures.append(_future)
+        self._tasks[_future] = (getattr(fun, "__name__", str(fun)), task_timeout)
+
+    def _expire_tasks(self, not_done):
+        """Moves the tasks exceeding their time limit from not_done to timed out.
+
+        Returns:
+            seconds until the next task deadline or the poll interval when a
+            task with a time limit is yet to start, None if no task has a limit.
+        """
+        now = monotonic()
+        wakeup = None
+        for _f in list(not_done):
+            _name, _timeout = self._tasks[_f]
+            if not _timeout:
+                continue
+
+            if _f not in self._started:
+                if not _f.running():
+                    wakeup = min(wakeup or TASK_POLL_INTERVAL, TASK_POLL_INTERVAL)
+                    continue
+                self._started[_f] = now
+
+            _remaining = self._started[_f] + _timeout - now
+            if _remaining <= 0:
+                logger.error(f"Task {_name} did not complete within {_timeout}s")
+                not_done.discard(_f)
+                self._timed_out.add(_f)
+                continue
+
+            wakeup = _remaining if wakeup is None else min(wakeup, _remaining)
+
+        return wakeup
+
+    def _wait(self):
+        """Waits for the tasks to complete, fail or exceed their time limits."""
+        _end_time = monotonic() + self._timeout if self._timeout else None
+        _not_done = set(self._futures)
+
+        while _not_done:
+            _wakeup = self._expire_tasks(_not_done)
+            if _end_time:
+                _remaining = _end_time - monotonic()
+                if _remaining <= 0:
+                    break
+                _wakeup = _remaining if _wakeup is None else min(_wakeup, _remaining)
+
+            if not _not_done:
+                break
+
+            # Block until a task completes (or fails when failing fast)
+            _done, _not_done = wait(
+                _not_done,
+                timeout=_wakeup,
+                return_when=FIRST_EXCEPTION if self._fail_fast else ALL_COMPLETED,
+            )
+
+            if self._fail_fast:
+                for _f in _done:
+                    if not _f.cancelled() and _f.exception() is not None:
+                        logger.error(
+                            f"Task {self._tasks[_f][0]} failed, cancelling the remaining tasks"
+                        )
+                        self._executor.shutdown(wait=False, cancel_futures=True)
+                        raise _f.exception()
+
+        return _not_done
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, trackback):
-        _not_done = self._futures[:]
-        _end_time = datetime.now() + timedelta(
-            seconds=self._timeout if self._timeout else 3600
-        )
-
-        # Wait for all futures to complete within the given time or 1 hour.
-        while datetime.now() < _end_time:
-            # if the list is empty break
-            if len(_not_done) == 0:
-                break
-
-            sleep(2.0)
-            for _f in _not_done:
-                if _f.done():
-                    _not_done.remove(_f)
+        _not_done = self._wait()
 
         # Graceful shutdown of running threads
-        if _not_done:
-            self._executor.shutdown(wait=False, cancel_futures=self._cancel_pending)
+        self._executor.shutdown(wait=False, cancel_futures=self._cancel_pending)
 
         if exc_value is not None:
             logger.exception(trackback)
             return False
 
+        if _not_done:
+            raise FutureTimeoutError(
+                f"{len(_not_done)} of {self.count} tasks did not complete "
+                f"within {self._timeout}s"
+            )
+
         # Check for any exceptions and raise
         # At this point, all threads/processes should have completed or cancelled
         try:
             for _f in self._futures:
-                self._results.append(_f.result())
+                self._results.append(self._result(_f))
         except Exception:
             logger.exception("Encountered an exception during parallel execution.")
             raise
 
         return True
 
+    def _result(self, future, timeout=None):
+        if future in self._timed_out:
+            _name, _timeout = self._tasks[future]
+            raise FutureTimeoutError(f"Task {_name} exceeded {_timeout}s")
+
+        return future.result(timeout=timeout)
+
+    def as_completed(self):
+        """Yields the results of the tasks as they complete.
+
+        Like iteration, an exception raised by a task is yielded as the result.
+        """
+        try:
+            for _f in as_completed(self._futures, timeout=self._timeout):
+                try:
+                    yield _f.result()
+                except Exception as e:
+                    logger.exception(e)
+                    yield e
+        except FutureTimeoutError as e:
+            logger.exception(e)
+            yield e
+
     def __iter__(self):
         return self
 
@@ -156,7 +317,7 @@ class parallel:
         try:
             # Keeping timeout consistent when called within the context
             _timeout = self._timeout if self._timeout else 3600
-            out = self._futures[self._iter_index].result(timeout=_timeout)
+            out = self._result(self._futures[self._iter_index], timeout=_timeout)
         except Exception as e:
             logger.exception(e)
             out = e
@@ -0,0 +1,390 @@
+"""
+Coordinated rados bench on multiple clients with cluster level results.
+
+Starting rados bench on the clients one after the other staggers the load and
+leaves each client with its own output. The CoordinatedBench engine prepares
+every client in its own thread, waits for all of them at a barrier and starts
+the bench instances at the same wall clock second, correcting for the clock
+offset of every client measured during the preparation. The JSON output of the
+instances is merged into cluster level time series:
+ 1. bandwidth and IOPS of the cluster for every second
+ 2. p50 and p99 latency of the clients for every second
+ 3. p50 and p99 of the bandwidth, IOPS and latency over the run
+
+rados bench reports the latency of the last completed op of every second, the
+latency percentiles are computed over those samples.
+
+The report is stored as JSON artifact and can be compared with the report of an
+earlier run on the same hardware to detect regressions::
+
+    bench = CoordinatedBench(clients, pool_name="bench", mode="write", seconds=60)
+    report = bench.run()
+    report.save(run_config["log_dir"])
+    regressions = report.compare(BenchReport.load(baseline), tolerance=0.1)
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from ceph.command_metrics import percentile
+from ceph.parallel import parallel
+from ceph.rados.rados_bench import RadosBenchExecutionFailure
+from utility.log import Log
+
+log = Log(__name__)
+
+# Seconds between the release of the barrier and the start of the bench
+DEFAULT_LEAD = 10
+# Keys of the report which must match for two runs to be compared
+COMPARABLE_KEYS = ("mode", "object_size", "threads", "seconds", "num_clients")
+# Metrics compared between two runs, True when higher is better
+COMPARED_METRICS = {
+    "bandwidth_mb": True,
+    "iops": True,
+    "latency_p50": False,
+    "latency_p99": False,
+}
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _documents(text):
+    """Yields the JSON documents of the text, skipping the non JSON lines."""
+    decoder = json.JSONDecoder()
+    idx = 0
+    while idx < len(text):
+        start = text.find("{", idx)
+        if start == -1:
+            return
+        try:
+            document, idx = decoder.raw_decode(text, start)
+        except ValueError:
+            idx = start + 1
+            continue
+        yield document
+
+
+def _walk(document):
+    """Yields the dictionaries nested in the document, the document included."""
+    if isinstance(document, dict):
+        yield document
+        values = document.values()
+    elif isinstance(document, list):
+        values = document
+    else:
+        return
+
+    for value in values:
+        yield from _walk(value)
+
+
+def parse_bench_output(out):
+    """
+    Parses the output of rados bench executed with --format json
+    Args:
+        out: standard output of rados bench
+    Returns:
+        tuple of the per second samples sorted by second and the summary of the run
+    """
+    samples = dict()
+    summary = dict()
+    for document in _documents(out):
+        for entry in _walk(document):
+            if "sec" in entry and "cur_bw" in entry:
+                samples[int(_number(entry["sec"]))] = {
+                    key: _number(value) for key, value in entry.items()
+                }
+            elif "bandwidth" in entry or "total_time_run" in entry:
+                summary.update({key: _number(value) for key, value in entry.items()})
+
+    return [samples[sec] for sec in sorted(samples)], summary
+
+
+def _distribution(values):
+    values = sorted(values)
+    return {
+        "p50": round(percentile(values, 50), 6),
+        "p99": round(percentile(values, 99), 6),
+        "min": round(values[0], 6) if values else 0.0,
+        "max": round(values[-1], 6) if values else 0.0,
+    }
+
+
+class BenchReport:
+    """Cluster level results of a coordinated bench run."""
+
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def merge(cls, config, results):
+        """
+        Merges the results of the clients into cluster level time series
+        Args:
+            config: parameters of the run i.e. mode, pool, object_size, threads, seconds
+            results: per second samples and summary of the run by client name
+        Returns:
+            BenchReport object
+        """
+        by_second = defaultdict(list)
+        per_client = dict()
+        for client, (samples, summary) in sorted(results.items()):
+            finished = 0.0
+            for sample in samples:
+                sample["iops"] = sample.get("finished", 0.0) - finished
+                finished = sample.get("finished", 0.0)
+                by_second[int(sample["sec"])].append(sample)
+            per_client[client] = summary
+
+        series = []
+        for sec in sorted(by_second):
+            samples = by_second[sec]
+            latencies = sorted(s.get("last_lat", 0.0) for s in samples)
+            series.append(
+                {
+                    "sec": sec,
+                    "clients": len(samples),
+                    "bandwidth_mb": round(sum(s["cur_bw"] for s in samples), 3),
+                    "iops": round(sum(s["iops"] for s in samples), 3),
+                    "latency_p50": round(percentile(latencies, 50), 6),
+                    "latency_p99": round(percentile(latencies, 99), 6),
+                }
+            )
+
+        # Seconds at which all the clients were running
+        full = [entry for entry in series if entry["clients"] == len(results)]
+        latencies = [
+            s.get("last_lat", 0.0) for samples in by_second.values() for s in samples
+        ]
+        summary = {
+            "bandwidth_mb": round(
+                sum(s.get("bandwidth", 0.0) for s in per_client.values()), 3
+            ),
+            "iops": round(
+                sum(s.get("average_iops", 0.0) for s in per_client.values()), 3
+            ),
+            "latency_avg": round(
+                sum(s.get("average_latency", 0.0) for s in per_client.values())
+                / max(len(per_client), 1),
+                6,
+            ),
+            "latency_p50": round(percentile(sorted(latencies), 50), 6),
+            "latency_p99": round(percentile(sorted(latencies), 99), 6),
+            "bandwidth_mb_per_sec": _distribution(e["bandwidth_mb"] for e in full),
+            "iops_per_sec": _distribution(e["iops"] for e in full),
+        }
+
+        data = dict(config)
+        data.update(
+            {
+                "num_clients": len(results),
+                "clients": sorted(results),
+                "summary": summary,
+                "series": series,
+                "per_client": per_client,
+            }
+        )
+        return cls(data)
+
+    @property
+    def summary(self):
+        return self.data["summary"]
+
+    def save(self, directory):
+        """
+        Writes the report as JSON artifact to the directory
+        The artifact is named after the start time of the run, an index is
+        appended when the name is taken, hence earlier runs are not overwritten.
+        Returns:
+            path of the artifact
+        """
+        os.makedirs(directory, exist_ok=True)
+        name = f"radosbench-{self.data['mode']}-{self.data['pool']}"
+        if self.data.get("started") is not None:
+            started = time.strftime("%Y%m%d-%H%M%S", time.gmtime(self.data["started"]))
+            name = f"{name}-{started}"
+
+        path = os.path.join(directory, f"{name}.json")
+        index = 1
+        while os.path.exists(path):
+            path = os.path.join(directory, f"{name}-{index}.json")
+            index += 1
+        with open(path, "w", encoding="utf-8") as artifact:
+            json.dump(self.data, artifact, indent=2)
+
+        log.info(f"rados bench report written to {path}")
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """Reads a report saved earlier."""
+        with open(path, encoding="utf-8") as artifact:
+            return cls(json.load(artifact))
+
+    def compare(self, baseline, tolerance: float = 0.1) -> list:
+        """
+        Compares the report with the report of an earlier run on the same hardware
+        Args:
+            baseline: BenchReport of the earlier run
+            tolerance: allowed relative deterioration of the metrics
+        Returns:
+            list of the regressions, empty when none
+        Raises:
+            ValueError when the runs used different parameters
+        """
+        differences = {
+            key: (baseline.data.get(key), self.data.get(key))
+            for key in COMPARABLE_KEYS
+            if baseline.data.get(key) != self.data.get(key)
+        }
+        if differences:
+            raise ValueError(f"rados bench runs not comparable : {differences}")
+
+        regressions = []
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            before = baseline.summary.get(metric, 0.0)
+            after = self.summary.get(metric, 0.0)
+            if not before:
+                continue
+
+            change = (after - before) / before
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(
+                    f"{metric} changed by {change:+.1%} from {before} to {after}"
+                )
+
+        return regressions
+
+
+class CoordinatedBench:
+    """Runs rados bench on multiple clients at the same time."""
+
+    def __init__(
+        self,
+        clients,
+        pool_name: str,
+        mode: str = "write",
+        seconds: int = 60,
+        object_size: str = "4M",
+        threads: int = 16,
+        lead: int = DEFAULT_LEAD,
+        no_cleanup: bool = True,
+    ):
+        """
+        Initializes the bench
+        Args:
+            clients: list of CephNode objects with the ceph client
+            pool_name: pool on which the bench is run
+            mode: write, seq or rand, the read modes need an earlier write run
+            seconds: duration of the bench
+            object_size: size of the objects written
+            threads: concurrent IOs of every client
+            lead: seconds between the barrier and the start, to reach all the clients
+            no_cleanup: keep the written objects, required for the read modes
+        Raises:
+            ValueError when no client is given
+        """
+        if not clients:
+            raise ValueError("rados bench needs at least one client")
+
+        self.clients = clients
+        self.pool_name = pool_name
+        self.mode = mode
+        self.seconds = seconds
+        self.object_size = str(object_size).upper()
+        self.threads = threads
+        self.lead = lead
+        self.no_cleanup = no_cleanup
+        self.start_at = None
+        self._barrier = threading.Barrier(len(clients), action=self._release)
+
+    def _release(self):
+        """Fixes the start time once all the clients reached the barrier."""
+        self.start_at = time.time() + self.lead
+
+    def command(self, client, start_at: float) -> str:
+        """
+        Returns the command sleeping until the start time and running the bench
+        Args:
+            client: CephNode object the command is executed on
+            start_at: start time as epoch in the clock of the client
+        """
+        start_ns = int(start_at * 1e9)
+        wait = (
+            f"delay=$(( {start_ns} - $(date +%s%N) )); "
+            "[ $delay -gt 0 ] && sleep $(( delay / 1000000000 )).$(printf %09d $(( delay % 1000000000 ))); "
+        )
+        cmd = (
+            f"rados --no-log-to-stderr -p {self.pool_name} bench {self.seconds} {self.mode}"
+            f" -t {self.threads} --run-name bench-{client.hostname} --format json"
+        )
+        if self.mode == "write":
+            cmd = f"{cmd} -b {self.object_size}"
+            if self.no_cleanup:
+                cmd = f"{cmd} --no-cleanup"
+        return wait + cmd
+
+    @staticmethod
+    def clock_offset(client) -> float:
+        """Returns the offset of the client clock to the local clock in seconds."""
+        before = time.time()
+        out, _ = client.exec_command(cmd="date +%s.%N")
+        after = time.time()
+        return float(out.strip()) - (before + after) / 2
+
+    def _run_client(self, client):
+        try:
+            offset = self.clock_offset(client)
+            log.debug(f"Clock offset of {client.hostname} : {offset:.3f} seconds")
+        except Exception:
+            self._barrier.abort()
+            raise
+
+        self._barrier.wait(timeout=600)
+        out, _ = client.exec_command(
+            cmd=self.command(client, self.start_at + offset),
+            sudo=True,
+            timeout=self.seconds + self.lead + 300,
+        )
+        return client.hostname, parse_bench_output(out)
+
+    def run(self) -> BenchReport:
+        """
+        Runs the bench on all the clients with a synchronized start
+        Returns:
+            BenchReport of the run
+        """
+        log.info(
+            f"Starting rados bench {self.mode} for {self.seconds} seconds on pool "
+            f"{self.pool_name} from {len(self.clients)} clients"
+        )
+        try:
+            with parallel(max_workers=len(self.clients)) as p:
+                for client in self.clients:
+                    p.spawn(self._run_client, client)
+            results = dict(p.results)
+        except Exception as err:
+            log.error(f"rados bench failed on the clients : {err}")
+            raise RadosBenchExecutionFailure(err)
+
+        report = BenchReport.merge(
+            {
+                "mode": self.mode,
+                "pool": self.pool_name,
+                "object_size": self.object_size,
+                "threads": self.threads,
+                "seconds": self.seconds,
+                "started": self.start_at,
+            },
+            results,
+        )
+        log.info(f"rados bench {self.mode} results : {report.summary}")
+        return report
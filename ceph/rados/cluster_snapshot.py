@@ -0,0 +1,215 @@
+"""
+This module builds an indexed in-memory model of the cluster from a single fetch.
+
+The getters of RadosOrchestrator run a ceph command and parse its JSON for every
+call, a test looking up the PGs of every OSD ends up running hundreds of
+commands. A ClusterSnapshot fetches ``ceph report`` (OSD map, pools, health),
+``ceph pg dump pgs_brief`` (PG up/acting sets), ``ceph osd tree`` and
+``ceph orch ps`` in one remote session and indexes them:
+ 1. Pools by name and by id
+ 2. PGs by pool, by OSD in the acting set and by acting primary
+ 3. OSDs by host and by status (up, down, in, out, destroyed)
+ 4. Daemons by type
+
+The snapshot is immutable, a caller refreshes it after changing the cluster.
+The getters look up the pools and OSDs missing from the snapshot on the
+cluster::
+
+    snapshot = rados_obj.refresh_snapshot()
+    for osd in snapshot.osd_list("up"):
+        pgs = rados_obj.get_pgid(osd=osd)   # answered from the snapshot
+    rados_obj.drop_snapshot()
+"""
+
+import json
+import time
+from collections import defaultdict
+
+from ceph.ceph import CommandFailed
+from ceph.rados.pg_states import PGStates
+from utility.log import Log
+
+log = Log(__name__)
+
+SNAPSHOT_COMMANDS = {
+    "report": "ceph report",
+    "pgs": "ceph pg dump pgs_brief -f json",
+    "osd_tree": "ceph osd tree -f json",
+    "orch_ps": "ceph orch ps -f json",
+}
+OSD_STATUSES = ("up", "down", "in", "out", "destroyed")
+
+
+class ClusterSnapshot:
+    """Indexed view of the cluster state at a point of time."""
+
+    def __init__(self, report, pgs, osd_tree, orch_ps=None):
+        """
+        Builds the indexes from the outputs of the snapshot commands
+        Args:
+            report: ceph report output
+            pgs: ceph pg dump pgs_brief output
+            osd_tree: ceph osd tree output
+            orch_ps: ceph orch ps output, None when the orchestrator is not used
+        """
+        self.taken = time.time()
+        osdmap = report.get("osdmap", {})
+        self.epoch = osdmap.get("epoch")
+        self.health = report.get("health", {})
+
+        self.pools = {pool["pool_name"]: pool for pool in osdmap.get("pools", [])}
+        self.pools_by_id = {pool["pool"]: pool for pool in self.pools.values()}
+
+        # Up to Octopus the brief dump is a plain list
+        pg_stats = pgs.get("pg_stats", []) if isinstance(pgs, dict) else pgs
+        self.pgs = {pg["pgid"]: pg for pg in pg_stats}
+        self.pgs_by_pool = defaultdict(list)
+        self.pgs_by_osd = defaultdict(list)
+        self.pgs_by_primary = defaultdict(list)
+        for pgid, pg in self.pgs.items():
+            self.pgs_by_pool[int(pgid.split(".")[0])].append(pgid)
+            # ceph pg ls-by-osd selects on the acting set only
+            for osd in set(pg.get("acting", [])):
+                self.pgs_by_osd[osd].append(pgid)
+            self.pgs_by_primary[pg.get("acting_primary")].append(pgid)
+
+        self.osd_tree = osd_tree
+        nodes = {node["id"]: node for node in osd_tree.get("nodes", [])}
+        self.osds_by_host = {
+            node["name"]: [c for c in node.get("children", []) if c in nodes]
+            for node in nodes.values()
+            if node["type"] == "host"
+        }
+        self._tree_osds = [
+            n["id"] for n in osd_tree.get("nodes", []) if n["type"] == "osd"
+        ]
+        self._tree_osds += [n["id"] for n in osd_tree.get("stray", [])]
+
+        self.osds = {osd["osd"]: osd for osd in osdmap.get("osds", [])}
+        self.osds_by_status = {status: [] for status in OSD_STATUSES}
+        for osd_id in self._tree_osds:
+            osd = self.osds.get(osd_id)
+            if not osd:
+                continue
+            self.osds_by_status["up" if osd.get("up") else "down"].append(osd_id)
+            self.osds_by_status["in" if osd.get("in") else "out"].append(osd_id)
+            if "destroyed" in osd.get("state", []):
+                self.osds_by_status["destroyed"].append(osd_id)
+
+        self.daemons = defaultdict(list)
+        for daemon in orch_ps or []:
+            self.daemons[daemon.get("daemon_type")].append(daemon)
+
+    @classmethod
+    def capture(cls, node, timeout=600):
+        """
+        Fetches the snapshot commands in a single remote session
+        Args:
+            node: node with the ceph client and admin keyring
+            timeout: maximum time allowed for the fetch
+        Returns:
+            ClusterSnapshot
+        """
+        start = time.time()
+        results = node.exec_batch(
+            list(SNAPSHOT_COMMANDS.values()),
+            sudo=True,
+            stop_on_error=False,
+            check_ec=False,
+            timeout=timeout,
+        )
+        outputs = dict()
+        for name, (out, err, rc, _) in zip(SNAPSHOT_COMMANDS, results):
+            if rc != 0 and name != "orch_ps":
+                raise CommandFailed(f"{SNAPSHOT_COMMANDS[name]} failed: {err}")
+            outputs[name] = json.loads(out) if rc == 0 and out.strip() else None
+
+        snapshot = cls(**outputs)
+        log.info(
+            f"Captured cluster snapshot of osdmap epoch {snapshot.epoch} with "
+            f"{len(snapshot.pools)} pools, {len(snapshot.pgs)} PGs and "
+            f"{len(snapshot.osds)} OSDs in {time.time() - start:.2f} seconds"
+        )
+        return snapshot
+
+    def pool(self, pool):
+        """Returns the details of the pool by name or id, empty if not found."""
+        return self.pools.get(pool) or self.pools_by_id.get(pool) or {}
+
+    def pool_id(self, pool_name):
+        """Returns the id of the pool, None if not found."""
+        return self.pools.get(pool_name, {}).get("pool")
+
+    def pg(self, pgid):
+        """Returns the brief details of the PG i.e. state, up and acting sets."""
+        return self.pgs.get(pgid, {})
+
+    def pg_states(self):
+        """Returns the PGs of the snapshot for bulk state evaluation."""
+        return PGStates(self.pgs.values())
+
+    def knows(self, pool_name=None, pool_id=None, osd=None, osd_primary=None):
+        """
+        Returns True when the selected pool and OSDs are part of the snapshot
+        Args:
+            pool_name: name of the pool
+            pool_id: id of the pool
+            osd: id of the OSD
+            osd_primary: id of the primary OSD
+        """
+        if pool_name and pool_name not in self.pools:
+            return False
+        if pool_id is not None and int(pool_id) not in self.pools_by_id:
+            return False
+        return all(
+            int(osd_id) in self.osds
+            for osd_id in (osd, osd_primary)
+            if osd_id is not None
+        )
+
+    def pgids(
+        self,
+        pool_name=None,
+        pool_id=None,
+        osd=None,
+        osd_primary=None,
+        states=None,
+    ):
+        """
+        Returns the PG ids selected like the ceph pg ls commands
+        Args:
+            pool_name: PGs of the pool, like ls-by-pool
+            pool_id: PGs of the pool id, narrows the osd and osd_primary selections
+            osd: PGs with the OSD in the acting set, like ls-by-osd
+            osd_primary: PGs with the OSD as acting primary, like ls-by-primary
+            states: space separated states, PGs in any of them
+        Returns:
+            list of PG ids
+        """
+        if pool_name:
+            pgids = self.pgs_by_pool.get(self.pool_id(pool_name), [])
+        elif osd is not None:
+            pgids = self.pgs_by_osd.get(int(osd), [])
+        elif osd_primary is not None:
+            pgids = self.pgs_by_primary.get(int(osd_primary), [])
+        elif pool_id is not None:
+            pgids = self.pgs_by_pool.get(int(pool_id), [])
+        else:
+            return []
+
+        if pool_id is not None and not pool_name:
+            pgids = [p for p in pgids if p.startswith(f"{pool_id}.")]
+
+        if states:
+            wanted = set(states.split())
+            pgids = [p for p in pgids if wanted & set(self.pgs[p]["state"].split("+"))]
+
+        return list(pgids)
+
+    def osd_hosts(self):
+        """Returns the names of the OSD hosts as used in the crush map."""
+        return list(self.osds_by_host)
+
+    def osd_list(self, status):
+        """Returns the OSD ids in the status i.e. up, down, in, out or destroyed."""
+        return list(self.osds_by_status[status.lower()])
@@ -20,10 +20,20 @@ import time
 from collections import namedtuple
 from typing import Optional
 
-from ceph.ceph import CommandFailed, SocketTimeoutException, TimeoutException
+from ceph.ceph import (
+    CommandFailed,
+    SocketTimeoutException,
+    SpooledOutput,
+    TimeoutException,
+)
 from ceph.ceph_admin import CephAdmin
+from ceph.ceph_admin.command_cache import COMMAND_CACHE
 from ceph.parallel import parallel
+from ceph.rados import pg_analytics
 from ceph.rados import utils as osd_utils
+from ceph.rados.cluster_snapshot import ClusterSnapshot
+from ceph.rados.pg_states import PGStates
+from ceph.rados.scrub_tracker import ScrubTracker
 from tests.rados.rados_test_util import wait_for_device_rados
 from utility import utils
 from utility.log import Log
@@ -49,6 +59,27 @@ class RadosOrchestrator:
         self.ceph_cluster = node.cluster
         self.client = node.cluster.get_nodes(role="client")[0]
         self.rhbuild = node.config.get("rhbuild")
+        self.cluster_snapshot = None
+
+    def refresh_snapshot(self) -> ClusterSnapshot:
+        """
+        Captures a snapshot of the cluster used by the getters until it is refreshed or dropped.
+
+        While the snapshot is set, get_pool_details, get_pool_id, get_pg_acting_set, get_pgid,
+        get_osd_hosts and get_osd_list are answered from its indexes instead of running a
+        command each, hence the snapshot needs to be refreshed after changing the cluster.
+        Pools, PGs and OSDs missing from the snapshot are still looked up on the cluster.
+        Returns:
+            ClusterSnapshot object
+        """
+        self.cluster_snapshot = ClusterSnapshot.capture(self.client)
+        return self.cluster_snapshot
+
+    def drop_snapshot(self):
+        """
+        Drops the cluster snapshot, the getters run their commands again
+        """
+        self.cluster_snapshot = None
 
     def change_recovery_flags(self, action, flags: list = None):
         """Sets and unsets the recovery flags on the cluster
@@ -167,6 +198,7 @@ class RadosOrchestrator:
         client_exec: bool = False,
         print_output: bool = False,
         return_err: bool = False,
+        spool_size: int = None,
     ):
         """
         Runs ceph commands with json tag for the action specified otherwise treats action as command
@@ -176,23 +208,36 @@ class RadosOrchestrator:
             cmd: Command that needs to be run
             timeout: Maximum time allowed for execution.
             client_exec: Selection if true, runs the command on the client node
+            spool_size: For huge outputs like pg dump, keep up to the given bytes in
+                memory and spill the rest to disk before parsing
         Returns: dictionary of the output
         """
 
         cmd = f"{cmd} -f json"
         try:
             if client_exec:
-                out, err = self.client.exec_command(cmd=cmd, sudo=True, timeout=timeout)
+                # The shell drops the cached query results on mutations, the
+                # client commands must as well
+                COMMAND_CACHE.observe(self.node.cluster.name, cmd)
+                out, err = self.client.exec_command(
+                    cmd=cmd, sudo=True, timeout=timeout, spool_size=spool_size
+                )
             else:
-                out, err = self.node.shell([cmd], timeout=timeout, print_output=False)
+                out, err = self.node.shell(
+                    [cmd], timeout=timeout, print_output=False, spool_size=spool_size
+                )
         except Exception as er:
             log.error(f"Exception hit while command execution. {er}")
             raise
         if out.isspace():
             return {}
-        status = json.loads(out)
+        if isinstance(out, SpooledOutput):
+            status = out.json()
+            out.close()
+        else:
+            status = json.loads(out)
         if print_output:
-            log.info("out: " + out + "\n")
+            log.info(f"out: {out}\n")
             log.info("err: " + err + "\n")
         if return_err:
             return status, err
@@ -308,6 +353,9 @@ class RadosOrchestrator:
         returns:
             Dictionary of pool properties for the selected pool
         """
+        if self.cluster_snapshot and self.cluster_snapshot.pool(pool):
+            return self.cluster_snapshot.pool(pool)
+
         cmd = "ceph osd pool ls detail"
         out = self.run_ceph_command(cmd=cmd)
         for ele in out:
@@ -722,6 +770,9 @@ class RadosOrchestrator:
             pg_num = "1.0"
 
         log.debug(f"Collecting the acting set for the PG : {pg_num}")
+        if self.cluster_snapshot and self.cluster_snapshot.pg(pg_num):
+            return self.cluster_snapshot.pg(pg_num)["up"]
+
         cmd = f"ceph pg map {pg_num}"
         out = self.run_ceph_command(cmd=cmd)
         log.debug(
@@ -868,9 +919,9 @@ class RadosOrchestrator:
         """
         log.info("Checking the read balancer scores on the cluster for all pools")
         read_scores = {}
-        existing_pools = self.list_pools()
-        for pool_name in existing_pools:
-            pool_details = self.get_pool_details(pool=pool_name)
+        # Details of all the pools are fetched at once
+        for pool_details in self.run_ceph_command(cmd="ceph osd pool ls detail"):
+            pool_name = pool_details["pool_name"]
             log.debug(f"Selected pool name : {pool_name}")
             if not pool_details["erasure_code_profile"]:
                 log.debug(
@@ -889,6 +940,32 @@ class RadosOrchestrator:
         )
         return read_scores
 
+    def get_pg_distribution(self, pool_name: str = None):
+        """
+        Method to get the distribution of the PGs of a pool or the cluster on the OSDs
+        Args:
+            pool_name: name of the pool, all the PGs of the cluster if None
+        Examples::
+            before = obj.get_pg_distribution()
+            ...
+            after = obj.get_pg_distribution()
+            log.info(pg_analytics.diff(before.summary(), after.summary()))
+        Returns::
+            PGDistribution object, None if numpy is not installed
+        """
+        if not pg_analytics.available():
+            log.warning(
+                "numpy is not installed, PG distribution analytics not available"
+            )
+            return None
+
+        distribution = pg_analytics.PGDistribution.fetch(self, pool_name=pool_name)
+        log.debug(
+            f"PG distribution of {pool_name or 'the cluster'} : "
+            f"{json.dumps(distribution.summary())}"
+        )
+        return distribution
+
     def check_file_exists_on_client(self, loc) -> bool:
         """Method to check if a particular file/ directory exists on the ceph client node
 
@@ -2271,6 +2348,24 @@ class RadosOrchestrator:
             log.error(f"Hit exception collecting PG state for : {pg_id}. Error:  {err}")
             return False
 
+    def get_pg_states(self, pool_name: str = None) -> PGStates:
+        """Function to get the states of all the PGs of a pool or the cluster at once.
+
+        The PGs are fetched with a single command and evaluated in bulk, which is to be
+        preferred over calling get_pg_state() for every PG of a pool.
+        Example:
+            get_pg_states(pool_name="rbd").with_any("degraded undersized")
+        Args:
+            pool_name: name of the pool, all the PGs of the cluster if None
+
+        Returns: PGStates object
+        """
+        pg_states = PGStates.fetch(self, pool_name=pool_name)
+        log.debug(
+            f"States of the PGs of {pool_name or 'the cluster'}: {pg_states.counts()}"
+        )
+        return pg_states
+
     def get_osd_map(self, pool: str, obj: str, nspace: str = None) -> dict:
         """
         Retrieve the osd map for an object in a pool
@@ -2680,6 +2775,17 @@ class RadosOrchestrator:
         """
 
         pgid_list = []
+        if self.cluster_snapshot and self.cluster_snapshot.knows(
+            pool_name=pool_name, pool_id=pool_id, osd=osd, osd_primary=osd_primary
+        ):
+            return self.cluster_snapshot.pgids(
+                pool_name=pool_name,
+                pool_id=pool_id,
+                osd=osd,
+                osd_primary=osd_primary,
+                states=states,
+            )
+
         cmd = "ceph pg "
         if pool_name:
             cmd += f"ls-by-pool {pool_name}"
@@ -3021,58 +3127,28 @@ EOF"""
         Method to check if the provided pool has any PGs in inactive state.
         If no pool name is provided, then checks on the entire cluster.
 
-        Uses parallel execution to speed up PG state checks when pool_name is provided.
+        The states of all the PGs of the pool are fetched with a single command.
 
         Args:
             pool_name: Name of the pool, on which inactive PGs should be checked
-            max_workers: Number of parallel threads for PG state checks (default: 10)
+            max_workers: Unused, the PG states are no longer queried one at a time
 
         Returns: True-> Pass (no inactive PGs),  False -> Fail (inactive PGs found)
         """
         if pool_name:
             log.debug("Checking for inactive PGs on pool : %s", pool_name)
-            pool_pgids = self.get_pgid(pool_name=pool_name)
+            pg_states = self.get_pg_states(pool_name=pool_name)
 
-            if not pool_pgids:
+            if not len(pg_states):
                 log.warning("No PGs found for pool: %s", pool_name)
                 return True
 
-            log.debug(
-                "Checking %d PGs in parallel with %d workers",
-                len(pool_pgids),
-                max_workers,
-            )
-
-            def check_single_pg(pgid):
-                """Check if a single PG is in inactive/unknown state."""
-                pg_state = self.get_pg_state(pg_id=pgid)
-                if pg_state:
-                    if any("unknown" in key for key in pg_state.split("+")):
-                        return pgid, True, pg_state  # pgid, is_inactive, state
-                    return pgid, False, pg_state
-                else:
-                    log.error("PG : %s not present on cluster", pgid)
-                    return pgid, None, None  # PG not found
-
-            inactive_pgs = []
-            with cf.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                future_to_pgid = {
-                    executor.submit(check_single_pg, pgid): pgid for pgid in pool_pgids
-                }
-
-                for future in cf.as_completed(future_to_pgid):
-                    pgid = future_to_pgid[future]
-                    try:
-                        result_pgid, is_inactive, pg_state = future.result()
-                        if is_inactive:
-                            log.error(
-                                "PG: %s in inactive state (%s)", result_pgid, pg_state
-                            )
-                            inactive_pgs.append(result_pgid)
-                    except Exception as exc:
-                        log.error("PG %s check generated exception: %s", pgid, exc)
-
+            inactive_pgs = pg_states.with_any("unknown")
             if inactive_pgs:
+                for pgid in inactive_pgs[:10]:
+                    log.error(
+                        "PG: %s in inactive state (%s)", pgid, pg_states.state(pgid)
+                    )
                 log.error(
                     "Found %d inactive PGs on pool %s: %s",
                     len(inactive_pgs),
@@ -3083,7 +3159,7 @@ EOF"""
 
             log.info(
                 "Completed checking %d PGs on Pool %s. No inactive PGs found",
-                len(pool_pgids),
+                len(pg_states),
                 pool_name,
             )
             return True
@@ -3109,6 +3185,9 @@ EOF"""
         Returns: list of osd host names as used in the crush map
 
         """
+        if self.cluster_snapshot and self.cluster_snapshot.osd_hosts():
+            return self.cluster_snapshot.osd_hosts()
+
         cmd = "ceph osd tree"
         osds = self.run_ceph_command(cmd)
         return [entry["name"] for entry in osds["nodes"] if entry["type"] == "host"]
@@ -3806,8 +3885,9 @@ EOF"""
                  False -> Failure of scrub
 
         """
+        tracker = ScrubTracker(self, pgids=[pg_id], deep=False)
         if pg_dump is None:
-            init_pool_pg_dump = self.get_ceph_pg_dump(pg_id=pg_id)
+            init_pool_pg_dump = tracker.snapshot()[pg_id]
         else:
             init_pool_pg_dump = pg_dump
 
@@ -3822,60 +3902,24 @@ EOF"""
         log.info("scrub_duration : %s" % init_pool_pg_dump["scrub_duration"])
         log.info("=" * 70)
 
-        # Parse the timestamp string into a datetime object
-        init_scrub_stamp = datetime.datetime.strptime(
-            init_pool_pg_dump["last_scrub_stamp"], "%Y-%m-%dT%H:%M:%S.%f%z"
+        # Running scrub on the PG provided, the stamps are tracked against the initial dump
+        tracker.start(
+            trigger=user_initiated is True, baseline={pg_id: init_pool_pg_dump}
         )
         if user_initiated is True:
-            # Running scrub on the PG provided
-            log.debug(f"Initiating scrubbing on pg : {pg_id}")
-            self.run_scrub(pgid=pg_id)
-            time.sleep(2)
+            log.debug(f"Initiated scrub on pg : {pg_id}")
         else:
             log.debug("Initiated scheduled scrub")
 
-        start_time = datetime.datetime.now()
-        while datetime.datetime.now() <= start_time + datetime.timedelta(
-            seconds=wait_time
-        ):
-            pool_pg_dump = self.get_ceph_pg_dump(pg_id=pg_id)
-            log.debug("=" * 70)
-            log.debug("state : %s" % pool_pg_dump["state"])
-            log.debug("last_scrub : %s " % pool_pg_dump["last_scrub"])
-            log.debug("last_scrub_stamp: %s " % pool_pg_dump["last_scrub_stamp"])
-            log.debug("last_scrub_duration: %s" % pool_pg_dump["last_scrub_duration"])
-            log.debug("objects_scrubbed : %s" % pool_pg_dump["objects_scrubbed"])
-            log.debug("scrub_schedule : %s" % pool_pg_dump["scrub_schedule"])
-            log.debug("scrub_duration : %s" % pool_pg_dump["scrub_duration"])
-            log.debug("=" * 70)
-            current_scrub_stamp = datetime.datetime.strptime(
-                pool_pg_dump["last_scrub_stamp"], "%Y-%m-%dT%H:%M:%S.%f%z"
-            )
-            if current_scrub_stamp > init_scrub_stamp:
-                log.info(f"Scrubbing complete on the PG: {pg_id}")
-                log.debug(f"Final last_scrub: {pool_pg_dump['last_scrub']}")
-                log.debug(f"Final last_scrub_stamp: {pool_pg_dump['last_scrub_stamp']}")
-                log.debug(
-                    f"Total time taken for scrubbing to complete on the pg : {pg_id} is"
-                    f" {current_scrub_stamp - init_scrub_stamp}"
-                )
-                return True
-            else:
-                log.debug(f"Current last_scrub: {pool_pg_dump['last_scrub']}")
-                log.debug(
-                    f"Current last_scrub_stamp: {pool_pg_dump['last_scrub_stamp']}"
-                )
-                log.debug(
-                    f"Total time elapsed since starting scrub on PG: {pg_id} is"
-                    f" {current_scrub_stamp - init_scrub_stamp}"
-                )
-                log.info(
-                    f"scrub is yet to complete, pg state: {pool_pg_dump['state']}. Sleeping for 30 secs"
-                )
-                time.sleep(30)
-        else:
-            log.error(f"PG :{pg_id} could not be scrubbed in time")
-            raise Exception("Objects not scrubbed error")
+        if tracker.wait(timeout=wait_time, interval=30):
+            pool_pg_dump = tracker.current[pg_id]
+            log.info(f"Scrubbing complete on the PG: {pg_id}")
+            log.debug(f"Final last_scrub: {pool_pg_dump['last_scrub']}")
+            log.debug(f"Final last_scrub_stamp: {pool_pg_dump['last_scrub_stamp']}")
+            return True
+
+        log.error(f"PG :{pg_id} could not be scrubbed in time")
+        raise Exception("Objects not scrubbed error")
 
     def start_check_deep_scrub_complete(
         self, pg_id, pg_dump=None, user_initiated: bool = True, wait_time: int = 900
@@ -3891,8 +3935,9 @@ EOF"""
                  False -> Failure of scrub
 
         """
+        tracker = ScrubTracker(self, pgids=[pg_id], deep=True)
         if pg_dump is None:
-            init_pool_pg_dump = self.get_ceph_pg_dump(pg_id=pg_id)
+            init_pool_pg_dump = tracker.snapshot()[pg_id]
         else:
             init_pool_pg_dump = pg_dump
 
@@ -3909,67 +3954,24 @@ EOF"""
         log.info("scrub_duration : %s" % init_pool_pg_dump["scrub_duration"])
         log.info("=" * 70)
 
-        # Parse the timestamp string into a datetime object
-        init_scrub_stamp = datetime.datetime.strptime(
-            init_pool_pg_dump["last_deep_scrub_stamp"], "%Y-%m-%dT%H:%M:%S.%f%z"
-        )
-
+        # Running deep-scrub on the PG provided, the stamps are tracked against the initial dump
+        tracker.start(trigger=bool(user_initiated), baseline={pg_id: init_pool_pg_dump})
         if user_initiated:
-            # Running deep-scrub on the PG provided
-            log.debug(f"Initiating deep-scrubbing on pg : {pg_id}")
-            self.run_deep_scrub(pgid=pg_id)
-            time.sleep(2)
+            log.debug(f"Initiated deep-scrub on pg : {pg_id}")
         else:
             log.debug("Initiated scheduled deep-scrub")
 
-        start_time = datetime.datetime.now()
-        while datetime.datetime.now() <= start_time + datetime.timedelta(
-            seconds=wait_time
-        ):
-            pool_pg_dump = self.get_ceph_pg_dump(pg_id=pg_id)
-            log.debug("=" * 70)
-            log.debug("state : %s" % pool_pg_dump["state"])
-            log.debug("last_deep_scrub : %s " % pool_pg_dump["last_deep_scrub"])
+        if tracker.wait(timeout=wait_time, interval=30):
+            pool_pg_dump = tracker.current[pg_id]
+            log.info(f"Scrubbing complete on the PG: {pg_id}")
+            log.debug(f"Final last_deep_scrub: {pool_pg_dump['last_deep_scrub']}")
             log.debug(
-                "last_deep_scrub_stamp: %s " % pool_pg_dump["last_deep_scrub_stamp"]
+                f"Final last_deep_scrub_stamp: {pool_pg_dump['last_deep_scrub_stamp']}"
             )
-            log.debug("last_scrub_duration: %s" % pool_pg_dump["last_scrub_duration"])
-            log.debug("objects_scrubbed : %s" % pool_pg_dump["objects_scrubbed"])
-            log.debug("scrub_schedule : %s" % pool_pg_dump["scrub_schedule"])
-            log.debug("scrub_duration : %s" % pool_pg_dump["scrub_duration"])
-            log.debug("=" * 70)
-            # Parse the timestamp string into a datetime object
-            current_scrub_stamp = datetime.datetime.strptime(
-                pool_pg_dump["last_deep_scrub_stamp"], "%Y-%m-%dT%H:%M:%S.%f%z"
-            )
-            if current_scrub_stamp > init_scrub_stamp:
-                log.info(f"Scrubbing complete on the PG: {pg_id}")
+            return True
 
-                log.debug(f"Final last_deep_scrub: {pool_pg_dump['last_deep_scrub']}")
-                log.debug(
-                    f"Final last_deep_scrub_stamp: {pool_pg_dump['last_deep_scrub_stamp']}"
-                )
-                log.debug(
-                    f"Total time taken for scrubbing to complete on the pg : {pg_id} is"
-                    f" {current_scrub_stamp - init_scrub_stamp}"
-                )
-                return True
-            else:
-                log.debug(f"Current last_deep_scrub: {pool_pg_dump['last_deep_scrub']}")
-                log.debug(
-                    f"Current last_deep_scrub_stamp: {pool_pg_dump['last_deep_scrub_stamp']}"
-                )
-                log.debug(
-                    f"Total time elapsed since starting deep-scrub on PG: {pg_id} is"
-                    f" {current_scrub_stamp - init_scrub_stamp}"
-                )
-                log.info(
-                    f"Deep-scrub is yet to complete, pg state: {pool_pg_dump['state']}. Sleeping for 30 secs"
-                )
-                time.sleep(30)
-        else:
-            log.error(f"PG : {pg_id} could not be deep-scrubbed in time")
-            raise Exception("Objects not scrubbed error")
+        log.error(f"PG : {pg_id} could not be deep-scrubbed in time")
+        raise Exception("Objects not scrubbed error")
 
     def crash_ceph_daemon(self, daemon: str, id, manual_inject: bool = False):
         """
@@ -4971,6 +4973,12 @@ EOF"""
         Returns:
             pool ID in integer format
         """
+        if (
+            self.cluster_snapshot
+            and self.cluster_snapshot.pool_id(pool_name) is not None
+        ):
+            return self.cluster_snapshot.pool_id(pool_name)
+
         _cmd = f"ceph osd pool stats {pool_name}"
         out = self.run_ceph_command(cmd=_cmd, client_exec=True)
         return int(out[0]["pool_id"])
@@ -5229,6 +5237,9 @@ EOF"""
         Returns:
             o/p of "ceph osd tree <status>"
         """
+        if self.cluster_snapshot and self.cluster_snapshot.osds:
+            return self.cluster_snapshot.osd_list(status)
+
         osd_dict = {"up": [], "down": [], "in": [], "out": [], "destroyed": []}
         # prepare separate OSD lists
         for key in osd_dict:
@@ -7121,23 +7132,21 @@ EOF"""
             all_pg_active_clean = True
             if test_pool:
                 log.debug(f"Checking for active + clean PGs on pool: {test_pool}")
-                pool_pg_ids = self.get_pgid(pool_name=test_pool)
-                for pg_id in pool_pg_ids:
-                    try:
-                        pg_state = self.get_pg_state(pg_id=pg_id)
-                    except Exception as err:
-                        log.error(f"PGID : {pg_id} was not found, err: {err}")
-                        continue
-                    if any(key in health_warnings for key in pg_state.split("+")):
-                        all_pg_active_clean = False
-                        log.debug(
-                            f"PG: {pg_id} in states: {pg_state}"
-                            f"Waiting for active + clean. "
-                        )
-                        break
-                    log.info(
-                        f" PG: {pg_id} in state: {pg_state}."
-                        f" Checking status on next PG in the pool"
+                try:
+                    pg_states = self.get_pg_states(pool_name=test_pool)
+                    pending_pgs = pg_states.with_any(health_warnings)
+                except Exception as err:
+                    log.error(
+                        f"PGs of pool {test_pool} could not be fetched, err: {err}"
+                    )
+                    all_pg_active_clean = False
+                    pending_pgs = []
+                if pending_pgs:
+                    all_pg_active_clean = False
+                    log.debug(
+                        f"{len(pending_pgs)} PGs of pool {test_pool} not yet active + clean,"
+                        f" e.g. PG: {pending_pgs[0]} in states: {pg_states.state(pending_pgs[0])}."
+                        f" PG States: {pg_states.counts()}"
                     )
             else:
                 try:
@@ -7,6 +7,7 @@ import time
 from math import floor
 
 from ceph.ceph_admin import CephAdmin
+from ceph.rados.bench_engine import BenchReport, CoordinatedBench
 from ceph.rados.core_workflows import RadosOrchestrator
 from utility.log import Log
 from utility.utils import method_should_succeed
@@ -140,6 +141,42 @@ class PerfWorkflows:
         time.sleep(5)
         return self.capture_radosbench_pid(node=node)
 
+    def run_coordinated_bench(
+        self,
+        pool_name: str,
+        clients: list = None,
+        artifact_dir: str = None,
+        baseline: str = None,
+        tolerance: float = 0.1,
+        **bench_cfg,
+    ):
+        """
+        Method to run radosbench on multiple clients with a synchronized start
+        and to compare the aggregated results with an earlier run
+        Args:
+            pool_name: pool where the bench is run
+            clients: list of client node objects, all the client nodes if None
+            artifact_dir: directory where the report is saved as JSON
+            baseline: path of the report of an earlier run on the same hardware
+            tolerance: allowed relative deterioration of the metrics compared to the baseline
+            bench_cfg: mode, seconds, object_size, threads of CoordinatedBench
+        Returns:
+            tuple of the BenchReport and the list of regressions against the baseline
+        """
+        bench = CoordinatedBench(
+            clients=clients or self.clients, pool_name=pool_name, **bench_cfg
+        )
+        report = bench.run()
+        if artifact_dir:
+            report.save(artifact_dir)
+
+        regressions = []
+        if baseline:
+            regressions = report.compare(BenchReport.load(baseline), tolerance)
+            for regression in regressions:
+                log.error(f"rados bench regression against {baseline} : {regression}")
+        return report, regressions
+
     @staticmethod
     def capture_radosbench_pid(node) -> int:
         """
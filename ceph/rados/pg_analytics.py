@@ -0,0 +1,271 @@
+"""
+This module computes the PG distribution and balance metrics of a cluster with NumPy.
+
+The balancer, read balancer and autoscaler tests judge the distribution of the
+PGs over the OSDs. PGDistribution turns a PG dump into arrays i.e. a PG x acting
+OSDs matrix and the primaries, bytes and objects of every PG, from which the
+metrics are computed in vectorized form:
+ 1. PGs and primaries per OSD, PGs per host
+ 2. standard deviation of the PGs per OSD and primary skew
+ 3. read balance score of every pool, as reported in osd pool ls detail
+ 4. per host imbalance
+
+The summary is plain JSON, hence the distribution before and after a change can
+be saved with the test logs and compared::
+
+    before = rados_obj.get_pg_distribution()
+    rados_obj.enable_balancer(balancer_mode="upmap-read")
+    after = rados_obj.get_pg_distribution()
+    log.info(diff(before.summary(), after.summary()))
+
+NumPy is installed from requirements.txt and test_requirements.txt, it is not
+a dependency of the cephci package hence the module still imports without it.
+"""
+
+import math
+from itertools import chain
+
+from utility.log import Log
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+log = Log(__name__)
+
+# Placeholder of a missing shard in the acting set of EC pools
+CRUSH_ITEM_NONE = 2147483647
+
+
+def available() -> bool:
+    """Returns True when NumPy is installed."""
+    return np is not None
+
+
+def _ratio(value, mean):
+    return round(float(value / mean), 4) if mean else 0.0
+
+
+class PGDistribution:
+    """Placement of a set of PGs on the OSDs."""
+
+    def __init__(self, pg_stats, osds_by_host: dict = None):
+        """
+        Builds the arrays from the PG stats
+        Args:
+            pg_stats: list of PG stats as in the pg_stats of the pg ls and pg dump pgs commands,
+                the bytes and objects are taken from stat_sum when present
+            osds_by_host: OSD ids by host name, OSDs without PGs are counted only if listed here
+        """
+        if np is None:
+            raise ImportError(
+                "PG distribution analytics needs numpy, pip install numpy"
+            )
+
+        pg_stats = list(pg_stats)
+        self.osds_by_host = osds_by_host or dict()
+        self.pgids = [pg["pgid"] for pg in pg_stats]
+        self.pools = np.array(
+            [int(pgid.split(".")[0]) for pgid in self.pgids], dtype=np.int64
+        )
+        self.primaries = np.array(
+            [pg.get("acting_primary", -1) for pg in pg_stats], dtype=np.int64
+        )
+        self.bytes = np.array(
+            [pg.get("stat_sum", {}).get("num_bytes", 0) for pg in pg_stats],
+            dtype=np.int64,
+        )
+        self.objects = np.array(
+            [pg.get("stat_sum", {}).get("num_objects", 0) for pg in pg_stats],
+            dtype=np.int64,
+        )
+
+        # PG x acting OSDs, the rows are padded with -1
+        acting = [pg.get("acting", []) for pg in pg_stats]
+        lengths = np.fromiter(map(len, acting), dtype=np.int64, count=len(acting))
+        flat = np.fromiter(chain.from_iterable(acting), dtype=np.int64)
+        flat[flat == CRUSH_ITEM_NONE] = -1
+        self.acting = np.full((len(acting), int(lengths.max(initial=0))), -1, np.int64)
+        rows = np.repeat(np.arange(len(acting)), lengths)
+        cols = np.arange(len(flat)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        self.acting[rows, cols] = flat
+
+        hosted = list(chain.from_iterable(self.osds_by_host.values()))
+        self.osd_ids = np.union1d(self.acting[self.acting >= 0], hosted).astype(
+            np.int64
+        )
+
+    @classmethod
+    def fetch(cls, rados_obj, pool_name: str = None):
+        """
+        Fetches the PGs of the pool or the cluster and the OSD hosts
+        Args:
+            rados_obj: RadosOrchestrator object to run commands
+            pool_name: name of the pool, all the PGs of the cluster if None
+        Returns:
+            PGDistribution object
+        """
+        if pool_name:
+            cmd = f"ceph pg ls-by-pool {pool_name}"
+        else:
+            cmd = "ceph pg dump pgs"
+
+        out = rados_obj.run_ceph_command(
+            cmd=cmd, client_exec=True, spool_size=64 * 1048576
+        )
+        pg_stats = out.get("pg_stats") if isinstance(out, dict) else out
+
+        if rados_obj.cluster_snapshot:
+            osds_by_host = rados_obj.cluster_snapshot.osds_by_host
+        else:
+            nodes = rados_obj.run_ceph_command(cmd="ceph osd tree")["nodes"]
+            osds = {node["id"] for node in nodes if node["type"] == "osd"}
+            osds_by_host = {
+                node["name"]: [c for c in node.get("children", []) if c in osds]
+                for node in nodes
+                if node["type"] == "host"
+            }
+
+        return cls(pg_stats or [], osds_by_host=osds_by_host)
+
+    def __len__(self):
+        return len(self.pgids)
+
+    def pool(self, pool_id: int):
+        """Returns the distribution of the PGs of the pool."""
+        subset = PGDistribution.__new__(PGDistribution)
+        selected = self.pools == pool_id
+        subset.osds_by_host = self.osds_by_host
+        subset.pgids = [p for p, s in zip(self.pgids, selected) if s]
+        for attr in ("pools", "primaries", "bytes", "objects", "acting"):
+            setattr(subset, attr, getattr(self, attr)[selected])
+        subset.osd_ids = self.osd_ids
+        return subset
+
+    def _per_osd(self, osds, weights=None):
+        """Sums the weights per OSD in the order of osd_ids, counts when no weights."""
+        valid = osds >= 0
+        size = int(max(self.osd_ids.max(initial=-1), osds.max(initial=-1))) + 1
+        totals = np.bincount(
+            osds[valid],
+            weights=None if weights is None else weights[valid],
+            minlength=size,
+        )
+        return totals[self.osd_ids]
+
+    def pg_counts(self):
+        """Returns the number of PGs, replicas and shards included, of every OSD."""
+        return self._per_osd(self.acting.ravel())
+
+    def primary_counts(self):
+        """Returns the number of PGs of which every OSD is the acting primary."""
+        return self._per_osd(self.primaries)
+
+    def osd_bytes(self):
+        """Returns the bytes stored by every OSD, replicas and shards included."""
+        weights = np.repeat(self.bytes, self.acting.shape[1]).astype(np.float64)
+        return self._per_osd(self.acting.ravel(), weights=weights)
+
+    def pg_stddev(self) -> float:
+        """Returns the standard deviation of the PGs per OSD."""
+        counts = self.pg_counts()
+        return round(float(counts.std()), 4) if counts.size else 0.0
+
+    def primary_skew(self) -> float:
+        """Returns the ratio of the most primaries on an OSD to the average."""
+        counts = self.primary_counts()
+        return _ratio(counts.max(), counts.mean()) if counts.size else 0.0
+
+    def read_balance_scores(self) -> dict:
+        """
+        Returns the read balance score of every pool by pool id
+
+        Like the score_acting of osd pool ls detail, the raw score is the ratio of
+        the most primaries on an OSD of the pool to the average, divided by the
+        best score achievable with the number of PGs and OSDs of the pool.
+        """
+        scores = dict()
+        for pool_id in np.unique(self.pools):
+            selected = self.pools == pool_id
+            primaries = self.primaries[selected]
+            primaries = primaries[primaries >= 0]
+            osds = np.unique(self.acting[selected])
+            osds = osds[osds >= 0]
+            if not primaries.size or not osds.size:
+                continue
+
+            average = primaries.size / osds.size
+            raw_score = np.bincount(primaries).max() / average
+            optimal_score = math.ceil(average) / average
+            scores[int(pool_id)] = round(float(raw_score / optimal_score), 4)
+        return scores
+
+    def host_pg_counts(self) -> dict:
+        """Returns the number of PGs on the OSDs of every host."""
+        counts = dict(zip(self.osd_ids.tolist(), self.pg_counts().tolist()))
+        return {
+            host: int(sum(counts.get(osd, 0) for osd in osds))
+            for host, osds in self.osds_by_host.items()
+        }
+
+    def host_imbalance(self) -> dict:
+        """Returns the ratio of the PGs per OSD of every host to the cluster average."""
+        counts = dict(zip(self.osd_ids.tolist(), self.pg_counts().tolist()))
+        mean = np.mean(list(counts.values())) if counts else 0
+        return {
+            host: _ratio(np.mean([counts.get(osd, 0) for osd in osds]), mean)
+            for host, osds in self.osds_by_host.items()
+            if osds
+        }
+
+    def summary(self) -> dict:
+        """Returns the metrics of the distribution as JSON serializable dictionary."""
+        osds = [str(osd) for osd in self.osd_ids.tolist()]
+        host_imbalance = self.host_imbalance()
+        return {
+            "pgs": len(self),
+            "osds": len(osds),
+            "objects": int(self.objects.sum()),
+            "bytes": int(self.bytes.sum()),
+            "pg_stddev": self.pg_stddev(),
+            "primary_skew": self.primary_skew(),
+            "max_host_imbalance": max(host_imbalance.values(), default=0.0),
+            "pg_counts": dict(zip(osds, self.pg_counts().astype(int).tolist())),
+            "primary_counts": dict(
+                zip(osds, self.primary_counts().astype(int).tolist())
+            ),
+            "osd_bytes": dict(zip(osds, self.osd_bytes().astype(int).tolist())),
+            "read_balance_scores": {
+                str(pool): score for pool, score in self.read_balance_scores().items()
+            },
+            "host_pg_counts": self.host_pg_counts(),
+            "host_imbalance": host_imbalance,
+        }
+
+
+def diff(before: dict, after: dict) -> dict:
+    """
+    Compares two distribution summaries
+    Args:
+        before: summary before the change
+        after: summary after the change
+    Returns:
+        dictionary of the changed metrics with their before and after values,
+        the metrics per OSD, pool or host hold only the changed members
+    """
+    changes = dict()
+    for key in sorted(set(before) | set(after)):
+        old, new = before.get(key), after.get(key)
+        if isinstance(old, dict) or isinstance(new, dict):
+            old, new = old or dict(), new or dict()
+            members = {
+                member: {"before": old.get(member), "after": new.get(member)}
+                for member in sorted(set(old) | set(new))
+                if old.get(member) != new.get(member)
+            }
+            if members:
+                changes[key] = members
+        elif old != new:
+            changes[key] = {"before": old, "after": new}
+    return changes
@@ -0,0 +1,200 @@
+"""
+This module evaluates the states of all the PGs of a pool or cluster in bulk.
+
+Checking the PGs one ``ceph pg <pgid> query`` at a time costs a round trip per
+PG, thousands of them for a large pool. PGStates is built from a single
+``ceph pg ls-by-pool`` or ``ceph pg dump pgs_brief`` and keeps the PGs in
+compact parallel arrays:
+ 1. the state of every PG as a bitmask of its state tokens
+ 2. the pool id and acting primary of every PG
+ 3. the acting sets flattened into one array with the PG index of every entry
+
+The questions asked by the waits are answered by filtering the arrays::
+
+    pg_states = rados_obj.get_pg_states(pool_name="rbd")
+    if pg_states.not_active():
+        ...
+    degraded = pg_states.with_any("degraded undersized")
+    on_osd = pg_states.on_osd(3)
+"""
+
+from array import array
+from collections import Counter
+from itertools import compress
+
+from utility.log import Log
+
+log = Log(__name__)
+
+# State tokens as printed by pg_state_string(), a bit is assigned to each of them
+PG_STATES = (
+    "creating",
+    "active",
+    "clean",
+    "down",
+    "recovery_unfound",
+    "backfill_unfound",
+    "scrubbing",
+    "degraded",
+    "inconsistent",
+    "peering",
+    "repair",
+    "recovering",
+    "forced_recovery",
+    "backfill_wait",
+    "incomplete",
+    "stale",
+    "remapped",
+    "deep",
+    "backfilling",
+    "forced_backfill",
+    "backfill_toofull",
+    "recovery_wait",
+    "recovery_toofull",
+    "undersized",
+    "activating",
+    "peered",
+    "snaptrim",
+    "snaptrim_wait",
+    "snaptrim_error",
+    "failed_repair",
+    "laggy",
+    "wait",
+    "premerge",
+    "unknown",
+)
+
+
+class PGStates:
+    """States, acting sets and primaries of a set of PGs."""
+
+    def __init__(self, pg_stats):
+        """
+        Parses the PG stats into the arrays
+        Args:
+            pg_stats: list of PG stats as in the pg_stats of the pg ls and pg dump commands,
+                every entry needs the pgid, state, acting and acting_primary keys
+        """
+        self._bits = {state: 1 << idx for idx, state in enumerate(PG_STATES)}
+        self.pgids = []
+        self.pools = array("l")
+        self.states = array("Q")
+        self.primaries = array("l")
+        self.acting = array("l")
+        self.acting_pg = array("L")
+
+        for idx, pg in enumerate(pg_stats):
+            self.pgids.append(pg["pgid"])
+            self.pools.append(int(pg["pgid"].split(".")[0]))
+            self.states.append(self.mask(pg["state"].split("+"), add=True))
+            self.primaries.append(pg.get("acting_primary", -1))
+            for osd in pg.get("acting", []):
+                self.acting.append(osd)
+                self.acting_pg.append(idx)
+
+        self._index = {pgid: idx for idx, pgid in enumerate(self.pgids)}
+
+    @classmethod
+    def fetch(cls, rados_obj, pool_name: str = None):
+        """
+        Fetches the PGs of the pool or the cluster with a single command
+        Args:
+            rados_obj: RadosOrchestrator object to run commands
+            pool_name: name of the pool, all the PGs of the cluster if None
+        Returns:
+            PGStates object
+        """
+        if pool_name:
+            cmd = f"ceph pg ls-by-pool {pool_name}"
+        else:
+            cmd = "ceph pg dump pgs_brief"
+
+        out = rados_obj.run_ceph_command(cmd=cmd, client_exec=True)
+        # Up to Octopus the brief dump is a plain list
+        pg_stats = out.get("pg_stats") if isinstance(out, dict) else out
+        return cls(pg_stats or [])
+
+    def mask(self, states, add: bool = False) -> int:
+        """
+        Returns the bitmask of the state tokens
+        Args:
+            states: space separated string or iterable of state tokens
+            add: assign a bit to the unknown tokens, otherwise they are ignored
+        Returns:
+            bitmask of the states
+        """
+        if isinstance(states, str):
+            states = states.split()
+
+        _mask = 0
+        for state in states:
+            if state not in self._bits and add:
+                self._bits[state] = 1 << len(self._bits)
+            _mask |= self._bits.get(state, 0)
+        return _mask
+
+    def __len__(self):
+        return len(self.pgids)
+
+    def __contains__(self, pgid):
+        return pgid in self._index
+
+    def state(self, pgid: str) -> str:
+        """Returns the state string of the PG, None if not present."""
+        idx = self._index.get(pgid)
+        if idx is None:
+            return None
+
+        return self._state_string(self.states[idx])
+
+    def _state_string(self, mask: int) -> str:
+        return "+".join(name for name, bit in self._bits.items() if mask & bit)
+
+    def with_any(self, states) -> list:
+        """Returns the PGs in at least one of the states."""
+        mask = self.mask(states)
+        return list(compress(self.pgids, [s & mask for s in self.states]))
+
+    def with_all(self, states) -> list:
+        """Returns the PGs in all of the states."""
+        if isinstance(states, str):
+            states = states.split()
+        if not states or not all(state in self._bits for state in states):
+            return []
+
+        mask = self.mask(states)
+        return list(compress(self.pgids, [s & mask == mask for s in self.states]))
+
+    def without(self, states) -> list:
+        """Returns the PGs in none of the states."""
+        mask = self.mask(states)
+        return list(compress(self.pgids, [not s & mask for s in self.states]))
+
+    def not_active(self) -> list:
+        """Returns the PGs which are not active."""
+        return self.without("active")
+
+    def not_clean(self) -> list:
+        """Returns the PGs which are not active+clean."""
+        mask = self.mask("active clean")
+        return list(compress(self.pgids, [s & mask != mask for s in self.states]))
+
+    def in_pool(self, pool_id: int) -> list:
+        """Returns the PGs of the pool."""
+        return list(compress(self.pgids, [p == pool_id for p in self.pools]))
+
+    def on_osd(self, osd: int) -> list:
+        """Returns the PGs whose acting set includes the OSD."""
+        return [
+            self.pgids[idx]
+            for idx, _osd in zip(self.acting_pg, self.acting)
+            if _osd == osd
+        ]
+
+    def primary_on(self, osd: int) -> list:
+        """Returns the PGs whose acting primary is the OSD."""
+        return list(compress(self.pgids, [p == osd for p in self.primaries]))
+
+    def counts(self) -> dict:
+        """Returns the number of PGs by state string, like num_pg_by_state."""
+        return {self._state_string(m): c for m, c in Counter(self.states).items()}
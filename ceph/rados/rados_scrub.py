@@ -242,22 +242,17 @@ class RadosScrubber(RadosOrchestrator):
         end_time = datetime.datetime.now() + datetime.timedelta(minutes=wait_time)
         is_scrubbing = False
         while end_time > datetime.datetime.now():
-            is_scrubbing = False
-            out_put = self.run_ceph_command(cmd="ceph -s")
-            log.info(f"The cluster status is -{out_put}")
-            for state in out_put["pgmap"]["pgs_by_state"]:
-                if "scrubbing" in state["state_name"]:
-                    log.info(f"The {state['state_name']} is in progress")
-                    is_scrubbing = True
-            cmd = "ceph pg dump pgs"
-            pg_stats = self.run_ceph_command(cmd)
-            for pg in pg_stats["pg_stats"]:
-                if "scrubbing" in pg["state"]:
-                    log.info(f"The {pg['stat']} is in progress on {pg['pgid']} ")
-                    is_scrubbing = True
-            if is_scrubbing:
-                log.info("Scrubbing is isn progress.Wait for 30 seconds")
-                time.sleep(30)
+            pg_states = self.get_pg_states()
+            scrubbing_pgs = pg_states.with_any("scrubbing")
+            is_scrubbing = bool(scrubbing_pgs)
+            if not is_scrubbing:
+                break
+            for pg_id in scrubbing_pgs:
+                log.info(f"The {pg_states.state(pg_id)} is in progress on {pg_id} ")
+            log.info(
+                f"Scrubbing is in progress on {len(scrubbing_pgs)} PGs. Wait for 30 seconds"
+            )
+            time.sleep(30)
         if is_scrubbing:
             log.error("Scrubbing still in progress")
             return False
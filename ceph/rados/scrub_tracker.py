@@ -0,0 +1,317 @@
+"""
+This module tracks the completion of scrubs and deep-scrubs using stamp snapshots.
+
+Waiting for a scrub used to mean fetching the PG stats of a single PG every 30
+seconds until its stamp moved, one PG after the other. A ScrubTracker instead
+takes one snapshot of the last_scrub_stamp and last_deep_scrub_stamp of all the
+tracked PGs, triggers the scrub of all of them in a batch i.e. a pool scrub,
+used as well when all the PGs of a pool are tracked, or a few remote sessions
+of pg scrub commands, and diffs the later snapshots against
+the baseline. Every interval costs a single ceph call per pool however many PGs
+are tracked::
+
+    tracker = ScrubTracker(rados_obj, pool_name="rbd", deep=True)
+    tracker.start()
+    if not tracker.wait(timeout=1800):
+        log.error(f"PGs not deep-scrubbed : {tracker.stragglers()}")
+
+The progress reports the PGs scrubbed since the baseline, the scrub rate per
+minute and the stragglers, i.e. the pending PGs with the oldest stamps.
+"""
+
+import datetime
+import time
+from collections import namedtuple
+
+from ceph.ceph import CommandFailed
+from utility.log import Log
+from utility.poll import Poller
+
+log = Log(__name__)
+
+STAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f%z"
+# Maximum number of PGs whose scrub stats are logged when the progress moves
+LOGGED_PGS = 10
+# Maximum number of pg scrub commands sent in a remote session
+TRIGGER_BATCH = 32
+
+ScrubProgress = namedtuple(
+    "ScrubProgress", ["total", "completed", "pending", "scrubbing", "elapsed", "rate"]
+)
+
+
+def parse_stamp(stamp: str):
+    """Returns the scrub stamp as datetime, the epoch for unset or unknown stamps."""
+    try:
+        return datetime.datetime.strptime(stamp, STAMP_FORMAT)
+    except (TypeError, ValueError):
+        return datetime.datetime.fromtimestamp(0, datetime.timezone.utc)
+
+
+class ScrubTracker:
+    """Tracks the scrubs of the PGs of a pool, a list of PGs or the cluster."""
+
+    def __init__(
+        self, rados_obj, pool_name: str = None, pgids: list = None, deep: bool = False
+    ):
+        """
+        Initializes the tracker
+        Args:
+            rados_obj: RadosOrchestrator object to run commands
+            pool_name: track all the PGs of the pool
+            pgids: track the given PGs, ignored when pool_name is given
+            deep: track deep-scrubs instead of scrubs
+        If neither pool_name nor pgids is given, all the PGs of the cluster are tracked.
+        """
+        self.rados_obj = rados_obj
+        self.pool_name = pool_name
+        self.pgids = None if pool_name else pgids
+        self.deep = deep
+        self.stamp_key = "last_deep_scrub_stamp" if deep else "last_scrub_stamp"
+        self.version_key = "last_deep_scrub" if deep else "last_scrub"
+        self.operation = "deep-scrub" if deep else "scrub"
+        self.baseline = dict()
+        self.current = dict()
+        self.started = None
+
+    def snapshot(self) -> dict:
+        """
+        Fetches the stats of the tracked PGs with one call per pool
+        Returns:
+            dictionary of the PG stats by PG id
+        """
+        if self.pool_name:
+            cmds = [f"ceph pg ls-by-pool {self.pool_name}"]
+        elif self.pgids:
+            pool_ids = sorted({pgid.split(".")[0] for pgid in self.pgids})
+            cmds = [f"ceph pg ls {pool_id}" for pool_id in pool_ids]
+        else:
+            cmds = ["ceph pg dump pgs"]
+
+        pg_stats = dict()
+        for cmd in cmds:
+            out = self.rados_obj.run_ceph_command(
+                cmd=cmd, client_exec=True, spool_size=64 * 1048576
+            )
+            stats = out.get("pg_stats") if isinstance(out, dict) else out
+            pg_stats.update({pg["pgid"]: pg for pg in stats or []})
+
+        if self.pgids:
+            pg_stats = {pgid: pg_stats[pgid] for pgid in self.pgids if pgid in pg_stats}
+        return pg_stats
+
+    def start(self, trigger: bool = True, baseline: dict = None):
+        """
+        Takes the baseline snapshot and triggers the scrub of the tracked PGs
+        Args:
+            trigger: trigger the scrubs, False to track the scheduled scrubs
+            baseline: stamps of the PGs by PG id captured earlier,
+                e.g. get_scrub_stamps() output, taken from the cluster if None
+        Returns:
+            dictionary of the baseline PG stats by PG id
+        """
+        self.baseline = baseline if baseline else self.snapshot()
+        self.current = self.baseline
+        log.info(
+            f"Captured the {self.stamp_key} of {len(self.baseline)} PGs of "
+            f"{self.scope} as baseline"
+        )
+
+        if trigger:
+            self.trigger()
+        self.started = time.monotonic()
+        return self.baseline
+
+    @property
+    def scope(self) -> str:
+        if self.pool_name:
+            return f"pool {self.pool_name}"
+        if self.pgids:
+            return f"PGs {self.pgids[:10]}"
+        return "the cluster"
+
+    def trigger(self):
+        """
+        Triggers the scrub of all the tracked PGs in a batch
+        Raises:
+            CommandFailed when the scrub could not be initiated
+        """
+        if self.pool_name:
+            cmds = [f"ceph osd pool {self.operation} {self.pool_name}"]
+        elif self.pgids:
+            cmds = self.pg_commands()
+        else:
+            cmds = [f"ceph osd {self.operation} all"]
+
+        log.debug(f"Initiating {self.operation} on {self.scope}")
+        failures = []
+        for idx in range(0, len(cmds), TRIGGER_BATCH):
+            batch = cmds[idx : idx + TRIGGER_BATCH]
+            results = self.rados_obj.client.exec_batch(
+                batch, sudo=True, stop_on_error=False, check_ec=False
+            )
+            failures.extend(
+                f"{cmd} : {err}"
+                for cmd, (_, err, rc, _) in zip(batch, results)
+                if rc != 0
+            )
+        if failures:
+            raise CommandFailed(
+                f"Could not initiate {self.operation} on {self.scope} : {failures}"
+            )
+
+    def pg_commands(self) -> list:
+        """
+        Returns the commands scrubbing the tracked PGs
+        The pools whose PGs are all tracked are scrubbed with a pool command.
+        """
+        by_pool = dict()
+        for pgid in dict.fromkeys(self.pgids):
+            by_pool.setdefault(pgid.split(".")[0], []).append(pgid)
+
+        pools = dict()
+        if len(self.pgids) > 1:
+            out = self.rados_obj.run_ceph_command(
+                cmd="ceph osd pool ls detail", client_exec=True
+            )
+            pools = {str(pool["pool_id"]): pool for pool in out or []}
+
+        cmds = []
+        for pool_id, pgids in by_pool.items():
+            pool = pools.get(pool_id)
+            if pool and len(pgids) == pool.get("pg_num"):
+                cmds.append(f"ceph osd pool {self.operation} {pool['pool_name']}")
+            else:
+                cmds.extend(f"ceph pg {self.operation} {pgid}" for pgid in pgids)
+        return cmds
+
+    def completed(self, pg_stats: dict = None) -> list:
+        """Returns the PGs whose stamp moved past the baseline."""
+        pg_stats = self.current if pg_stats is None else pg_stats
+        return [
+            pgid
+            for pgid, pg in pg_stats.items()
+            if pgid in self.baseline
+            and parse_stamp(pg[self.stamp_key])
+            > parse_stamp(self.baseline[pgid][self.stamp_key])
+        ]
+
+    def progress(self) -> ScrubProgress:
+        """
+        Takes a snapshot and diffs it against the baseline
+        Returns:
+            ScrubProgress of the tracked PGs, the rate is in PGs scrubbed per minute
+        """
+        self.current = self.snapshot()
+        completed = set(self.completed())
+        elapsed = time.monotonic() - self.started if self.started else 0
+        pending = [pgid for pgid in self.baseline if pgid not in completed]
+        scrubbing = [
+            pgid
+            for pgid in pending
+            if "scrubbing" in self.current.get(pgid, {}).get("state", "")
+        ]
+        rate = round(len(completed) * 60 / elapsed, 2) if elapsed else 0.0
+        return ScrubProgress(
+            len(self.baseline), len(completed), pending, scrubbing, elapsed, rate
+        )
+
+    def stragglers(self, limit: int = 10) -> dict:
+        """
+        Returns the pending PGs with the oldest stamps in the last snapshot
+        Args:
+            limit: maximum number of PGs returned
+        Returns:
+            dictionary of the state and stamp of the PGs by PG id
+        """
+        completed = set(self.completed())
+        pending = [pgid for pgid in self.baseline if pgid not in completed]
+        pending.sort(
+            key=lambda pgid: parse_stamp(
+                self.current.get(pgid, self.baseline[pgid])[self.stamp_key]
+            )
+        )
+        return {
+            pgid: {
+                "state": self.current.get(pgid, {}).get("state"),
+                self.stamp_key: self.current.get(pgid, self.baseline[pgid])[
+                    self.stamp_key
+                ],
+            }
+            for pgid in pending[:limit]
+        }
+
+    def log_pgs(self, pgids: list, final: bool = False):
+        """
+        Logs the scrub stats of the PGs in the last snapshot at debug level
+        Args:
+            pgids: PGs to log, the first LOGGED_PGS of them are logged
+            final: the scrub completed on the PGs
+        """
+        for pgid in pgids[:LOGGED_PGS]:
+            pg = self.current.get(pgid, {})
+            if final:
+                elapsed = parse_stamp(pg.get(self.stamp_key)) - parse_stamp(
+                    self.baseline[pgid][self.stamp_key]
+                )
+                log.debug(
+                    f"Final {self.version_key} of {pgid}: {pg.get(self.version_key)}"
+                )
+                log.debug(f"Final {self.stamp_key} of {pgid}: {pg.get(self.stamp_key)}")
+                log.debug(
+                    f"Total time taken for {self.operation} to complete on the pg : {pgid} is {elapsed}"
+                )
+                continue
+
+            log.debug("=" * 70)
+            log.debug(f"pgid : {pgid}")
+            for key in (
+                "state",
+                self.version_key,
+                self.stamp_key,
+                "last_scrub_duration",
+                "objects_scrubbed",
+                "scrub_schedule",
+                "scrub_duration",
+            ):
+                log.debug(f"{key} : {pg.get(key)}")
+            log.debug("=" * 70)
+
+    def wait(self, timeout: int = 900, interval: int = 30) -> bool:
+        """
+        Waits until all the tracked PGs are scrubbed
+        Args:
+            timeout: maximum seconds to wait
+            interval: maximum seconds between the snapshots
+        Returns:
+            True -> all the PGs scrubbed, False -> timeout
+        """
+        if self.started is None:
+            self.start(trigger=False)
+
+        # The stats of the pending PGs are logged when the progress moves
+        logged = None
+        for _ in Poller(timeout=timeout, interval=interval, min_interval=5):
+            progress = self.progress()
+            if not progress.pending:
+                self.log_pgs(self.completed(), final=True)
+                log.info(
+                    f"{self.operation} complete on {progress.total} PGs of {self.scope} "
+                    f"in {progress.elapsed:.0f} seconds, {progress.rate} PGs per minute"
+                )
+                return True
+
+            log.info(
+                f"{self.operation} yet to complete on {self.scope} : "
+                f"{progress.completed}/{progress.total} PGs done, "
+                f"{len(progress.scrubbing)} scrubbing, {progress.rate} PGs per minute"
+            )
+            if progress.completed != logged:
+                self.log_pgs(progress.pending)
+                logged = progress.completed
+
+        log.error(
+            f"{self.operation} not complete on {len(progress.pending)} PGs of "
+            f"{self.scope} within {timeout} seconds. Stragglers : {self.stragglers()}"
+        )
+        return False
@@ -0,0 +1,368 @@
+# -*- code: utf-8 -*-
+"""
+This module provides a persistent command execution agent for remote nodes.
+
+Instead of opening a new SSH session and spawning a shell for every command,
+a small Python agent is pushed to the node once and serves a JSON-lines
+request/response protocol over a single long-lived channel.
+
+Protocol (one JSON document per line)::
+
+    request     {"id": 1, "cmd": "uptime", "timeout": 600}
+    kill        {"id": 1, "signal": "kill"}
+    output      {"id": 1, "stream": "stdout"|"stderr", "data": "..."}
+    completion  {"id": 1, "exit": 0, "timeout": false, "duration": 0.01}
+
+Requests are multiplexed, hence several threads can share the same agent and
+their output is routed back using the request id. The commands are executed by
+a bash login shell, like the commands of a regular session.
+
+The agent is written to a private directory created by mktemp in the home of
+the user and removes it once it is loaded.
+
+Usage::
+
+    agent = RemoteAgent(node.ssh)
+    agent.start()
+    out, err, exit_code, duration = agent.execute("uptime", timeout=60)
+"""
+
+import itertools
+import json
+import threading
+
+from utility.log import Log
+
+log = Log(__name__)
+
+AGENT_DIR = "~/.cephci-agent.XXXXXX"
+
+AGENT_SOURCE = r"""
+import codecs
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+_lock = threading.Lock()
+_procs = {}
+
+
+def send(msg):
+    line = json.dumps(msg) + "\n"
+    with _lock:
+        sys.stdout.write(line)
+        sys.stdout.flush()
+
+
+def pump(rid, stream, name):
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for chunk in iter(lambda: os.read(stream.fileno(), 65536), b""):
+        send({"id": rid, "stream": name, "data": decoder.decode(chunk)})
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        send({"id": rid, "stream": name, "data": tail})
+
+
+def kill(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+def run(req):
+    rid = req["id"]
+    start = time.time()
+    try:
+        proc = subprocess.Popen(
+            ["/bin/bash", "-lc", req["cmd"]],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+    except Exception as err:
+        send({"id": rid, "stream": "stderr", "data": str(err)})
+        send({"id": rid, "exit": 255, "timeout": False, "duration": 0})
+        return
+
+    _procs[rid] = proc
+    readers = [
+        threading.Thread(target=pump, args=(rid, proc.stdout, "stdout")),
+        threading.Thread(target=pump, args=(rid, proc.stderr, "stderr")),
+    ]
+    for reader in readers:
+        reader.start()
+
+    timed_out = False
+    try:
+        exit_code = proc.wait(timeout=req.get("timeout"))
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        kill(proc)
+        exit_code = proc.wait()
+
+    for reader in readers:
+        reader.join()
+    _procs.pop(rid, None)
+    send(
+        {
+            "id": rid,
+            "exit": exit_code,
+            "timeout": timed_out,
+            "duration": time.time() - start,
+        }
+    )
+
+
+def main():
+    # The source is loaded, the private directory is no longer needed
+    try:
+        os.unlink(__file__)
+        os.rmdir(os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        pass
+
+    for line in iter(sys.stdin.readline, ""):
+        req = json.loads(line)
+        if req.get("signal") == "kill":
+            proc = _procs.get(req["id"])
+            if proc:
+                kill(proc)
+            continue
+
+        threading.Thread(target=run, args=(req,), daemon=True).start()
+
+    for proc in list(_procs.values()):
+        kill(proc)
+
+
+main()
+"""
+
+
+class RemoteAgentError(Exception):
+    """The agent failed while a request was in flight."""
+
+    pass
+
+
+class RemoteAgentUnavailable(RemoteAgentError):
+    """The agent could not accept the request, it is safe to retry elsewhere."""
+
+    pass
+
+
+class RemoteAgentTimeout(RemoteAgentError):
+    """The request exceeded the allocated execution time."""
+
+    pass
+
+
+class _Request(object):
+    """Book keeping of a single in-flight request."""
+
+    def __init__(self, request_id, log_output=False):
+        self.id = request_id
+        self.log_output = log_output
+        self.stdout = []
+        self.stderr = []
+        self.exit_code = None
+        self.timed_out = False
+        self.duration = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class RemoteAgent(object):
+    """Client side of the persistent remote execution agent."""
+
+    def __init__(self, client, python="python3", connection=None):
+        """Initialize the agent.
+
+        Args:
+            client: callable returning a connected paramiko.SSHClient.
+            python: interpreter used to run the agent on the remote node.
+            connection: SSHConnectionManager the agent channel is taken from,
+                so that it counts against the channel limit of the node.
+        """
+        self._client = client
+        self._python = python
+        self._connection = connection
+        self._channel = None
+        self._reader = None
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._write_lock = threading.Lock()
+
+    @property
+    def is_alive(self):
+        """Returns True when the agent can serve requests."""
+        return bool(
+            self._channel
+            and not self._channel.closed
+            and self._reader
+            and self._reader.is_alive()
+        )
+
+    def _mktemp(self, client):
+        """Creates the private agent directory, the channel is always released."""
+        if self._connection:
+            channel = self._connection.open_channel(timeout=600)
+        else:
+            channel = client.get_transport().open_session()
+
+        try:
+            channel.exec_command(f"mktemp -d {AGENT_DIR}")
+            stdout = channel.makefile("rb")
+            stderr = channel.makefile_stderr("rb")
+            directory = stdout.read().decode().strip()
+            if channel.recv_exit_status() or not directory:
+                raise RemoteAgentUnavailable(
+                    f"Unable to create the agent directory: {stderr.read().decode()}"
+                )
+            return directory
+        finally:
+            if self._connection:
+                self._connection.release_channel(channel)
+            else:
+                channel.close()
+
+    def _install(self, client):
+        """Writes the agent to a new private directory and returns its path."""
+        directory = self._mktemp(client)
+        path = f"{directory}/agent.py"
+        with client.open_sftp() as sftp:
+            sftp.chmod(directory, 0o700)
+            with sftp.file(path, "w") as agent_file:
+                agent_file.chmod(0o600)
+                agent_file.write(AGENT_SOURCE)
+        return path
+
+    def start(self):
+        """Pushes the agent to the remote node and starts serving requests."""
+        client = self._client()
+        transport = client.get_transport()
+        path = self._install(client)
+
+        if self._connection:
+            channel = self._connection.open_channel(timeout=600)
+        else:
+            channel = transport.open_session()
+        channel.exec_command(
+            f"exec $(command -v {self._python} || echo /usr/libexec/platform-python)"
+            f" -u {path}"
+        )
+        self._channel = channel
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+        log.info("Remote agent started on %s", transport.getpeername()[0])
+
+    def close(self):
+        """Stops the agent, any running command is killed by the agent."""
+        if not self._channel:
+            return
+
+        if self._connection:
+            self._connection.release_channel(self._channel)
+        else:
+            self._channel.close()
+
+    def execute(self, cmd, timeout=None, log_output=False):
+        """Executes the given command using the agent.
+
+        Args:
+            cmd: the command to be executed.
+            timeout: maximum allowed execution time in seconds, None to wait forever.
+            log_output: log the output as it is received.
+
+        Returns:
+            tuple of stdout, stderr, exit code and duration
+
+        Raises:
+            RemoteAgentUnavailable: when the request could not be submitted.
+            RemoteAgentTimeout: when the command exceeds the timeout.
+            RemoteAgentError: when the agent dies during execution.
+        """
+        if not self.is_alive:
+            raise RemoteAgentUnavailable("Remote agent is not running.")
+
+        request = _Request(next(self._ids), log_output)
+        self._pending[request.id] = request
+        try:
+            self._send({"id": request.id, "cmd": cmd, "timeout": timeout})
+        except Exception as err:
+            self._pending.pop(request.id, None)
+            raise RemoteAgentUnavailable(err)
+
+        # The agent enforces the timeout, allow some slack for the completion
+        # message before killing the request from this side.
+        wait = timeout + 30 if timeout else None
+        try:
+            if not request.done.wait(wait):
+                self._send({"id": request.id, "signal": "kill"})
+                raise RemoteAgentTimeout(f"{cmd} did not complete in {timeout}s.")
+        finally:
+            self._pending.pop(request.id, None)
+
+        if request.error:
+            raise RemoteAgentError(request.error)
+
+        if request.timed_out:
+            raise RemoteAgentTimeout(f"{cmd} did not complete in {timeout}s.")
+
+        return (
+            "".join(request.stdout),
+            "".join(request.stderr),
+            request.exit_code,
+            request.duration,
+        )
+
+    def _send(self, message):
+        data = (json.dumps(message) + "\n").encode("utf-8")
+        with self._write_lock:
+            self._channel.sendall(data)
+
+    def _read_loop(self):
+        """Reads the agent responses and routes them to the requests."""
+        _buffer = bytearray()
+        try:
+            for _data in iter(lambda: self._channel.recv(65536), b""):
+                _buffer.extend(_data)
+                while True:
+                    _idx = _buffer.find(b"\n")
+                    if _idx < 0:
+                        break
+
+                    _line = bytes(_buffer[:_idx])
+                    del _buffer[: _idx + 1]
+                    self._dispatch(json.loads(_line))
+        except Exception as err:  # noqa
+            log.debug("Remote agent reader stopped: %s", err)
+
+        for request in list(self._pending.values()):
+            request.error = "Remote agent terminated during execution."
+            request.done.set()
+
+    def _dispatch(self, message):
+        request = self._pending.get(message.get("id"))
+        if not request:
+            return
+
+        if "stream" in message:
+            _stderr = message["stream"] == "stderr"
+            (request.stderr if _stderr else request.stdout).append(message["data"])
+            if request.log_output:
+                _log = log.error if _stderr else log.debug
+                for _ln in message["data"].splitlines():
+                    _log(_ln)
+            return
+
+        request.exit_code = message["exit"]
+        request.timed_out = message.get("timeout", False)
+        request.duration = message.get("duration")
+        request.done.set()
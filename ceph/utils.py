@@ -12,7 +12,6 @@ from typing import Tuple
 
 import requests
 import yaml
-from htmllistparse import fetch_listing
 from libcloud.common.exceptions import BaseHTTPError
 from libcloud.compute.providers import get_driver
 from libcloud.compute.types import Provider
@@ -20,7 +19,6 @@ from packaging.version import Version
 
 from cli.utilities.configure import add_centos_epel_repo
 from compute.baremetal import CephBaremetalNode
-from compute.ibm_vpc import CephVMNodeIBM, get_ibm_service
 from compute.onecloud import (
     CephVMNodeOneCloud,
     generate_onecloud_node_name,
@@ -59,6 +57,9 @@ def cleanup_ibmc_ceph_nodes(ibm_cred, pattern, custom_config=None):
          ibm_cred     global configuration file(ibm)
          pattern      pattern to match instance name
     """
+    # Lazy import: the IBM Cloud SDK is only needed when using IBM Cloud
+    from compute.ibm_vpc import CephVMNodeIBM, get_ibm_service
+
     log.info("Destroying existing IBM instances..")
     glbs = ibm_cred.get("globals")
     ibmc = glbs.get("ibm-credentials")
@@ -339,6 +340,8 @@ def setup_vm_node_ibm(node, ceph_nodes, **params):
     The retry decorator will trigger a rerun when a soft error is encountered. The VM
     node is removed in exception scope before throwing raising the exception again.
     """
+    from compute.ibm_vpc import CephVMNodeIBM
+
     vm = None
     try:
         vm = CephVMNodeIBM(
@@ -1770,6 +1773,8 @@ def fetch_image_builds(version):
 
     todo: Fix when upgrade scenario needs image from source path
     """
+    from htmllistparse import fetch_listing
+
     try:
         cwd, c_list = fetch_listing(DEFAULT_OSBS_SERVER, timeout=60)
         assert c_list, "Container file(s) not found"
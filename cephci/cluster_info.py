@@ -1,11 +1,11 @@
 import json
 import os
-import pickle
 import re
 
 import yaml
 from docopt import docopt
 
+from ceph.cluster_state import load_cluster_state
 from cli.cephadm.cephadm import CephAdm
 from cli.utilities.packages import Rpm, SubscriptionManager
 from cli.utilities.utils import (
@@ -44,9 +44,7 @@ Utility to gather cluster information
 
 def _load_cluster_config(config):
     """Load cluster configration from Ceph CI object"""
-    cluster = None
-    with open(config, "rb") as f:
-        cluster = pickle.load(f)
+    cluster = load_cluster_state(config)
 
     [n.reconnect() for _, c in cluster.items() for n in c]
 
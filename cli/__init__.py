@@ -1,5 +1,7 @@
 from functools import partialmethod
 
+from ceph.async_exec import DEFAULT_LIMIT, gather_on_nodes, run_on_nodes
+
 
 class Cli:
     def __init__(self, ctx):
@@ -8,6 +10,9 @@ class Cli:
     def execute(self, cmd, sudo=False, long_running=False, check_ec=False, **kwargs):
         """Inerface to execute commands on node(s).
 
+        When a list of nodes is provided, the command is executed on the nodes
+        concurrently with at most `limit` (default 16) nodes at a time.
+
         Args:
             cmd (str): Command to be execute
             sudo (bool): Use root access
@@ -15,16 +20,15 @@ class Cli:
             check_exit_status (bool): Check command exit status
         """
         if isinstance(self.ctx, list):
-            out = {}
-            for ctx in self.ctx:
-                out[ctx.shortname] = ctx.exec_command(
-                    cmd=cmd,
-                    sudo=sudo,
-                    long_running=long_running,
-                    check_ec=check_ec,
-                    timeout=kwargs.get("timeout", 3600),
-                )
-            return out
+            return run_on_nodes(
+                self.ctx,
+                cmd,
+                limit=kwargs.get("limit", DEFAULT_LIMIT),
+                sudo=sudo,
+                long_running=long_running,
+                check_ec=check_ec,
+                timeout=kwargs.get("timeout", 3600),
+            )
         else:
             return self.ctx.exec_command(
                 cmd=cmd,
@@ -34,4 +38,27 @@ class Cli:
                 timeout=kwargs.get("timeout", 3600),
             )
 
+    async def aexecute(
+        self, cmd, sudo=False, long_running=False, check_ec=False, **kwargs
+    ):
+        """Asynchronous counterpart of execute.
+
+        Args:
+            cmd (str): Command to be execute
+            sudo (bool): Use root access
+            long_running (bool): Long running command
+            check_exit_status (bool): Check command exit status
+        """
+        ctx = self.ctx if isinstance(self.ctx, list) else [self.ctx]
+        out = await gather_on_nodes(
+            ctx,
+            cmd,
+            limit=kwargs.get("limit", DEFAULT_LIMIT),
+            sudo=sudo,
+            long_running=long_running,
+            check_ec=check_ec,
+            timeout=kwargs.get("timeout", 3600),
+        )
+        return out if isinstance(self.ctx, list) else out[self.ctx.shortname]
+
     execute_as_sudo = partialmethod(execute, sudo=True)
@@ -0,0 +1,298 @@
+import glob
+import json
+import logging
+import os
+import statistics
+import sys
+
+import yaml
+from docopt import docopt
+from junitparser import JUnitXml, TestSuite
+
+log = logging.getLogger(__name__)
+doc = """
+This script splits suites into shards of similar duration, each shard is a suite
+file which can be executed by run.py on its own runner.
+
+The durations of the tests are read from the xunit.xml files of earlier runs.
+Every shard of a suite starts with the cluster setup tests of the suite (the
+leading tests deploying or configuring the cluster) followed by a share of the
+remaining tests in their original order. Tests linked by depends-on or sharing
+a concurrency-group are kept in the same shard, the scheduler resolves both
+within the suite. When a set of suites is given, the shards are distributed to
+the suites taking the longest.
+
+    Usage:
+        shard_suites.py --shards <N> --xunit <path>... --output <dir>
+                  [--setup-tests <N>] [--default-duration <SEC>] <suite>...
+
+        shard_suites.py (-h | --help)
+
+    Options:
+        -h --help                     Shows the command usage
+        -n --shards <N>               Total number of shards to be generated
+        -x --xunit <path>             xunit.xml file or directory searched recursively
+        -o --output <dir>             Directory in which the shard suites are written
+        -s --setup-tests <N>          Number of leading setup tests, detected if not provided
+        -d --default-duration <SEC>   Duration of tests without history [default: 300]
+"""
+
+# Modules of the tests preparing the cluster, every shard has to run them
+SETUP_MODULES = (
+    "install_prereq.py",
+    "test_cephadm.py",
+    "test_client.py",
+    "test_bootstrap.py",
+    "test_ansible.py",
+)
+
+
+def _suite_key(suite_file):
+    """Returns the suite file name without directory and extension, as in xunit."""
+    return os.path.splitext(os.path.basename(suite_file.strip()))[0]
+
+
+def load_durations(paths):
+    """
+    Reads the test durations from the xunit files
+    Args:
+        paths: xunit files or directories containing them
+    Returns:
+        dict of (suite name, test name) and dict of test name to the list
+        of durations in seconds
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(f"{path}/**/xunit.xml", recursive=True))
+        else:
+            files.append(path)
+
+    by_suite, by_name = dict(), dict()
+    for file_name in files:
+        try:
+            xml = JUnitXml.fromfile(file_name)
+        except Exception as err:
+            log.warning(f"Skipping {file_name}: {err}")
+            continue
+
+        for suite in [xml] if isinstance(xml, TestSuite) else xml:
+            props = {p.name: (p.value or "").strip() for p in suite.properties()}
+            suite_file = _suite_key(props.get("suite-name") or suite.name or "")
+
+            # Test cases having many polarion ids are repeated with the same time
+            durations = dict()
+            for case in suite:
+                # Tests not executed are reported without time
+                if case.time:
+                    durations[case.name] = max(durations.get(case.name, 0), case.time)
+
+            for name, duration in durations.items():
+                by_suite.setdefault((suite_file, name), []).append(duration)
+                by_name.setdefault(name, []).append(duration)
+
+    log.info(f"Loaded durations of {len(by_name)} tests from {len(files)} files")
+    return by_suite, by_name
+
+
+def estimate(suite_file, test, by_suite, by_name, default):
+    """Returns the expected duration of the test, median of the earlier runs."""
+    name = test.get("name")
+    durations = by_suite.get((_suite_key(suite_file), name)) or by_name.get(name)
+    return statistics.median(durations) if durations else default
+
+
+def setup_prefix(tests):
+    """Returns the number of leading tests preparing the cluster."""
+    count = 0
+    for test in tests:
+        test = test.get("test", {})
+        if not (test.get("abort-on-fail") or test.get("module") in SETUP_MODULES):
+            break
+        count += 1
+
+    return count
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+def units(tests):
+    """
+    Groups the tests which have to execute in the same shard
+    Args:
+        tests: suite tests i.e. the list of {"test": {...}} entries
+    Returns:
+        list of the test indexes of each unit, in the suite order
+    """
+    parent = list(range(len(tests)))
+
+    def find(idx):
+        while parent[idx] != idx:
+            parent[idx] = parent[parent[idx]]
+            idx = parent[idx]
+        return idx
+
+    def union(idx, other):
+        parent[find(idx)] = find(other)
+
+    groups = dict()
+    for idx, test in enumerate(tests):
+        test = test.get("test", {})
+        # Dependencies are the latest preceding test of the name, as in the scheduler
+        for name in _as_list(test.get("depends-on")):
+            matches = [
+                i for i in range(idx) if tests[i].get("test", {}).get("name") == name
+            ]
+            if matches:
+                union(idx, matches[-1])
+
+        group = test.get("concurrency-group")
+        if group is not None:
+            union(idx, groups.setdefault(group, idx))
+
+    members = dict()
+    for idx in range(len(tests)):
+        members.setdefault(find(idx), []).append(idx)
+
+    return sorted(members.values())
+
+
+def partition(durations, shards):
+    """
+    Distributes the units to the shards, longest units first to the least loaded
+    Args:
+        durations: list of unit durations
+        shards: number of shards
+    Returns:
+        list of the unit indexes of each shard and list of the shard loads
+    """
+    groups = [[] for _ in range(shards)]
+    loads = [0.0] * shards
+    for idx in sorted(range(len(durations)), key=lambda i: -durations[i]):
+        target = loads.index(min(loads))
+        groups[target].append(idx)
+        loads[target] += durations[idx]
+
+    return [sorted(group) for group in groups if group], loads
+
+
+class SuitePlan:
+    """Shard layout of a suite."""
+
+    def __init__(self, suite_file, setup_tests, by_suite, by_name, default):
+        self.suite_file = suite_file
+        with open(suite_file) as _file:
+            self.suite = yaml.safe_load(_file)
+
+        tests = self.suite.get("tests", [])
+        durations = [
+            estimate(suite_file, t.get("test", {}), by_suite, by_name, default)
+            for t in tests
+        ]
+        prefix = setup_tests if setup_tests is not None else setup_prefix(tests)
+
+        # A suite recreating its cluster cannot be split
+        if any(
+            t.get("test", {}).get(key)
+            for t in tests
+            for key in ("destroy-cluster", "recreate-cluster")
+        ):
+            prefix = len(tests)
+
+        self.prefix, self.body = tests[:prefix], tests[prefix:]
+        self.prefix_duration = sum(durations[:prefix])
+        self.durations = durations[prefix:]
+        self.units = units(self.body)
+        self.shards = 1
+
+    def layout(self, shards=None):
+        """Returns the test indexes of the shards and the shard durations."""
+        shards = min(shards or self.shards, max(len(self.units), 1))
+        groups, loads = partition(
+            [sum(self.durations[i] for i in unit) for unit in self.units], shards
+        )
+        groups = [
+            sorted(idx for unit in group for idx in self.units[unit])
+            for group in groups
+        ]
+        return groups or [[]], [self.prefix_duration + load for load in loads]
+
+    @property
+    def makespan(self):
+        return max(self.layout()[1])
+
+    def write(self, output):
+        """Writes the shard suites, returns their paths and estimated durations."""
+        groups, loads = self.layout()
+        stem = os.path.splitext(os.path.basename(self.suite_file))[0]
+        shards = []
+        for idx, group in enumerate(groups, start=1):
+            suite = dict(self.suite)
+            suite["tests"] = self.prefix + [self.body[i] for i in group]
+            path = os.path.join(output, f"{stem}-shard-{idx}-of-{len(groups)}.yaml")
+            with open(path, "w") as _file:
+                yaml.safe_dump(suite, _file, sort_keys=False)
+
+            shards.append(
+                {
+                    "suite": path,
+                    "source": self.suite_file,
+                    "tests": len(suite["tests"]),
+                    "estimated_duration": round(
+                        self.prefix_duration + sum(self.durations[i] for i in group)
+                    ),
+                }
+            )
+
+        return shards
+
+
+def shard_suites(args):
+    """
+    Splits the suites into the requested number of shards
+    Args:
+        args: command line arguments
+    Returns:
+        list of the generated shard details
+    """
+    shards = int(args["--shards"])
+    setup_tests = args.get("--setup-tests")
+    by_suite, by_name = load_durations(args["--xunit"])
+    plans = [
+        SuitePlan(
+            suite_file,
+            int(setup_tests) if setup_tests is not None else None,
+            by_suite,
+            by_name,
+            float(args["--default-duration"]),
+        )
+        for suite_file in args["<suite>"]
+    ]
+
+    if shards < len(plans):
+        log.warning(f"{len(plans)} suites cannot be split into {shards} shards")
+
+    # Give the next shard to the suite which currently takes the longest
+    for _ in range(shards - len(plans)):
+        candidates = [p for p in plans if p.shards < len(p.units)]
+        if not candidates:
+            break
+        longest = max(candidates, key=lambda p: p.makespan)
+        if max(longest.layout(longest.shards + 1)[1]) >= longest.makespan:
+            break
+        longest.shards += 1
+
+    os.makedirs(args["--output"], exist_ok=True)
+    return [shard for plan in plans for shard in plan.write(args["--output"])]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    cli_args = docopt(doc)
+    log.info(cli_args)
+    result = shard_suites(cli_args)
+    sys.stdout.write(json.dumps(result, indent=2))
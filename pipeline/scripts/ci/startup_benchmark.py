@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from docopt import docopt
+
+log = logging.getLogger(__name__)
+doc = """
+This script measures the startup time of run.py and the import time of modules.
+
+The startup time is the wall clock time of `run.py --help` in a new interpreter.
+The import time of every module is measured in a new interpreter using
+`python -X importtime`, the cumulative time of the module and its heaviest
+dependencies are reported. The test modules of the given suites are measured
+along with the provided modules.
+
+    Usage:
+        startup_benchmark.py [--runs <N>] [--module <name>]... [--suite <file>]...
+                  [--top <N>] [--max-startup <SEC>] [--output <file>]
+
+        startup_benchmark.py (-h | --help)
+
+    Options:
+        -h --help                   Shows the command usage
+        -r --runs <N>               Number of `run.py --help` executions [default: 5]
+        -m --module <name>          Module to be measured [default: run]
+        -s --suite <file>           Suite whose test modules are measured
+        -t --top <N>                Number of heaviest dependencies reported [default: 5]
+        --max-startup <SEC>         Fail when the median startup time is higher
+        -o --output <file>          Write the results to the file as JSON
+"""
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.."))
+
+
+def _environment():
+    """Returns the environment of the interpreters, test modules are importable."""
+    sys.path.insert(0, REPO_DIR)
+    from run import TEST_DIRECTORIES
+
+    paths = [REPO_DIR] + [os.path.join(REPO_DIR, d) for d in TEST_DIRECTORIES]
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(paths + [env.get("PYTHONPATH", "")])
+    return env
+
+
+def startup_time(runs, env):
+    """Returns the statistics of the `run.py --help` wall clock time in seconds."""
+    durations = []
+    for _ in range(runs):
+        _start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "run.py", "--help"],
+            cwd=REPO_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        durations.append(time.perf_counter() - _start)
+
+    return {
+        "runs": runs,
+        "min": round(min(durations), 3),
+        "median": round(statistics.median(durations), 3),
+        "max": round(max(durations), 3),
+    }
+
+
+def import_time(module, env, top):
+    """
+    Measures the import of the module in a new interpreter
+    Args:
+        module: name of the module
+        env: environment of the interpreter
+        top: number of heaviest dependencies to be reported
+    Returns:
+        dict with the cumulative import time in seconds and the dependencies
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode:
+        return {"error": proc.stderr.strip().splitlines()[-1]}
+
+    # Lines are "import time: <self us> | <cumulative us> | <indented name>"
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, self_us, cumulative_us, name = [
+            field.strip() for field in line.replace("import time:", "|").split("|")
+        ]
+        entries.append((name, int(self_us), int(cumulative_us)))
+
+    cumulative = {name: cumulative_us for name, _, cumulative_us in entries}
+    heaviest = sorted(entries, key=lambda x: x[1], reverse=True)[:top]
+    return {
+        "seconds": round(cumulative.get(module, 0) / 1e6, 3),
+        "modules": len(entries),
+        "heaviest": {name: round(self_us / 1e6, 3) for name, self_us, _ in heaviest},
+    }
+
+
+def benchmark(args):
+    """
+    Measures the startup of run.py and the import of the modules
+    Args:
+        args: command line arguments
+    Returns:
+        dict of the results
+    """
+    env = _environment()
+    modules = list(args["--module"])
+    if args["--suite"]:
+        import init_suite
+        from run import suite_modules
+
+        suite = init_suite.load_suites(args["--suite"])
+        modules.extend(suite_modules(suite["tests"]))
+
+    return {
+        "startup": startup_time(int(args["--runs"]), env),
+        "imports": {
+            module: import_time(module, env, int(args["--top"]))
+            for module in dict.fromkeys(modules)
+        },
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    cli_args = docopt(doc)
+    result = benchmark(cli_args)
+    output = json.dumps(result, indent=2)
+    if cli_args["--output"]:
+        with open(cli_args["--output"], "w") as _file:
+            _file.write(output)
+    sys.stdout.write(output)
+
+    max_startup = cli_args["--max-startup"]
+    if max_startup and result["startup"]["median"] > float(max_startup):
+        log.error(f"Median startup time is higher than {max_startup} seconds")
+        sys.exit(1)
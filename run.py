@@ -4,11 +4,12 @@ import datetime
 import importlib
 import json
 import os
-import pickle
 import re
 import sys
+import threading
 import time
 import traceback
+from collections import defaultdict
 from copy import deepcopy
 from getpass import getuser
 
@@ -19,7 +20,13 @@ from libcloud.common.types import LibcloudError
 
 import init_suite
 from ceph.ceph import Ceph, CephNode
+from ceph.ceph_admin.command_cache import COMMAND_CACHE
+from ceph.ceph_admin.shell_pool import close_shell_pools
 from ceph.clients import WinNode
+from ceph.cluster_state import dump_cluster_state, load_cluster_state
+from ceph.cluster_watcher import stop_watchers
+from ceph.command_metrics import COMMAND_METRICS
+from ceph.parallel import parallel
 from ceph.utils import (
     cleanup_ceph_nodes,
     cleanup_ibmc_ceph_nodes,
@@ -29,19 +36,14 @@ from ceph.utils import (
     create_ibmc_ceph_nodes,
     create_onecloud_ceph_nodes,
 )
-from cephci.cluster_info import collect_ceph_coredumps, get_ceph_var_logs
 from cephci.utils.build_info import CephTestManifest
-from cli.performance.memory_and_cpu_utils import (
-    start_logging_processes,
-    stop_logging_process,
-    upload_mem_and_cpu_logger_script,
-)
 from compute.aws_ec2 import cleanup_aws_ceph_nodes
 from compute.onecloud import cleanup_onecloud_ceph_nodes, expand_private_key_path
-from utility import sosreport
 from utility.log import Log
-from utility.polarion import post_to_polarion
+from utility.poll import WAIT_METRICS, deadline
 from utility.retry import retry
+from utility.scheduler import DEFAULT_MAX_WORKERS as SCHEDULER_MAX_WORKERS
+from utility.scheduler import SuiteScheduler, is_concurrent
 from utility.utils import (  # ReportPortal,
     check_build_overrides,
     create_run_dir,
@@ -49,12 +51,12 @@ from utility.utils import (  # ReportPortal,
     email_results,
     generate_unique_id,
     magna_url,
+    parse_custom_config_list,
     resolve_use_ipv6,
     setup_cluster_access,
     validate_conf,
     validate_image,
 )
-from utility.xunit import create_xunit_results
 
 doc = """
 A simple test suite wrapper that executes tests based on yaml test configuration
@@ -98,6 +100,7 @@ A simple test suite wrapper that executes tests based on yaml test configuration
         [--monitor-performance]
         [--disable-console-log]
         [--product <community> | <redhat> | <ibm>]
+        [--preflight-import]
   run.py --cleanup=name --osp-cred <file> [--cloud <str>]
         [--log-level <LEVEL>]
         [--custom-config <key>=<value>]...
@@ -169,11 +172,39 @@ Options:
                                     [default: false]
   --product <product>               The edition of Ceph. Accepted values are
                                     community, redhat and ibm
+  --preflight-import                Import and validate the test modules of the
+                                    suites before provisioning the cluster
 """
 log = Log()
 test_names = []
 run_summary = {}
 
+# Directories of the test modules, the modules are imported by their file name
+TEST_DIRECTORIES = (
+    "tests",
+    "tests/rados",
+    "tests/cephadm",
+    "tests/rbd",
+    "tests/rbd/rest",
+    "tests/rbd_mirror",
+    "tests/cephfs",
+    "tests/iscsi",
+    "tests/rgw",
+    "tests/ceph_ansible",
+    "tests/ceph_installer",
+    "tests/mgr",
+    "tests/dashboard",
+    "tests/misc_env",
+    "tests/parallel",
+    "tests/upgrades",
+    "tests/ceph_volume",
+    "tests/nvmeof",
+    "tests/nvmeof/rest",
+    "tests/rgw/rest",
+    "tests/nfs",
+    "tests/smb",
+)
+
 
 class CephCIArgumentError(Exception):
     pass
@@ -214,10 +245,12 @@ def create_nodes(
             --custom-config openstack_vm_profile=c1.standard.xl
             --custom-config openstack_networks=provider_net_cci_1
             --custom-config use_ipv6=true
+            --custom-config remote_agent=true
 
         If these values are not provided then the defaults would be used.
         openstack_networks (single or comma-separated) overrides cluster conf for all OpenStack VMs.
         The defaults are the ones used in the example.
+        remote_agent executes the commands through a persistent agent on each node.
     """
 
     validate_conf(conf)
@@ -235,6 +268,9 @@ def create_nodes(
 
     ceph_cluster_dict = {}
     clients = []
+    use_agent = parse_custom_config_list(custom_config).get(
+        "remote_agent", ""
+    ).lower() in ("true", "1", "yes")
     for cluster in conf.get("globals"):
         if cloud_type == "openstack":
             ceph_vmnodes = create_ceph_nodes(
@@ -383,6 +419,7 @@ def create_nodes(
                     ipv6_address=ipv6_address,
                     ipv6_subnet=ipv6_subnet,
                     use_ipv6=use_ipv6,
+                    use_agent=use_agent,
                 )
                 ceph_nodes.append(ceph)
 
@@ -410,16 +447,103 @@ def create_nodes(
         log.info("Sleeping 15 Seconds")
         time.sleep(15)
 
-    for cluster_name, cluster in ceph_cluster_dict.items():
-        for instance in cluster:
-            try:
-                instance.connect()
-            except BaseException:
-                raise
+    connect_nodes(ceph_cluster_dict)
 
     return ceph_cluster_dict, clients
 
 
+def connect_nodes(ceph_cluster_dict, max_workers=16):
+    """Connects and prepares the nodes of all the clusters concurrently.
+
+    Args:
+        ceph_cluster_dict   clusters whose nodes have to be connected
+        max_workers         maximum number of nodes connected at the same time
+    """
+
+    def _connect(node):
+        _start = time.time()
+        node.connect()
+        return node.vmname, time.time() - _start
+
+    nodes = [node for cluster in ceph_cluster_dict.values() for node in cluster]
+    if not nodes:
+        return
+
+    with parallel(max_workers=min(max_workers, len(nodes))) as p:
+        for node in nodes:
+            p.spawn(_connect, node)
+
+    for name, duration in sorted(p.results, key=lambda x: x[1], reverse=True):
+        log.info(f"Connected to {name} in {duration:.2f} seconds")
+
+
+def add_test_paths():
+    """Adds the test directories to the module search path."""
+    for directory in TEST_DIRECTORIES:
+        path = os.path.abspath(directory)
+        if path not in sys.path:
+            sys.path.append(path)
+
+
+def suite_modules(tests):
+    """Returns the names of the test modules used by the suite tests.
+
+    The tests listed under the parallel key of a test are included.
+    """
+    modules = []
+    for test in tests or []:
+        test = test.get("test", {})
+        if test.get("module"):
+            modules.append(os.path.splitext(test["module"])[0])
+        modules.extend(suite_modules(test.get("parallel")))
+
+    return list(dict.fromkeys(modules))
+
+
+def preflight_import(tests, max_workers=16):
+    """Imports and validates the test modules of the suite concurrently.
+
+    The imported modules are cached, hence the tests do not import them again
+    when they execute.
+
+    Args:
+        tests           suite tests i.e. the list of {"test": {...}} entries
+        max_workers     maximum number of modules imported at the same time
+
+    Returns:
+        dict of the module name and error of the modules failing validation
+    """
+
+    def _import(module_name):
+        _start = time.time()
+        try:
+            test_mod = importlib.import_module(module_name)
+        except Exception as err:
+            return module_name, f"{type(err).__name__}: {err}", 0
+
+        if not callable(getattr(test_mod, "run", None)):
+            return module_name, "run method is not defined", 0
+
+        return module_name, None, time.time() - _start
+
+    add_test_paths()
+    modules = suite_modules(tests)
+    if not modules:
+        return dict()
+
+    with parallel(max_workers=min(max_workers, len(modules))) as p:
+        for module_name in modules:
+            p.spawn(_import, module_name)
+
+    results = sorted(p.results, key=lambda x: x[2], reverse=True)
+    for name, _, duration in results[:5]:
+        log.info(f"Imported {name} in {duration:.2f} seconds")
+
+    errors = {name: err for name, err, _ in results if err}
+    log.info(f"Validated {len(modules) - len(errors)} of {len(modules)} test modules")
+    return errors
+
+
 def print_results(tc):
     header = "\n{name:<30s}   {desc:<60s}   {duration:<30s}   {status:<15s}    {comments:>15s}".format(
         name="TEST NAME",
@@ -718,6 +842,14 @@ def run(args):
     if suite["nan"] and not suite["tests"]:
         raise Exception("Please provide valid test suite name")
 
+    if args.get("--preflight-import"):
+        import_errors = preflight_import(suite["tests"])
+        for module_name, err in import_errors.items():
+            log.error(f"Unable to use test module {module_name}: {err}")
+
+        if import_errors:
+            return 1
+
     cli_arguments = f"{sys.executable} {' '.join(sys.argv)}"
     log.info(f"The CLI for the current run :\n{cli_arguments}\n")
     log.info(f"RPM Compose source - {base_url}")
@@ -866,12 +998,9 @@ def run(args):
 
             return 1
     else:
-        ceph_store_nodes = open(reuse, "rb")
-        ceph_cluster_dict = pickle.load(ceph_store_nodes)
-        ceph_store_nodes.close()
-        for cluster_name, cluster in ceph_cluster_dict.items():
-            for node in cluster:
-                node.reconnect()
+        ceph_cluster_dict = load_cluster_state(reuse)
+        # Connections are established lazily on the first use of each node
+        log.info("Reusing cluster state, nodes connect on first use.")
 
     if store:
         ceph_clusters_file = f"rerun/{instances_name}-{run_id}"
@@ -880,28 +1009,7 @@ def run(args):
 
         store_cluster_state(ceph_cluster_dict, ceph_clusters_file)
 
-    sys.path.append(os.path.abspath("tests"))
-    sys.path.append(os.path.abspath("tests/rados"))
-    sys.path.append(os.path.abspath("tests/cephadm"))
-    sys.path.append(os.path.abspath("tests/rbd"))
-    sys.path.append(os.path.abspath("tests/rbd/rest"))
-    sys.path.append(os.path.abspath("tests/rbd_mirror"))
-    sys.path.append(os.path.abspath("tests/cephfs"))
-    sys.path.append(os.path.abspath("tests/iscsi"))
-    sys.path.append(os.path.abspath("tests/rgw"))
-    sys.path.append(os.path.abspath("tests/ceph_ansible"))
-    sys.path.append(os.path.abspath("tests/ceph_installer"))
-    sys.path.append(os.path.abspath("tests/mgr"))
-    sys.path.append(os.path.abspath("tests/dashboard"))
-    sys.path.append(os.path.abspath("tests/misc_env"))
-    sys.path.append(os.path.abspath("tests/parallel"))
-    sys.path.append(os.path.abspath("tests/upgrades"))
-    sys.path.append(os.path.abspath("tests/ceph_volume"))
-    sys.path.append(os.path.abspath("tests/nvmeof"))
-    sys.path.append(os.path.abspath("tests/nvmeof/rest"))
-    sys.path.append(os.path.abspath("tests/rgw/rest"))
-    sys.path.append(os.path.abspath("tests/nfs"))
-    sys.path.append(os.path.abspath("tests/smb"))
+    add_test_paths()
 
     tests = suite.get("tests")
     tcs = []
@@ -916,8 +1024,6 @@ def run(args):
     # Adding processed custom_config
     ceph_test_data["custom_config_dict"] = deepcopy(custom_config_dict)
 
-    # Initialize test return code
-    rc = 0
     run_config = {
         "log_dir": run_dir,
         "run_id": run_id,
@@ -925,18 +1031,49 @@ def run(args):
     download_path = run_dir if not log_directory else log_directory
     cluster_info = []
 
-    for test in tests:
-        test = test.get("test")
+    names_lock = threading.Lock()
+    # Serializes the writes of the cluster state file
+    state_lock = threading.Lock()
+    # Number of tests running on every cluster, guarded by names_lock
+    cluster_tests = defaultdict(int)
+
+    def run_test(test, concurrent=False):
+        """Executes the suite test.
+
+        Args:
+            test (dict): test details from the suite.
+            concurrent (bool): the test executes alongside other tests.
+
+        Returns:
+            tuple of the test case result and the abort-on-fail flag
+        """
+        nonlocal ceph_cluster_dict, clients, enable_perf_mon, skip_version_compare
+        nonlocal _rhcs_version, jenkins_rc
+
         tc = fetch_test_details(test)
         do_not_skip_test = test.get("do-not-skip-tc", False)
         test_file = tc["file"]
-        unique_test_name = create_unique_test_name(tc["name"], test_names)
-        test_names.append(unique_test_name)
+        with names_lock:
+            unique_test_name = create_unique_test_name(tc["name"], test_names)
+            test_names.append(unique_test_name)
+
+        log_handlers = []
+        if concurrent:
+            # Logs of the concurrent tests are separated by thread
+            tc["log-link"], log_handlers = log.add_test_logger(
+                unique_test_name, run_dir
+            )
+            COMMAND_METRICS.bind(unique_test_name)
+        else:
+            tc["log-link"] = log.configure_logger(
+                unique_test_name, run_dir, disable_console_log
+            )
+            COMMAND_METRICS.test_name = unique_test_name
 
-        tc["log-link"] = log.configure_logger(
-            unique_test_name, run_dir, disable_console_log
+        test_run_config = dict(
+            run_config, test_name=unique_test_name, log_link=tc["log-link"]
         )
-        run_config.update({"test_name": unique_test_name, "log_link": tc["log-link"]})
+        rc, _object = 0, None
         mod_file_name = os.path.splitext(test_file)[0]
         test_mod = importlib.import_module(mod_file_name)
         print("\nRunning test: {test_name}".format(test_name=tc["name"]))
@@ -947,13 +1084,28 @@ def run(args):
         log.info(f"Running test {test_file}")
         start = datetime.datetime.now()
 
-        for cluster_name in test.get("clusters", ceph_cluster_dict):
+        def run_on_cluster(cluster_name, tc, context):
+            """Executes the test module against the cluster, returns rc and its Log.
+
+            Args:
+                cluster_name (str): name of the cluster.
+                tc (dict): test details updated with the outcome on the cluster.
+                context (dict): run settings read and updated by the test, and
+                    the test cases reported by a parallel test.
+            """
             # Add cluster names
-            if cluster_name not in cluster_info:
-                cluster_info.append(cluster_name)
+            with names_lock:
+                if cluster_name not in cluster_info:
+                    cluster_info.append(cluster_name)
 
             # If Performance and CPU usage monitoring is enabled, perform pre-reqs
-            if enable_perf_mon:
+            if context["enable_perf_mon"]:
+                from cli.performance.memory_and_cpu_utils import (
+                    start_logging_processes,
+                    stop_logging_process,
+                    upload_mem_and_cpu_logger_script,
+                )
+
                 if not upload_mem_and_cpu_logger_script(
                     ceph_cluster_dict[cluster_name]
                 ):
@@ -961,7 +1113,7 @@ def run(args):
                         "Failed to upload Memory and CPU monitoring scripts to nodes. "
                         "The tests will proceed without monitoring"
                     )
-                    enable_perf_mon = False
+                    context["enable_perf_mon"] = False
 
             if test.get("clusters"):
                 config = test.get("clusters").get(cluster_name).get("config", {})
@@ -983,7 +1135,7 @@ def run(args):
                 config["skip_subscription"] = True
 
             if config.get("skip_version_compare"):
-                skip_version_compare = config.get("skip_version_compare")
+                context["skip_version_compare"] = config.get("skip_version_compare")
 
             if args.get("--add-repo"):
                 repo = args.get("--add-repo")
@@ -995,7 +1147,7 @@ def run(args):
             config["enable_eus"] = enable_eus
             config["skip_enabling_rhel_rpms"] = skip_enabling_rhel_rpms
             config["docker-insecure-registry"] = docker_insecure_registry
-            config["skip_version_compare"] = skip_version_compare
+            config["skip_version_compare"] = context["skip_version_compare"]
             config["container_image"] = "%s/%s:%s" % (
                 docker_registry,
                 docker_image,
@@ -1014,6 +1166,17 @@ def run(args):
                 if "podman-auth-file" in custom_config_dict:
                     config["podman_auth_file"] = custom_config_dict["podman-auth-file"]
 
+                if "persistent-shell" in custom_config_dict:
+                    config["persistent_shell"] = custom_config_dict["persistent-shell"]
+
+                if "command-cache" in custom_config_dict:
+                    config["command_cache"] = custom_config_dict["command-cache"]
+
+                if "command-cache-ttl" in custom_config_dict:
+                    config["command_cache_ttl"] = custom_config_dict[
+                        "command-cache-ttl"
+                    ]
+
             config["ceph_docker_registry"] = docker_registry
             config["ceph_docker_image"] = docker_image
             config["ceph_docker_image_tag"] = docker_tag
@@ -1046,19 +1209,23 @@ def run(args):
                 config["kernel-repo"] = os.environ.get("KERNEL-REPO-URL")
 
             # Start performance and Cpu usage monitoring
-            if enable_perf_mon:
+            if context["enable_perf_mon"]:
                 logging_process, tracker = start_logging_processes(
                     ceph_cluster_dict[cluster_name], unique_test_name
                 )
 
+            with names_lock:
+                cluster_tests[cluster_name] += 1
+            previous_binding = COMMAND_METRICS.bind(unique_test_name, cluster_name)
+
             try:
                 # FixMe: I don't think we use `build` as part of test data
                 # configuration. This needs to investigated and fixed.
                 if "build" in config.keys():
-                    _rhcs_version = config["build"]
+                    context["rhcs_version"] = config["build"]
 
                 # Initialize the cluster with the expected rhcs_version
-                ceph_cluster_dict[cluster_name].rhcs_version = _rhcs_version
+                ceph_cluster_dict[cluster_name].rhcs_version = context["rhcs_version"]
                 if mod_file_name not in skip_tc_list or do_not_skip_test:
                     if parallel:
                         parallel_tcs, rc = test_mod.run(
@@ -1069,7 +1236,7 @@ def run(args):
                             test_data=ceph_test_data,
                             ceph_cluster_dict=ceph_cluster_dict,
                             clients=clients,
-                            run_config=run_config,
+                            run_config=test_run_config,
                             tc=tc,
                         )
 
@@ -1083,7 +1250,7 @@ def run(args):
                                     minutes=int(mins),
                                     seconds=float(secs),
                                 )
-                        tcs.extend(parallel_tcs)
+                        context["tcs"].extend(parallel_tcs)
                     else:
                         rc = test_mod.run(
                             ceph_cluster=ceph_cluster_dict[cluster_name],
@@ -1093,7 +1260,7 @@ def run(args):
                             test_data=ceph_test_data,
                             ceph_cluster_dict=ceph_cluster_dict,
                             clients=clients,
-                            run_config=run_config,
+                            run_config=test_run_config,
                         )
                 else:
                     rc = -1
@@ -1112,7 +1279,7 @@ def run(args):
 
             finally:
                 # Stop performance and Cpu usage monitoring
-                if enable_perf_mon:
+                if context["enable_perf_mon"]:
                     stop_logging_process(
                         ceph_cluster_dict[cluster_name],
                         logging_process,
@@ -1120,8 +1287,23 @@ def run(args):
                         tracker,
                     )
                 collect_recipe(ceph_cluster_dict[cluster_name])
+
+                # Cached results must not leak into the next test, the tests
+                # still running on the cluster keep theirs
+                with names_lock:
+                    cluster_tests[cluster_name] -= 1
+                    if not cluster_tests[cluster_name]:
+                        COMMAND_CACHE.invalidate(cluster_name)
+                COMMAND_METRICS.export(
+                    f"{run_dir}/command_metrics/{unique_test_name}-{cluster_name}.json",
+                    test=unique_test_name,
+                    cluster=cluster_name,
+                )
+                COMMAND_METRICS.bind(*previous_binding)
+
                 if store:
-                    store_cluster_state(ceph_cluster_dict, ceph_clusters_file)
+                    with state_lock:
+                        store_cluster_state(ceph_cluster_dict, ceph_clusters_file)
 
                 # Artifacts from test appended to comments
                 if config.get("artifacts"):
@@ -1142,7 +1324,69 @@ def run(args):
                     # Get error messages
                     tc["err_msg"] = "\n".join(map(str, _object._log_errors))
 
-                break
+            return rc, _object
+
+        def run_on_cluster_isolated(cluster_name, tc, context):
+            """Executes run_on_cluster logging to a file of the cluster."""
+            _, handlers = log.add_test_logger(
+                f"{unique_test_name}-{cluster_name}", run_dir, parent=unique_test_name
+            )
+            COMMAND_METRICS.bind(unique_test_name)
+            try:
+                return run_on_cluster(cluster_name, tc, context)
+            finally:
+                log.remove_test_logger(handlers)
+
+        clusters = list(test.get("clusters", ceph_cluster_dict))
+        concurrent_clusters = test.get(
+            "concurrent-clusters", custom_config_dict.get("concurrent-clusters", False)
+        )
+
+        def new_context():
+            return {
+                "enable_perf_mon": enable_perf_mon,
+                "skip_version_compare": skip_version_compare,
+                "rhcs_version": _rhcs_version,
+                "tcs": [],
+            }
+
+        # The waits of the test end at its timeout
+        with deadline(test.get("timeout")):
+            if (
+                str(concurrent_clusters).lower() in ("true", "1", "yes")
+                and len(clusters) > 1
+            ):
+                log.info(f"Running {test_file} on {', '.join(clusters)} concurrently")
+                # Every cluster updates its own copies, merged once all are done
+                copies = [(deepcopy(tc), new_context()) for _ in clusters]
+                with parallel(max_workers=len(clusters)) as p:
+                    for cluster_name, (cluster_tc, context) in zip(clusters, copies):
+                        p.spawn(
+                            run_on_cluster_isolated, cluster_name, cluster_tc, context
+                        )
+
+                merge_test_details(tc, [cluster_tc for cluster_tc, _ in copies])
+                contexts = [context for _, context in copies]
+
+                # A failure on any cluster fails the test, else a skip skips it
+                rcs = [_rc for _rc, _ in p.results]
+                rc = max(rcs) if max(rcs) > 0 else min(rcs)
+                _object = next((_obj for _, _obj in p.results if _obj), None)
+            else:
+                contexts = [new_context()]
+                for cluster_name in clusters:
+                    rc, _object = run_on_cluster(cluster_name, tc, contexts[0])
+                    if rc != 0:
+                        break
+
+        # The settings updated on the clusters apply to the next tests
+        for context in contexts:
+            enable_perf_mon = enable_perf_mon and context["enable_perf_mon"]
+            if context["skip_version_compare"] != skip_version_compare:
+                skip_version_compare = context["skip_version_compare"]
+            if context["rhcs_version"] != _rhcs_version:
+                _rhcs_version = context["rhcs_version"]
+            tcs.extend(context["tcs"])
 
         # Calculate test execution time
         elapsed = datetime.datetime.now() - start
@@ -1152,6 +1396,9 @@ def run(args):
         if _object:
             _object._log_errors = []
 
+        if post_results:
+            from utility.polarion import post_to_polarion
+
         if rc == 0:
             tc["status"] = "Pass"
             msg = "Test {} passed".format(test_mod)
@@ -1182,10 +1429,12 @@ def run(args):
 
             if test.get("abort-on-fail", False):
                 log.info("Aborting on test failure")
-                tcs.append(tc)
-                break
+                log.remove_test_logger(log_handlers)
+                return tc, True
 
         if test.get("destroy-cluster") is True:
+            stop_watchers()
+            close_shell_pools()
             if cloud_type == "openstack":
                 cleanup_ceph_nodes(osp_cred, instances_name)
             elif cloud_type == "ibmc":
@@ -1198,6 +1447,8 @@ def run(args):
                 )
 
         if test.get("recreate-cluster") is True:
+            stop_watchers()
+            close_shell_pools()
             ceph_cluster_dict, clients = create_nodes(
                 conf,
                 inventory,
@@ -1209,7 +1460,33 @@ def run(args):
                 platform=platform,
             )
 
-        tcs.append(tc)
+        log.remove_test_logger(log_handlers)
+        return tc, False
+
+    def skip_test(test, reason):
+        """Returns the test case result of a test not executed."""
+        tc = fetch_test_details(test)
+        tc.update({"status": "Skipped", "duration": datetime.timedelta(0)})
+        tc["comments"] += f"\nNot executed, {reason}"
+        log.info(f"Test {tc['name']} skipped, {reason}")
+        return tc
+
+    if is_concurrent(tests):
+        max_concurrent = custom_config_dict.get(
+            "max-concurrent-tests", SCHEDULER_MAX_WORKERS
+        )
+        log.info(f"Executing the suite with up to {max_concurrent} concurrent tests")
+        tcs.extend(
+            SuiteScheduler(tests, max_workers=max_concurrent).run(
+                lambda test: run_test(test, concurrent=True), skip_test
+            )
+        )
+    else:
+        for test in tests:
+            tc, abort = run_test(test.get("test"))
+            tcs.append(tc)
+            if abort:
+                break
 
     url_base = (
         magna_url + run_dir.split("/")[-1]
@@ -1240,6 +1517,8 @@ def run(args):
     }
 
     if xunit_results:
+        from utility.xunit import create_xunit_results
+
         create_xunit_results(suite_name, tcs, test_run_metadata)
 
     print("\nAll test logs located here: {base}".format(base=url_base))
@@ -1256,6 +1535,12 @@ def run(args):
     info = {"status": "Pass"}
     with open(f"{run_dir}/run_summary.json", "w", encoding="utf-8") as f:
         json.dump(run_summary, f, ensure_ascii=False, indent=4)
+    COMMAND_METRICS.export(f"{run_dir}/command_metrics.json")
+    if COMMAND_CACHE.hits or COMMAND_CACHE.misses:
+        log.info(f"Command cache statistics: {COMMAND_CACHE.stats}")
+    WAIT_METRICS.export(f"{run_dir}/wait_metrics.json")
+    stop_watchers()
+    close_shell_pools()
 
     test_res = {
         "result": tcs,
@@ -1271,6 +1556,10 @@ def run(args):
 
     email_results(test_result=test_res)
 
+    # Lazy import: the log collection tools are only needed on failures
+    if jenkins_rc or collect_coredump or collect_ceph_logs:
+        from cephci.cluster_info import collect_ceph_coredumps, get_ceph_var_logs
+
     if jenkins_rc or collect_coredump:
         log.info(
             "\n\nPreserving core-dump directory due to failures in testcase or user instructed"
@@ -1281,6 +1570,8 @@ def run(args):
         log.info(f"Generated coredump location : {url_base}/ceph_coredumps\n")
 
     if jenkins_rc and not skip_sos_report:
+        from utility import sosreport
+
         log.info(
             "\n\nGenerating sosreports for all the nodes due to failures in testcase"
         )
@@ -1313,10 +1604,27 @@ def run(args):
     return jenkins_rc
 
 
+def merge_test_details(tc, copies):
+    """Merges the copies of the test details updated by concurrent clusters.
+
+    The comments of every cluster are appended, any other detail is taken from
+    the first cluster which updated it e.g. the error of the first failure.
+
+    Args:
+        tc (dict): test details, updated in place.
+        copies (list): copies of tc updated by the clusters, in cluster order.
+    """
+    original = deepcopy(tc)
+    for copy in copies:
+        for key, value in copy.items():
+            if key == "comments":
+                tc[key] += value[len(original[key]) :]
+            elif value != original.get(key) and tc.get(key) == original.get(key):
+                tc[key] = value
+
+
 def store_cluster_state(ceph_cluster_object, ceph_clusters_file_name):
-    cn = open(ceph_clusters_file_name, "w+b")
-    pickle.dump(ceph_cluster_object, cn)
-    cn.close()
+    dump_cluster_state(ceph_cluster_object, ceph_clusters_file_name)
     log.info("ceph_clusters_file %s", ceph_clusters_file_name)
 
 
@@ -0,0 +1,71 @@
+from time import time
+
+from ceph.ceph_admin import CephAdmin
+from ceph.ceph_admin.shell_pool import get_shell_pool
+from utility.log import Log
+
+log = Log(__name__)
+
+
+def commands_per_second(instance, cmd, count):
+    """
+    Method executes the given ceph command count times using cephadm shell
+    Args:
+        instance: CephAdmin object
+        cmd: ceph command to be executed
+        count: number of executions
+    Returns:
+        commands executed per second
+    """
+    start = time()
+    for _ in range(count):
+        instance.shell(args=[cmd])
+
+    return count / (time() - start)
+
+
+def run(ceph_cluster, **kw):
+    """Benchmark ceph commands executed with and without the cephadm shell pool
+    Args:
+        **kw: Key/value pairs of configuration information to be used in the test.
+    Returns:
+        0 - if test case pass
+        1 - it test case fails
+    Test Case Flow:
+    1. Execute the command count times using a new cephadm shell per command
+    2. Execute the command count times using the persistent cephadm shell pool
+    3. Verify both return the same output and log the commands per second
+
+    Example:
+        config:
+            command: ceph osd tree
+            count: 20
+    """
+    config = kw.get("config")
+    cmd = config.get("command", "ceph osd tree")
+    count = config.get("count", 20)
+
+    try:
+        instance = CephAdmin(cluster=ceph_cluster, **config)
+        instance.config["persistent_shell"] = False
+        out, _ = instance.shell(args=[cmd])
+        without_pool = commands_per_second(instance, cmd, count)
+
+        instance.config["persistent_shell"] = True
+        pooled_out, _ = instance.shell(args=[cmd])
+        with_pool = commands_per_second(instance, cmd, count)
+        get_shell_pool(instance.installer.node).close()
+
+        log.info(
+            f"{cmd}: {without_pool:.2f} commands/s without pool, "
+            f"{with_pool:.2f} commands/s with pool"
+        )
+        if out.strip() != pooled_out.strip():
+            log.error(f"Output mismatch:\n{out}\nvs pooled shell:\n{pooled_out}")
+            return 1
+
+        return 0
+
+    except Exception as e:
+        log.error(e)
+        return 1
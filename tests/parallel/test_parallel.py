@@ -1,16 +1,35 @@
+"""
+Executes the tests listed under the parallel key of a suite test concurrently.
+
+The tests run in a pool of worker processes started once per invocation. The
+cluster objects and arguments are handed to each worker when it starts, hence
+they are not serialized for every test and the test modules imported by a
+worker are reused by the next test it executes.
+
+The log records of the workers are shipped to this process through a queue
+and written to the log file of the test that emitted them. The results are
+returned through the futures of the pool.
+
+Tests not completed within max_time are abandoned: the pending ones are
+cancelled and the workers still executing one are terminated, the elapsed
+time of the test is taken from the first record it logged.
+"""
+
 import copy
 import datetime
 import glob
 import importlib
 import logging
+import logging.handlers
+import multiprocessing
 import os
 import random
+import signal
 import string
-from multiprocessing import Manager
-from time import sleep
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
 
 from ceph.ceph import CommandFailed
-from ceph.parallel import parallel
 from utility.log import LOG_FORMAT, Log
 from utility.utils import magna_url
 
@@ -19,6 +38,10 @@ polarion_default_url = (
     "https://polarion.engineering.redhat.com/polarion/#/project/CEPH/workitem?id="
 )
 
+# Worker process state set by _init_worker
+_worker_args = dict()
+_worker_test = None
+
 
 class MultiModuleFilter(logging.Filter):
     """Custom filter to log only messages from specific modules."""
@@ -32,6 +55,51 @@ class MultiModuleFilter(logging.Filter):
         return any(module_name in record.module for module_name in self.module_names)
 
 
+class WorkerTestFilter(logging.Filter):
+    """Tags the records of a worker with the test it is executing."""
+
+    def filter(self, record):
+        record.parallel_test = _worker_test
+        return True
+
+
+class TestLogRouter(logging.Handler):
+    """Writes the records shipped by the workers to the log files of the tests."""
+
+    def __init__(self):
+        super().__init__()
+        self._handlers = dict()
+        # Time and worker pid of the first record of every test
+        self.started = dict()
+        self._console = logging.StreamHandler()
+        self._console.setLevel(logging.INFO)
+        self._console.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    def add_test(self, test_name, log_file, err_file):
+        _handler = logging.FileHandler(log_file)
+        _handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        _err_handler = logging.FileHandler(err_file)
+        _err_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        _err_handler.setLevel(logging.ERROR)  # This ensures only errors are logged
+        self._handlers[test_name] = [_handler, _err_handler]
+
+    def emit(self, record):
+        test_name = getattr(record, "parallel_test", None)
+        if test_name and test_name not in self.started:
+            self.started[test_name] = (record.created, record.process)
+
+        handlers = self._handlers.get(test_name, [])
+        for handler in handlers + [self._console]:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def close(self):
+        for handlers in self._handlers.values():
+            for handler in handlers:
+                handler.close()
+        super().close()
+
+
 # Add a filter for `test_parallel` to parallel_log
 module_filter = MultiModuleFilter(["test_parallel", "run"])
 
@@ -40,107 +108,191 @@ for handler in parallel_log.logger.handlers:
     handler.addFilter(module_filter)
 
 
-def run(**kwargs):
-    """Main function to run parallel tests."""
-    # Use a Manager dictionary for shared state across processes
-    with Manager() as manager:
-        results = manager.dict()
-        parallel_tests = kwargs["parallel"]
-        parallel_tcs = manager.list()
-        max_time = kwargs.get("config", {}).get("max_time", None)
-        cancel_pending = kwargs.get("config", {}).get("cancel_pending", False)
-        parallel_log.info(kwargs)
-
-        with parallel(
-            thread_pool=False,
-            timeout=max_time,
-            shutdown_cancel_pending=cancel_pending,
-        ) as p:
-            for test in parallel_tests:
-                p.spawn(execute, test, kwargs, results, parallel_tcs)
-                sleep(1)  # Avoid overloading processes
-
-        # Convert results to a regular dictionary to inspect
-        results = dict(results)
-        parallel_log.info(f"Final test results: {results}")
-        parallel_log.info(f"Parallel test cases: {parallel_tcs}")
-        test_rc = 0
-
-        for key, value in results.items():
-            parallel_log.info(
-                f"{key} test result is {'PASS' if value == 0 else 'FAILED'}"
-            )
-            if value != 0:
-                test_rc = value
+def _init_worker(args, log_queue):
+    """Prepares a worker process, the records are shipped through the queue."""
+    global _worker_args
+    _worker_args = args
+
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(WorkerTestFilter())
+    for logger in (logging.getLogger(), logging.getLogger("cephci")):
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
 
-        return list(parallel_tcs), test_rc
+    logging.getLogger("cephci").propagate = True
+    logging.getLogger().addHandler(queue_handler)
+    logging.getLogger().setLevel(logging.INFO)
 
 
-def execute(test, args, results, parallel_tcs):
+def _log_file_name(test_name, run_dir):
+    """Returns a log file name of the test not used by an earlier test."""
+    if glob.glob(os.path.join(run_dir, f"{test_name}.*")):
+        _prefix = "".join(random.choices(string.ascii_letters + string.digits, k=4))
+        return f"{test_name}-{_prefix}"
+
+    return test_name
+
+
+def _abandon(futures, not_done, router):
     """
-    Executes the test in parallel.
+    Cancels the tests not completed in time and terminates their workers.
 
     Args:
-        test: The test module to execute.
-        args: Arguments passed to the test.
-        results: Shared dictionary to store test results.
-        parallel_tcs: Shared list to store test case details.
+        futures: test and log file name by future
+        not_done: futures of the tests not completed in time
+        router: TestLogRouter of the run
+
+    Returns:
+        elapsed time of the abandoned tests by future, zero when not started
     """
-    test = test.get("test")
-    test_name = test.get("name", "unknown_test")
-    module_name = os.path.splitext(test.get("module"))[0]
-    run_dir = args["run_config"]["log_dir"]
+    elapsed = dict()
+    # Pending tests first, a terminated worker breaks the pool
+    running = [future for future in not_done if not future.cancel()]
+    for future in not_done:
+        elapsed[future] = datetime.timedelta(0)
+
+    for future in running:
+        started, pid = router.started.get(futures[future][1], (None, None))
+        if started is None:
+            continue
+
+        elapsed[future] = datetime.timedelta(seconds=time.time() - started)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except OSError as err:
+            parallel_log.debug(f"Worker {pid} not terminated: {err}")
+
+    return elapsed
+
+
+def run(**kwargs):
+    """Main function to run parallel tests."""
+    parallel_tests = kwargs["parallel"]
+    max_time = kwargs.get("config", {}).get("max_time", None)
+    cancel_pending = kwargs.get("config", {}).get("cancel_pending", False)
+    max_workers = kwargs.get("config", {}).get("max_workers", len(parallel_tests))
+    parallel_log.info(kwargs)
+
+    if not kwargs.get("tc"):
+        raise CommandFailed(f"Test case is not passed as part of args : {kwargs}")
+
+    run_dir = kwargs["run_config"]["log_dir"]
     url_base = (
         magna_url + run_dir.split("/")[-1]
         if "/ceph/cephci-jenkins" in run_dir
         else run_dir
     )
-    if not args.get("tc"):
-        raise CommandFailed(f"Test case is not passed as part of args : {args}")
+
+    log_queue = multiprocessing.Queue()
+    router = TestLogRouter()
+    listener = logging.handlers.QueueListener(log_queue, router)
+    listener.start()
+
+    futures = dict()
+    executor = ProcessPoolExecutor(
+        max_workers=max(min(max_workers, len(parallel_tests)), 1),
+        initializer=_init_worker,
+        initargs=(kwargs, log_queue),
+    )
+    try:
+        for test in parallel_tests:
+            test = test.get("test")
+            test_name = test.get("name", "unknown_test").replace(" ", "_")
+            file_name = _log_file_name(test_name, run_dir)
+            log_url = f"{url_base}/{file_name}.log"
+            parallel_log.info(f"Log File location for test {test_name}: {log_url}")
+            router.add_test(
+                file_name,
+                os.path.join(run_dir, f"{file_name}.log"),
+                os.path.join(run_dir, f"{file_name}.err"),
+            )
+            futures[executor.submit(execute, test, file_name, log_url)] = (
+                test,
+                file_name,
+            )
+
+        _, not_done = wait(futures, timeout=max_time)
+        # Abandoned tests must not keep running against the cluster
+        listener.stop()
+        elapsed = _abandon(futures, not_done, router)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=cancel_pending)
+
+    results = dict()
+    parallel_tcs = list()
+    for future, (test, _) in futures.items():
+        if future in not_done or future.exception():
+            err = future.exception() if future not in not_done else None
+            err_msg = str(err) if err else f"did not complete within {max_time}s"
+            if future in not_done:
+                err_msg += ", cancelled" if future.cancelled() else ", abandoned"
+            test_name = test.get("name", "unknown_test").replace(" ", "_")
+            parallel_log.error(f"Test {test_name} {err_msg}")
+            tc = copy.deepcopy(kwargs["tc"])
+            tc.update(
+                {
+                    "name": test.get("name"),
+                    "desc": test.get("desc"),
+                    "status": "Failed",
+                    "err_type": "exception",
+                    "err_msg": err_msg,
+                    "duration": str(elapsed.get(future, datetime.timedelta(0))),
+                }
+            )
+            results[test_name] = 1
+        else:
+            test_name, rc, tc = future.result()
+            results[test_name] = rc
+
+        parallel_tcs.append(tc)
+
+    router.close()
+
+    parallel_log.info(f"Final test results: {results}")
+    parallel_log.info(f"Parallel test cases: {parallel_tcs}")
+    test_rc = 0
+
+    for key, value in results.items():
+        parallel_log.info(f"{key} test result is {'PASS' if value == 0 else 'FAILED'}")
+        if value != 0:
+            test_rc = value
+
+    return parallel_tcs, test_rc
+
+
+def execute(test, file_name, log_url):
+    """
+    Executes the test in a worker process.
+
+    Args:
+        test: The test details from the suite.
+        file_name: Name of the log file of the test.
+        log_url: URL of the log file of the test.
+
+    Returns:
+        tuple of the test name, return code and test case details
+    """
+    global _worker_test
+    _worker_test = file_name
+
+    args = _worker_args
+    test_name = test.get("name", "unknown_test").replace(" ", "_")
+    module_name = os.path.splitext(test.get("module"))[0]
+    run_dir = args["run_config"]["log_dir"]
     tc = copy.deepcopy(args["tc"])
     if test.get("polarion-id"):
         tc["polarion-id-link"] = f"{polarion_default_url}/{test.get('polarion-id')}"
-    test_name = test_name.replace(" ", "_")
-    _log_matches = glob.glob(os.path.join(run_dir, f"{test_name}.*"))
-    if _log_matches:
-        _prefix = "".join(random.choices(string.ascii_letters + string.digits, k=4))
-        file_name = f"{test_name}-{_prefix}"
-    else:
-        file_name = f"{test_name}"
-    log_url = f"{url_base}/{file_name}.log"
-    log_file = os.path.join(run_dir, f"{file_name}.log")
-    parallel_log.info(f"Log File location for test {test_name}: {log_url}")
-
-    # Configure logger for this test
-    test_logger = Log(module_name)
-    for handler in logging.getLogger().handlers[:]:
-        logging.getLogger().removeHandler(handler)
-    logging.basicConfig(
-        handlers=[logging.FileHandler(log_file)], level=logging.INFO, format=LOG_FORMAT
-    )
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(logging.Formatter(test_logger.log_format))
-    if not any(
-        isinstance(h, logging.StreamHandler) for h in test_logger.logger.handlers
-    ):
-        test_logger.logger.addHandler(console_handler)
-    err_logfile = os.path.join(run_dir, f"{file_name}.err")
-    error_handler = logging.FileHandler(err_logfile)
-    error_handler.setFormatter(logging.Formatter(LOG_FORMAT))
-    error_handler.setLevel(logging.ERROR)  # This ensures only errors are logged
-    test_logger.logger.addHandler(error_handler)
 
+    test_logger = Log(module_name)
     test_logger.info(f"Starting test: {test_name}")
+    start = datetime.datetime.now()
     try:
-        # Import and execute the test module
-        mod_file_name = os.path.splitext(test.get("module"))[0]
-        test_mod = importlib.import_module(mod_file_name)
+        # Import and execute the test module, imports are cached by the worker
+        test_mod = importlib.import_module(module_name)
         run_config = {
             "log_dir": run_dir,
             "run_id": args["run_config"]["run_id"],
         }
-        start = datetime.datetime.now()
 
         # Merging configurations safely
         test_config = args.get("config", {}).copy()
@@ -167,7 +319,6 @@ def execute(test, args, results, parallel_tcs):
         )
         elapsed = datetime.datetime.now() - start
         tc["duration"] = str(elapsed)
-        results[test_name] = rc
 
         test_logger.info(
             f"Test {test_name} completed with result: {'PASS' if rc == 0 else 'FAILED'}"
@@ -176,9 +327,6 @@ def execute(test, args, results, parallel_tcs):
         if rc == -1:
             tc["status"] = "Skipped"
 
-    except KeyError as e:
-        parallel_log.error(f"Missing required argument: {e}")
-        raise
     except Exception as e:
         test_logger.error(f"Test {test_name} failed with error: {e}")
         elapsed = datetime.datetime.now() - start
@@ -186,10 +334,8 @@ def execute(test, args, results, parallel_tcs):
         tc["status"] = "Failed"
         tc["err_type"] = "exception"
         tc["err_msg"] = str(e)
-        results[test_name] = 1
+        rc = 1
     finally:
-        # Always append tc to results, even if test failed with exception
-        parallel_tcs.append(tc)
-        # Reset root logger configuration to avoid conflicts
-        for handler in logging.getLogger().handlers[:]:
-            logging.getLogger().removeHandler(handler)
+        _worker_test = None
+
+    return test_name, rc, tc
@@ -395,23 +395,19 @@ def wait_for_clean_pg_sets(
         all_pg_active_clean = True
         if test_pool:
             log.debug(f"Checking for active + clean PGs on pool: {test_pool}")
-            pool_pg_ids = rados_obj.get_pgid(pool_name=test_pool)
-            for pg_id in pool_pg_ids:
-                try:
-                    pg_state = rados_obj.get_pg_state(pg_id=pg_id)
-                except Exception as err:
-                    log.error(f"PGID : {pg_id} was not found, err: {err}")
-                    continue
-                if any(key in health_warnings for key in pg_state.split("+")):
-                    all_pg_active_clean = False
-                    log.debug(
-                        f"PG: {pg_id} in states: {pg_state}"
-                        f"Waiting for active + clean. "
-                    )
-                    break
-                log.info(
-                    f" PG: {pg_id} in state: {pg_state}."
-                    f" Checking status on next PG in the pool"
+            try:
+                pg_states = rados_obj.get_pg_states(pool_name=test_pool)
+                pending_pgs = pg_states.with_any(health_warnings)
+            except Exception as err:
+                log.error(f"PGs of pool {test_pool} could not be fetched, err: {err}")
+                all_pg_active_clean = False
+                pending_pgs = []
+            if pending_pgs:
+                all_pg_active_clean = False
+                log.debug(
+                    f"{len(pending_pgs)} PGs of pool {test_pool} not yet active + clean,"
+                    f" e.g. PG: {pending_pgs[0]} in states: {pg_states.state(pending_pgs[0])}."
+                    f" PG States: {pg_states.counts()}"
                 )
         else:
             try:
@@ -7,6 +7,7 @@ import re
 import time
 
 from ceph.ceph_admin import CephAdmin
+from ceph.rados import pg_analytics
 from ceph.rados.core_workflows import RadosOrchestrator
 from ceph.rados.pool_workflows import PoolFunctions
 from ceph.rados.utils import get_cluster_timestamp
@@ -82,6 +83,7 @@ def run(ceph_cluster, **kw):
             f"Completed collection of balance scores for all the pools before enabling Online reads balancer"
             f"Scores are : {read_scores_pre}"
         )
+        distribution_pre = rados_obj.get_pg_distribution()
         existing_pools = rados_obj.list_pools()
         for pool_name in existing_pools:
             pool_details = rados_obj.get_pool_details(pool=pool_name)
@@ -196,6 +198,14 @@ def run(ceph_cluster, **kw):
             f"Completed collection of balance scores for all the pools before enabling Online reads balancer"
             f"Scores are : {read_scores_post}"
         )
+        distribution_post = rados_obj.get_pg_distribution()
+        if distribution_pre and distribution_post:
+            log.info(
+                "Change of the PG distribution upon enabling reads balancing : %s",
+                pg_analytics.diff(
+                    distribution_pre.summary(), distribution_post.summary()
+                ),
+            )
 
         log.info(
             "Checking if the read scores are lower upon enabling reads balancing via Balancer module"
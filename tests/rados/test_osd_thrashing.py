@@ -1356,19 +1356,18 @@ def run(ceph_cluster, **kw):
             inconsistent_pgs_found = []
         else:
             log.info("Checking for inconsistent PGs across all pools...")
-            all_pools = rados_obj.list_pools()
             inconsistent_pgs_found = []
-            for check_pool in all_pools:
-                try:
-                    inconsistent_pgs = rados_obj.get_inconsistent_pg_list(check_pool)
-                    if inconsistent_pgs:
-                        log.warning(
-                            f"Found {len(inconsistent_pgs)} inconsistent "
-                            f"PG(s) in pool {check_pool}: {inconsistent_pgs}"
-                        )
-                        inconsistent_pgs_found.extend(inconsistent_pgs)
-                except Exception as e:
-                    log.debug(f"Error checking pool {check_pool}: {e}")
+            try:
+                inconsistent_pgs_found = rados_obj.get_pg_states().with_any(
+                    "inconsistent"
+                )
+                if inconsistent_pgs_found:
+                    log.warning(
+                        f"Found {len(inconsistent_pgs_found)} inconsistent "
+                        f"PG(s): {inconsistent_pgs_found}"
+                    )
+            except Exception as e:
+                log.debug(f"Error checking for inconsistent PGs: {e}")
 
             if inconsistent_pgs_found:
                 if inconsistent_object_fail:
@@ -59,6 +59,22 @@ def run(ceph_cluster, **kw):
             log.error("Setting up client nodes failed")
             raise ClientSetupFailed
 
+        # synchronized radosbench on all the clients, compared with a baseline run
+        if io_stage == "coordinated_bench":
+            _, regressions = perf_obj.run_coordinated_bench(
+                pool_name=pool_name,
+                clients=[get_node_by_id(ceph_cluster, x) for x in client_nodes],
+                artifact_dir=kw["run_config"]["log_dir"],
+                baseline=io_config.get("baseline"),
+                tolerance=io_config.get("tolerance", 0.1),
+                **io_config.get("bench_config", {}),
+            )
+            if regressions:
+                log.error(f"rados bench regressed against the baseline : {regressions}")
+                return 1
+            log.info("Coordinated rados bench completed without regressions")
+            return 0
+
         # number of clients
         client_count = len(client_config)
 
@@ -0,0 +1,146 @@
+import mock
+import pytest
+
+from ceph.ceph_admin.command_cache import (
+    CommandCache,
+    is_query,
+    is_read_only,
+    normalize,
+)
+from ceph.ceph_admin.shell import ShellMixin
+
+
+@pytest.mark.parametrize(
+    "cmd, expected",
+    [
+        ("ceph osd tree -f json", True),
+        ("ceph  orch ps --format=json", True),
+        ("ceph config get mon public_network", True),
+        ("ceph osd pool set rbd size 2", False),
+        ("ceph auth get-or-create client.1", False),
+        ("ceph -s -f json", False),
+        ("ceph pg dump -f json", False),
+        ("rados ls -p rbd", False),
+    ],
+)
+def test_is_read_only(cmd, expected):
+    assert is_read_only(cmd) is expected
+
+
+@pytest.mark.parametrize(
+    "cmd, expected",
+    [
+        ("ceph -s", True),
+        ("ceph -s -f json", True),
+        ("ceph health detail", True),
+        ("ceph pg dump -f json", True),
+        ("ceph df", True),
+        ("rados lspools", True),
+        ("ceph osd tree", True),
+        ("ceph health mute OSD_DOWN", False),
+        ("ceph osd pool set rbd size 2", False),
+        ("ceph pg repair 1.0", False),
+        ("rados -p rbd put obj /tmp/obj", False),
+        ("ceph orch daemon restart osd.1", False),
+        ("systemctl stop ceph.target", False),
+    ],
+)
+def test_is_query(cmd, expected):
+    assert is_query(cmd) is expected
+
+
+def test_observe():
+    cache = CommandCache()
+    cache.put("ceph", "ceph osd tree", ("a", ""))
+    for cmd in ("ceph -s", "ceph health detail", "ceph pg dump", "ceph df"):
+        cache.observe("ceph", cmd)
+    assert cache.get("ceph", "ceph osd tree") == ("a", "")
+
+    cache.observe("ceph", "ceph osd out 1")
+    assert cache.get("ceph", "ceph osd tree") is None
+
+
+def test_normalize():
+    assert normalize("ceph  osd tree --format json") == "ceph osd tree -f json"
+    assert normalize("ceph osd tree --format=json") == "ceph osd tree -f json"
+
+
+class TestCommandCache:
+    def test_ttl(self):
+        cache = CommandCache(ttl=10)
+        with mock.patch("ceph.ceph_admin.command_cache.monotonic", return_value=0):
+            cache.put("ceph", "ceph osd tree", ("out", ""))
+            assert cache.get("ceph", "ceph  osd tree") == ("out", "")
+
+        with mock.patch("ceph.ceph_admin.command_cache.monotonic", return_value=11):
+            assert cache.get("ceph", "ceph osd tree") is None
+
+        assert cache.stats == {
+            "hits": 1,
+            "misses": 1,
+            "invalidations": 0,
+            "hit_ratio": 0.5,
+        }
+
+    def test_invalidate(self):
+        cache = CommandCache()
+        cache.put("ceph", "ceph osd tree", ("a", ""))
+        cache.put("site2", "ceph osd tree", ("b", ""))
+        cache.invalidate("ceph")
+
+        assert cache.get("ceph", "ceph osd tree") is None
+        assert cache.get("site2", "ceph osd tree") == ("b", "")
+        assert cache.invalidations == 1
+
+
+class Shell(ShellMixin):
+    def __init__(self):
+        self.config = {"command_cache": "true"}
+        self.cluster = mock.Mock()
+        self.cluster.name = "ceph"
+        self.installer = mock.Mock()
+        self.installer.node.exit_status = 0
+        self.installer.exec_command.return_value = ("out", "")
+
+
+@mock.patch("ceph.ceph_admin.shell.COMMAND_CACHE", CommandCache())
+def test_shell_cache():
+    shell = Shell()
+    exec_command = shell.installer.exec_command
+
+    assert shell.shell(["ceph", "osd", "tree"]) == ("out", "")
+    assert shell.shell(["ceph", "osd", "tree"]) == ("out", "")
+    assert exec_command.call_count == 1
+
+    shell.shell(["ceph", "osd", "pool", "set", "rbd", "size", "2"])
+    shell.shell(["ceph", "osd", "tree"])
+    assert exec_command.call_count == 3
+
+
+@mock.patch("ceph.ceph_admin.shell.COMMAND_CACHE", CommandCache())
+def test_shell_cache_invalidated_by_any_path():
+    shell = Shell()
+    exec_command = shell.installer.exec_command
+
+    shell.shell(["ceph", "orch", "ps"])
+    shell.shell(
+        ["ceph", "orch", "apply", "-i", "/mnt/spec.yaml"],
+        base_cmd_args={"mount": "/tmp:/mnt"},
+    )
+    shell.shell(["ceph", "orch", "ps"])
+    assert exec_command.call_count == 3
+
+    shell.shell(["ceph", "orch", "ps"])
+    shell.installer.node.exit_status = 1
+    assert shell.shell(["ceph", "orch", "ps"]) == ("out", "")
+    assert shell.installer.node.exit_status == 0
+    assert exec_command.call_count == 3
+
+
+def test_ttl_per_caller():
+    cache = CommandCache(ttl=10)
+    with mock.patch("ceph.ceph_admin.command_cache.monotonic", return_value=0):
+        cache.put("ceph", "ceph osd tree", ("out", ""))
+
+    with mock.patch("ceph.ceph_admin.command_cache.monotonic", return_value=5):
+        assert cache.get("ceph", "ceph osd tree", ttl=2) is None
@@ -0,0 +1,148 @@
+import os
+import subprocess
+import threading
+
+import mock
+import pytest
+
+from ceph.ceph import CommandFailed
+from ceph.ceph_admin.shell_pool import CephadmShellPool, poolable
+
+
+class LocalShellChannel:
+    """paramiko.Channel stand-in backed by a local bash process."""
+
+    def __init__(self):
+        self.closed = False
+        self.eof_received = False
+        self.status_event = threading.Event()
+        self._buffers = {"out": bytearray(), "err": bytearray()}
+        self._lock = threading.Lock()
+        self._rfd, self._wfd = os.pipe()
+        self._proc = None
+
+    def exec_command(self, cmd):
+        self._proc = subprocess.Popen(
+            ["bash", "-s"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        for name, stream in (("out", self._proc.stdout), ("err", self._proc.stderr)):
+            threading.Thread(target=self._pump, args=(name, stream)).start()
+
+    def _pump(self, name, stream):
+        for data in iter(lambda: os.read(stream.fileno(), 65536), b""):
+            with self._lock:
+                self._buffers[name].extend(data)
+            os.write(self._wfd, b"x")
+
+        if name == "out":
+            self._proc.wait()
+            self.eof_received = True
+            self.status_event.set()
+
+    def _recv(self, name, nbytes):
+        with self._lock:
+            data = bytes(self._buffers[name][:nbytes])
+            del self._buffers[name][:nbytes]
+        return data
+
+    def fileno(self):
+        return self._rfd
+
+    def sendall(self, data):
+        self._proc.stdin.write(data)
+        self._proc.stdin.flush()
+
+    def recv_ready(self):
+        return bool(self._buffers["out"])
+
+    def recv_stderr_ready(self):
+        return bool(self._buffers["err"])
+
+    def recv(self, nbytes):
+        os.read(self._rfd, 1)
+        return self._recv("out", nbytes)
+
+    def recv_stderr(self, nbytes):
+        return self._recv("err", nbytes)
+
+    def exit_status_ready(self):
+        return self.status_event.is_set()
+
+    def close(self):
+        self.closed = True
+        self._proc.kill()
+
+
+@pytest.fixture
+def pool():
+    node = mock.Mock()
+    node.hostname = "node1"
+    connection = node.root_connection
+    connection.open_channel.side_effect = lambda timeout=None: LocalShellChannel()
+    connection.release_channel.side_effect = lambda channel: channel.close()
+    _pool = CephadmShellPool(node, size=2)
+    yield _pool
+    _pool.close()
+
+
+class TestCephadmShellPool:
+    def test_execute(self, pool):
+        out, err, rc, _ = pool.execute("echo out; echo err >&2; false")
+
+        assert (out, err, rc) == ("out\n", "err\n", 1)
+
+    def test_output_without_newline_and_exit(self, pool):
+        assert pool.execute("printf abc")[:3] == ("abc", "", 0)
+        assert pool.execute("exit 7")[2] == 7
+        assert pool.execute("echo next")[0] == "next\n"
+        assert pool.restarts == 0
+
+    def test_restart_dead_session(self, pool):
+        pool.execute("true")
+        pool._idle[0].close()
+
+        assert pool.execute("echo alive")[0] == "alive\n"
+        assert pool.restarts == 1
+
+    def test_waiter_woken_by_dead_session(self, pool):
+        pool.size = 1
+        results = []
+        busy = threading.Thread(
+            target=lambda: results.append(
+                pytest.raises(CommandFailed, pool.execute, "sleep 0.5; kill -9 $$")
+            )
+        )
+        busy.start()
+        waiter = threading.Thread(
+            target=lambda: results.append(pool.execute("echo ok"))
+        )
+        waiter.start()
+
+        busy.join(timeout=30)
+        waiter.join(timeout=30)
+        assert not waiter.is_alive()
+        assert results[-1][0] == "ok\n"
+
+    def test_timeout(self, pool):
+        with pytest.raises(CommandFailed):
+            pool.execute("sleep 10", timeout=1)
+
+        assert pool.execute("echo ok")[0] == "ok\n"
+
+
+@pytest.mark.parametrize(
+    "cmd, expected",
+    [
+        ("ceph osd tree -f json", True),
+        ("ceph config set osd osd_max_backfills=2", True),
+        ("ceph orch ls > /tmp/services", False),
+        ("ceph osd dump | grep pool", False),
+        ("ceph orch apply -i /root/spec.yaml", False),
+        ("ceph config set mgr key=$(cat key)", False),
+    ],
+)
+def test_poolable(cmd, expected):
+    assert poolable(cmd) is expected
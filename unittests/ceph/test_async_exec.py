@@ -0,0 +1,97 @@
+import asyncio
+import threading
+
+import pytest
+
+from ceph.async_exec import gather_on_nodes, run_on_nodes
+from ceph.command_metrics import COMMAND_METRICS
+from cli import Cli
+
+
+class Overlap:
+    """Tracks the commands executing at the same time.
+
+    The commands wait on a barrier of the expected concurrency, it breaks
+    when fewer commands overlap, hence no assertion depends on the timing.
+    """
+
+    def __init__(self, parties):
+        self.barrier = threading.Barrier(parties, timeout=30)
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        self.barrier.wait()
+
+    def __exit__(self, *args):
+        with self._lock:
+            self.running -= 1
+
+
+class FakeNode:
+    def __init__(self, shortname, overlap=None):
+        self.shortname = shortname
+        self.overlap = overlap
+
+    def exec_command(self, cmd, **kw):
+        if self.overlap:
+            with self.overlap:
+                pass
+        if cmd == "fail":
+            raise RuntimeError(self.shortname)
+        return f"{self.shortname}:{cmd}", ""
+
+
+class TestAsyncExec:
+    def test_gather_on_nodes_bounded(self):
+        overlap = Overlap(5)
+        nodes = [FakeNode(f"node{idx}", overlap) for idx in range(10)]
+        out = asyncio.run(gather_on_nodes(nodes, "uptime", limit=5))
+
+        assert overlap.peak == 5
+        assert list(out) == [node.shortname for node in nodes]
+        assert out["node3"] == ("node3:uptime", "")
+
+    def test_run_on_nodes_raises(self):
+        with pytest.raises(RuntimeError):
+            run_on_nodes([FakeNode("node1"), FakeNode("node2")], "fail")
+
+    def test_cli_execute_concurrently(self):
+        # 16 nodes at a time by default
+        overlap = Overlap(16)
+        nodes = [FakeNode(f"node{idx}", overlap) for idx in range(32)]
+        out = Cli(nodes).execute(cmd="uptime", sudo=True)
+
+        assert overlap.peak == 16
+        assert len(out) == 32
+
+    def test_cli_aexecute_single_node(self):
+        out = asyncio.run(Cli(FakeNode("node1")).aexecute(cmd="uptime"))
+
+        assert out == ("node1:uptime", "")
+
+    def test_cli_execute_in_running_loop(self):
+        nodes = [FakeNode(f"node{idx}") for idx in range(4)]
+
+        async def _execute():
+            return Cli(nodes).execute(cmd="uptime")
+
+        out = asyncio.run(_execute())
+        assert out["node2"] == ("node2:uptime", "")
+
+    def test_metrics_binding_propagated(self):
+        class BoundNode(FakeNode):
+            def exec_command(self, cmd, **kw):
+                return COMMAND_METRICS._context.test_name, ""
+
+        COMMAND_METRICS.bind("test_one")
+        try:
+            out = Cli([BoundNode("node1"), BoundNode("node2")]).execute(cmd="uptime")
+        finally:
+            COMMAND_METRICS.bind(None)
+
+        assert {result[0] for result in out.values()} == {"test_one"}
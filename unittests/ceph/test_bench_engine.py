@@ -0,0 +1,145 @@
+import json
+import time
+
+import pytest
+
+from ceph.rados.bench_engine import BenchReport, CoordinatedBench, parse_bench_output
+from ceph.rados.rados_bench import RadosBenchExecutionFailure
+
+
+def bench_output(bandwidths, latency):
+    lines = ["hints = 1", "Maintaining 16 concurrent writes of 4194304 bytes"]
+    finished = 0
+    for sec, bandwidth in enumerate(bandwidths, start=1):
+        finished += bandwidth // 4
+        lines.append(
+            json.dumps(
+                {
+                    "sec": sec,
+                    "cur_ops": 16,
+                    "started": finished + 16,
+                    "finished": finished,
+                    "avg_bw": str(bandwidth),
+                    "cur_bw": str(bandwidth),
+                    "last_lat": str(latency * sec),
+                    "avg_lat": str(latency),
+                }
+            )
+        )
+    lines.append(
+        json.dumps(
+            {
+                "total_time_run": str(len(bandwidths)),
+                "total_writes_made": finished,
+                "bandwidth": str(sum(bandwidths) / len(bandwidths)),
+                "average_iops": finished / len(bandwidths),
+                "average_latency": str(latency),
+            }
+        )
+    )
+    return "\n".join(lines)
+
+
+class FakeClient:
+    def __init__(self, hostname, bandwidths, latency, fail=False):
+        self.hostname = hostname
+        self.output = bench_output(bandwidths, latency)
+        self.fail = fail
+        self.cmds = []
+
+    def exec_command(self, cmd, **kw):
+        self.cmds.append((time.time(), cmd))
+        if cmd.startswith("date"):
+            if self.fail:
+                raise RuntimeError("node unreachable")
+            return f"{time.time() + 100:.9f}", ""
+        return self.output, ""
+
+
+def test_parse_bench_output():
+    samples, summary = parse_bench_output(bench_output([100, 200], 0.1))
+    assert [s["sec"] for s in samples] == [1, 2]
+    assert samples[1]["cur_bw"] == 200.0
+    assert summary["bandwidth"] == 150.0
+    assert parse_bench_output("no json here {") == ([], {})
+
+
+def test_merge():
+    report = BenchReport.merge(
+        {"mode": "write", "pool": "bench"},
+        {
+            "node1": parse_bench_output(bench_output([100, 200, 100], 0.1)),
+            "node2": parse_bench_output(bench_output([300, 200], 0.3)),
+        },
+    )
+    series = report.data["series"]
+    assert [e["clients"] for e in series] == [2, 2, 1]
+    assert series[0]["bandwidth_mb"] == 400
+    assert series[1]["iops"] == 100
+    assert series[1]["latency_p50"] == 0.2
+    assert series[1]["latency_p99"] == 0.6
+    summary = report.summary
+    assert summary["bandwidth_mb"] == 383.333
+    assert summary["bandwidth_mb_per_sec"]["min"] == 400
+    assert summary["latency_p99"] == 0.6
+    assert report.data["clients"] == ["node1", "node2"]
+
+
+def test_run_synchronized():
+    clients = [FakeClient(f"node{i}", [100, 100], 0.1) for i in range(3)]
+    report = CoordinatedBench(clients, pool_name="bench", seconds=2, lead=5).run()
+    assert report.data["num_clients"] == 3
+    assert report.summary["bandwidth_mb"] == 300
+    for client in clients:
+        issued, cmd = client.cmds[-1]
+        assert issued <= report.data["started"]
+        assert f"--run-name bench-{client.hostname}" in cmd
+        # start time converted to the clock of the client
+        start_ns = int(cmd.split("delay=$(( ")[1].split(" ")[0])
+        assert abs(start_ns / 1e9 - report.data["started"] - 100) < 1
+
+
+def test_run_failure():
+    clients = [
+        FakeClient("node1", [100], 0.1),
+        FakeClient("node2", [100], 0.1, fail=True),
+    ]
+    with pytest.raises(RadosBenchExecutionFailure):
+        CoordinatedBench(clients, pool_name="bench", seconds=1).run()
+    assert len(clients[0].cmds) == 1
+
+    with pytest.raises(ValueError, match="at least one client"):
+        CoordinatedBench([], pool_name="bench")
+
+
+def test_save_and_compare(tmp_path):
+    config = {"mode": "write", "pool": "bench", "object_size": "4M", "threads": 16}
+    baseline = BenchReport.merge(
+        config, {"node1": parse_bench_output(bench_output([100, 100], 0.1))}
+    )
+    path = baseline.save(str(tmp_path))
+    assert path.endswith("radosbench-write-bench.json")
+    # Later runs do not overwrite the earlier artifacts
+    assert baseline.save(str(tmp_path)).endswith("radosbench-write-bench-1.json")
+    started = BenchReport(dict(baseline.data, started=0))
+    assert started.save(str(tmp_path)).endswith("bench-19700101-000000.json")
+    baseline = BenchReport.load(path)
+
+    current = BenchReport.merge(
+        config, {"node1": parse_bench_output(bench_output([95, 95], 0.105))}
+    )
+    assert current.compare(baseline) == []
+
+    current = BenchReport.merge(
+        config, {"node1": parse_bench_output(bench_output([50, 50], 0.2))}
+    )
+    regressions = current.compare(baseline)
+    assert [r.split()[0] for r in regressions] == [
+        "bandwidth_mb",
+        "iops",
+        "latency_p50",
+        "latency_p99",
+    ]
+
+    with pytest.raises(ValueError):
+        current.compare(BenchReport(dict(baseline.data, threads=32)))
@@ -0,0 +1,377 @@
+import os
+import subprocess
+import threading
+from time import sleep, time
+
+import mock
+import pytest
+
+import ceph.ceph
+from ceph.ceph import (
+    CephNode,
+    CommandFailed,
+    SSHConnectionManager,
+    TimeoutException,
+)
+
+
+class FakeChannel:
+    """Minimal paramiko.Channel stand-in completing after the given delay."""
+
+    def __init__(self, output=b"", delay=0.01, exit_code=0):
+        self._output = output
+        self._delay = delay
+        self._exit_code = exit_code
+        self._data = b""
+        self._rfd, self._wfd = os.pipe()
+        self.eof_received = False
+        self.closed = False
+        self.status_event = threading.Event()
+
+    def exec_command(self, cmd):
+        timer = threading.Timer(self._delay, self._finish)
+        timer.daemon = True
+        timer.start()
+
+    def _finish(self):
+        if self.closed:
+            return
+        self._data = self._output
+        self.eof_received = True
+        os.write(self._wfd, b"x")
+        self.status_event.set()
+
+    def fileno(self):
+        return self._rfd
+
+    def settimeout(self, timeout):
+        pass
+
+    def recv_ready(self):
+        return bool(self._data)
+
+    def recv_stderr_ready(self):
+        return False
+
+    def exit_status_ready(self):
+        return self.status_event.is_set()
+
+    def recv(self, nbytes):
+        chunk, self._data = self._data[:nbytes], self._data[nbytes:]
+        return chunk
+
+    def recv_stderr(self, nbytes):
+        return b""
+
+    def recv_exit_status(self):
+        return self._exit_code
+
+    def get_transport(self):
+        transport = mock.Mock()
+        transport.get_username.return_value = "cephuser"
+        return transport
+
+    def close(self):
+        # Like paramiko, closing wakes up a waiter, the pipe is closed on delete
+        if not self.closed:
+            self.closed = True
+            os.write(self._wfd, b"x")
+
+    def __del__(self):
+        os.close(self._rfd)
+        os.close(self._wfd)
+
+
+class ChattyChannel(FakeChannel):
+    """Channel of a command printing without pause."""
+
+    def recv_ready(self):
+        return True
+
+    def recv(self, nbytes):
+        return b"progress\n"
+
+
+class VirtualClock:
+    """Time of the benchmarks, advanced only by the waits of the channels."""
+
+    def __init__(self):
+        self.now = 0.0
+
+
+class SignalledChannel(FakeChannel):
+    """Channel of a command exiting after latency seconds of the virtual clock.
+
+    The exit is signalled through status_event and the descriptor like paramiko,
+    select on the channel returns at the exit instead of after the full wait.
+    """
+
+    def __init__(self, clock, latency, **kw):
+        super().__init__(**kw)
+        self.clock = clock
+        self.latency = latency
+        self.exit_at = None
+
+    def exec_command(self, cmd):
+        self.exit_at = self.clock.now + self.latency
+
+    def select(self, timeout):
+        self.clock.now += min(timeout, max(self.exit_at - self.clock.now, 0))
+        self._tick()
+
+    def sleep(self, seconds):
+        self.clock.now += seconds
+        self._tick()
+
+    def _tick(self):
+        if self.clock.now >= self.exit_at and not self.status_event.is_set():
+            self._finish()
+
+
+def _virtual_latency(latencies, polling=False):
+    """Returns the mean virtual time exec_command took to return the commands."""
+    clock = VirtualClock()
+    channels = [SignalledChannel(clock, latency) for latency in latencies]
+    node = _fake_node(channels)
+
+    if polling:
+        # The former loop slept a fixed second between the exit checks
+        wait = mock.patch(
+            "ceph.ceph.wait_for_channel",
+            side_effect=lambda channel, *args: channel.sleep(1.0),
+        )
+    else:
+        wait = mock.patch(
+            "select.select",
+            side_effect=lambda rlist, wlist, xlist, timeout: rlist[0].select(timeout),
+        )
+
+    with wait:
+        for _ in channels:
+            node.exec_command(cmd="ceph osd dump -f json")
+
+    return clock.now / len(channels)
+
+
+def _fake_node(channels):
+    node = CephNode.__new__(CephNode)
+    node.hostname = "node1"
+    node.ip_address = "10.0.0.1"
+    node.username = "cephuser"
+    node.run_once = False
+    node.use_agent = False
+    connection = mock.Mock()
+    connection.open_channel.side_effect = channels
+    connection.release_channel.side_effect = lambda channel: channel.close()
+    node.connection = node.root_connection = connection
+    return node
+
+
+class TestLongRunning:
+    def test_output_and_exit_code(self):
+        node = _fake_node([FakeChannel(output=b"HEALTH_OK\n", exit_code=3)])
+        out, err, rc, _ = node.exec_command(cmd="ceph health", verbose=True)
+
+        assert out == "HEALTH_OK\n"
+        assert err == ""
+        assert rc == 3
+
+    def test_waits_on_channel_events(self):
+        """Short commands are woken by the channel instead of a one second sleep."""
+        node = _fake_node([FakeChannel()])
+
+        with mock.patch(
+            "ceph.ceph.wait_for_channel", wraps=ceph.ceph.wait_for_channel
+        ) as wait, mock.patch("ceph.ceph.sleep") as _sleep:
+            node.exec_command(cmd="ceph osd dump -f json")
+
+        assert wait.called
+        assert not _sleep.called
+
+    @pytest.mark.parametrize("latencies", [[0.01, 0.05, 0.2, 0.5] * 5])
+    def test_benchmark_short_command_latency(self, latencies):
+        """Short commands return at their exit, not at the next one second poll."""
+        latency = _virtual_latency(latencies)
+        polling_latency = _virtual_latency(latencies, polling=True)
+
+        print(
+            f"\nper-command latency: event-driven {latency * 1000:.1f}ms, "
+            f"1s polling {polling_latency * 1000:.1f}ms"
+        )
+        assert latency == pytest.approx(sum(latencies) / len(latencies))
+        assert polling_latency == pytest.approx(1.0)
+
+
+class TestExecStream:
+    def test_lines_and_exit_status(self):
+        node = _fake_node([FakeChannel(output=b"one\ntwo\nthree", exit_code=2)])
+        stream = node.exec_stream(cmd="ceph -w")
+
+        assert list(stream) == ["one", "two", "three"]
+        assert stream.exit_status == 2
+
+    def test_chunks_with_long_lines(self):
+        output = b"x" * 100000 + b"\n"
+        node = _fake_node([FakeChannel(output=output)])
+
+        assert b"".join(node.exec_stream(cmd="fio", chunks=True)) == output
+
+        node = _fake_node([FakeChannel(output=output)])
+        lines = list(node.exec_stream(cmd="fio", max_line_bytes=32768))
+        assert "".join(lines) == output.decode().strip()
+        assert max(len(line) for line in lines) < 100000
+
+    def test_check_ec(self):
+        node = _fake_node([FakeChannel(output=b"out\n", exit_code=1)])
+
+        with pytest.raises(CommandFailed):
+            list(node.exec_stream(cmd="false", check_ec=True))
+
+    def test_timeout_while_printing(self):
+        node = _fake_node([ChattyChannel(delay=60)])
+        stream = node.exec_stream(cmd="ceph -w", timeout=1)
+
+        with pytest.raises(CommandFailed):
+            for _ in stream:
+                pass
+
+    def test_close_from_another_thread(self):
+        channel = FakeChannel(delay=60)
+        node = _fake_node([channel])
+        stream = node.exec_stream(cmd="ceph -w")
+        lines = []
+        reader = threading.Thread(target=lambda: lines.extend(stream))
+        reader.start()
+
+        sleep(0.2)
+        stream.close()
+        reader.join(timeout=5)
+
+        assert not reader.is_alive()
+        assert channel.closed
+        assert stream.exit_status is None
+
+
+class TestSpooledOutput:
+    def test_spill_to_disk(self):
+        output = b'{"pg_stats": [' + b",".join([b'{"pgid": "1.0"}'] * 5000) + b"]}"
+        node = _fake_node([FakeChannel(output=output)])
+        out, err = node.exec_command(cmd="ceph pg dump -f json", spool_size=1024)
+
+        assert out.spilled
+        assert out.size == len(output)
+        assert not out.isspace()
+        assert len(out.json()["pg_stats"]) == 5000
+        assert out.mmap()[:14] == output[:14]
+
+    def test_in_memory(self):
+        node = _fake_node([FakeChannel(output=b"  \n")])
+        out, _ = node.exec_command(cmd="ceph osd tree -f json", spool_size=1024)
+
+        assert not out.spilled
+        assert out.isspace()
+        assert list(out.lines()) == ["  "]
+        assert out.mmap()[:] == b"  \n"
+        assert out.spilled
+
+    def test_empty(self):
+        node = _fake_node([FakeChannel(output=b"")])
+        out, _ = node.exec_command(cmd="ceph osd blocklist ls", spool_size=1024)
+        out.file.rollover()
+
+        assert out.mmap() == b""
+        assert out.text() == ""
+
+
+def _local_exec(**kw):
+    proc = subprocess.run(["bash", "-c", kw["cmd"]], capture_output=True, text=True)
+    return proc.stdout, proc.stderr, proc.returncode, 0.0
+
+
+class TestExecBatch:
+    @pytest.fixture
+    def node(self):
+        node = _fake_node([])
+        node.exec_command = mock.Mock(side_effect=_local_exec)
+        return node
+
+    def test_results(self, node):
+        results = node.exec_batch(
+            ["echo one", "printf 'two'; echo err >&2", "exit 3", "echo four"],
+            stop_on_error=False,
+            check_ec=False,
+        )
+
+        assert node.exec_command.call_count == 1
+        assert [result[:3] for result in results] == [
+            ("one\n", "", 0),
+            ("two", "err\n", 0),
+            ("", "", 3),
+            ("four\n", "", 0),
+        ]
+
+    def test_stop_on_error(self, node):
+        results = node.exec_batch(["true", "false", "echo skipped"], check_ec=False)
+
+        assert [result[2] for result in results] == [0, 1]
+
+        with pytest.raises(CommandFailed, match="false returned"):
+            node.exec_batch(["true", "false", "echo skipped"])
+
+
+class TestSSHConnectionPool:
+    @pytest.fixture
+    def connection(self):
+        with mock.patch("ceph.ceph.paramiko.SSHClient") as client, mock.patch.object(
+            SSHConnectionManager, "_SSHConnectionManager__connect"
+        ):
+            transport = client.return_value.get_transport.return_value
+            transport.open_session.side_effect = lambda **kw: mock.Mock()
+            yield SSHConnectionManager(
+                "10.0.0.1", "cephuser", "pass", pool_size=2, max_channels=2
+            )
+
+    def test_channel_limits(self, connection):
+        channels = [connection.open_channel(timeout=1) for _ in range(4)]
+
+        assert connection.metrics["transports"] == 2
+        assert connection.metrics["open_channels"] == 4
+        with pytest.raises(TimeoutException):
+            connection.open_channel(timeout=0.2)
+
+        connection.release_channel(channels.pop())
+        channels.append(connection.open_channel(timeout=1))
+        for channel in channels:
+            connection.release_channel(channel)
+
+        assert connection.metrics["open_channels"] == 0
+        assert connection.metrics["waiters"] == 0
+
+    def test_pool_client_connected_once(self):
+        with mock.patch("ceph.ceph.paramiko.SSHClient") as client, mock.patch.object(
+            SSHConnectionManager,
+            "_SSHConnectionManager__connect",
+            side_effect=lambda *args: sleep(0.1),
+        ):
+            connection = SSHConnectionManager("10.0.0.1", "cephuser", "pass")
+            connection.max_channels = 0
+            connection._free_slot()
+            created = client.call_count
+            threads = [
+                threading.Thread(target=connection._get_pool_client, args=[1])
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert client.call_count == created + 1
+
+    def test_waiter_woken_on_release(self, connection):
+        channels = [connection.open_channel() for _ in range(4)]
+        threading.Timer(0.2, connection.release_channel, args=[channels[0]]).start()
+
+        start = time()
+        connection.release_channel(connection.open_channel(timeout=5))
+        assert time() - start < 1
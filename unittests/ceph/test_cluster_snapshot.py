@@ -0,0 +1,201 @@
+import json
+
+import pytest
+
+from ceph.ceph import CommandFailed
+from ceph.rados.cluster_snapshot import ClusterSnapshot
+from ceph.rados.core_workflows import RadosOrchestrator
+
+REPORT = {
+    "health": {"status": "HEALTH_OK"},
+    "osdmap": {
+        "epoch": 42,
+        "pools": [
+            {"pool": 1, "pool_name": ".mgr", "size": 3},
+            {"pool": 2, "pool_name": "rbd", "size": 3},
+        ],
+        "osds": [
+            {"osd": 0, "up": 1, "in": 1, "state": ["exists", "up"]},
+            {"osd": 1, "up": 1, "in": 1, "state": ["exists", "up"]},
+            {"osd": 2, "up": 0, "in": 0, "state": ["exists", "destroyed"]},
+        ],
+    },
+}
+PGS = {
+    "pg_stats": [
+        {
+            "pgid": "1.0",
+            "state": "active+clean",
+            "up": [0, 1],
+            "acting": [0, 1],
+            "acting_primary": 0,
+        },
+        {
+            "pgid": "2.0",
+            "state": "active+clean+scrubbing",
+            "up": [1, 0],
+            "acting": [1, 0],
+            "acting_primary": 1,
+        },
+        {
+            "pgid": "2.1",
+            "state": "active+undersized+degraded",
+            "up": [0],
+            "acting": [0, 2],
+            "acting_primary": 0,
+        },
+    ]
+}
+OSD_TREE = {
+    "nodes": [
+        {"id": -1, "name": "default", "type": "root", "children": [-3, -5]},
+        {"id": -3, "name": "node1", "type": "host", "children": [0, 2]},
+        {"id": 0, "name": "osd.0", "type": "osd"},
+        {"id": 2, "name": "osd.2", "type": "osd"},
+        {"id": -5, "name": "node2", "type": "host", "children": [1]},
+        {"id": 1, "name": "osd.1", "type": "osd"},
+    ],
+    "stray": [],
+}
+ORCH_PS = [{"daemon_type": "osd", "daemon_id": "0"}, {"daemon_type": "mon"}]
+
+
+class FakeNode:
+    def __init__(self, rcs=(0, 0, 0, 0)):
+        self.rcs = rcs
+        self.cmds = []
+
+    def exec_batch(self, cmds, **kw):
+        self.cmds.append(cmds)
+        outputs = (REPORT, PGS, OSD_TREE, ORCH_PS)
+        return [
+            (json.dumps(out) if rc == 0 else "", "error", rc, 0.1)
+            for out, rc in zip(outputs, self.rcs)
+        ]
+
+
+@pytest.fixture
+def snapshot():
+    return ClusterSnapshot.capture(FakeNode())
+
+
+def test_indexes(snapshot):
+    assert snapshot.epoch == 42
+    assert snapshot.pool("rbd")["size"] == 3
+    assert snapshot.pool(1)["pool_name"] == ".mgr"
+    assert snapshot.pool("missing") == {}
+    assert snapshot.pool_id("rbd") == 2
+    assert snapshot.pg("2.1")["acting"] == [0, 2]
+    assert snapshot.osd_hosts() == ["node1", "node2"]
+    assert snapshot.osds_by_host["node1"] == [0, 2]
+    assert len(snapshot.daemons["osd"]) == 1
+
+
+def test_pgids(snapshot):
+    assert snapshot.pgids(pool_name="rbd") == ["2.0", "2.1"]
+    assert snapshot.pgids(pool_id=1) == ["1.0"]
+    assert snapshot.pgids(osd=2) == ["2.1"]
+    assert sorted(snapshot.pgids(osd=0)) == ["1.0", "2.0", "2.1"]
+    assert snapshot.pgids(osd=0, pool_id=2) == ["2.0", "2.1"]
+    assert snapshot.pgids(osd_primary=0) == ["1.0", "2.1"]
+    assert snapshot.pgids(pool_name="rbd", states="scrubbing degraded") == [
+        "2.0",
+        "2.1",
+    ]
+    assert snapshot.pgids(pool_id=2, states="undersized") == ["2.1"]
+    assert snapshot.pgids() == []
+
+
+def test_pgids_by_acting_set():
+    pgs = {
+        "pg_stats": [
+            {
+                "pgid": "2.0",
+                "state": "active+remapped+backfilling",
+                "up": [1, 2],
+                "acting": [1, 0],
+                "acting_primary": 1,
+            }
+        ]
+    }
+    snapshot = ClusterSnapshot(REPORT, pgs, OSD_TREE)
+    assert snapshot.pgids(osd=0) == ["2.0"]
+    assert snapshot.pgids(osd=2) == []
+
+
+def test_knows(snapshot):
+    assert snapshot.knows(pool_name="rbd", osd=0)
+    assert snapshot.knows(pool_id="2", osd_primary=1)
+    assert not snapshot.knows(pool_name="new_pool")
+    assert not snapshot.knows(pool_id=3)
+    assert not snapshot.knows(osd=3)
+
+
+def test_osd_list(snapshot):
+    assert snapshot.osd_list("UP") == [0, 1]
+    assert snapshot.osd_list("down") == [2]
+    assert snapshot.osd_list("out") == [2]
+    assert snapshot.osd_list("destroyed") == [2]
+
+
+def test_capture_failures():
+    snapshot = ClusterSnapshot.capture(FakeNode(rcs=(0, 0, 0, 1)))
+    assert not snapshot.daemons
+
+    with pytest.raises(CommandFailed):
+        ClusterSnapshot.capture(FakeNode(rcs=(0, 1, 0, 0)))
+
+
+def test_orchestrator_getters():
+    node = FakeNode()
+    rados_obj = RadosOrchestrator.__new__(RadosOrchestrator)
+    rados_obj.client = node
+    rados_obj.cluster_snapshot = None
+
+    def run_ceph_command(*args, **kwargs):
+        raise AssertionError("getter not answered from the snapshot")
+
+    rados_obj.run_ceph_command = run_ceph_command
+    rados_obj.refresh_snapshot()
+    assert len(node.cmds) == 1
+
+    assert rados_obj.get_pool_details("rbd")["pool"] == 2
+    assert rados_obj.get_pool_id("rbd") == 2
+    assert rados_obj.get_pg_acting_set(pool_name="rbd") == [1, 0]
+    assert rados_obj.get_pg_acting_set(pg_num="2.1") == [0]
+    assert rados_obj.get_pgid(osd_primary=1) == ["2.0"]
+    assert rados_obj.get_osd_hosts() == ["node1", "node2"]
+    assert rados_obj.get_osd_list("in") == [0, 1]
+
+    rados_obj.drop_snapshot()
+    with pytest.raises(AssertionError):
+        rados_obj.get_osd_hosts()
+
+
+def test_orchestrator_getters_fallback():
+    rados_obj = RadosOrchestrator.__new__(RadosOrchestrator)
+    rados_obj.client = FakeNode()
+    rados_obj.cluster_snapshot = None
+    cmds = []
+
+    def run_ceph_command(cmd, **kwargs):
+        cmds.append(cmd)
+        if cmd.startswith("ceph pg"):
+            return {"pg_stats": [{"pgid": "3.0"}]}
+        return {"nodes": [{"id": -7, "name": "node3", "type": "host"}]}
+
+    rados_obj.run_ceph_command = run_ceph_command
+    rados_obj.refresh_snapshot()
+    # Created after the snapshot was captured
+    assert rados_obj.get_pgid(pool_name="new_pool") == ["3.0"]
+    assert rados_obj.get_pgid(osd=3) == ["3.0"]
+    assert cmds == ["ceph pg ls-by-pool new_pool", "ceph pg ls-by-osd 3"]
+
+    rados_obj.cluster_snapshot = ClusterSnapshot(
+        {"osdmap": {"pools": []}}, {"pg_stats": []}, {"nodes": []}
+    )
+    assert rados_obj.get_osd_hosts() == ["node3"]
+    assert rados_obj.get_osd_list("up") == []
+    assert cmds[2:] == ["ceph osd tree"] + [
+        f"ceph osd tree {key}" for key in ("up", "down", "in", "out", "destroyed")
+    ]
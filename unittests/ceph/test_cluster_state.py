@@ -0,0 +1,110 @@
+import json
+import pickle
+
+import pytest
+
+from ceph.ceph import Ceph, CephNode, CephOsd
+from ceph.cluster_state import (
+    ClusterStateError,
+    VMNodeReference,
+    dump_cluster_state,
+    load_cluster_state,
+)
+
+
+class VMNode:
+    node_type = "openstack"
+
+    def __init__(self):
+        self.osd_scenario = 1
+        self.driver = object()
+
+
+def _cluster():
+    node = CephNode(
+        username="cephuser",
+        password="cephuser",
+        root_password="passwd",
+        look_for_key=False,
+        root_login="root",
+        private_ip="10.0.0.1",
+        ipv4_address="10.0.0.1",
+        ipv4_subnet="10.0.0.0/24",
+        hostname="node1.example.com",
+        ceph_nodename="ceph-node1",
+        ceph_vmnode=VMNode(),
+        role=["installer", "mon", "osd"],
+        no_of_volumes=2,
+    )
+    node.get_ceph_objects("osd")[0].device = "/dev/vdb"
+    cluster = Ceph("ceph", [node])
+    cluster.networks = {"public": ["10.0.0.0/24"]}
+    return {"ceph": cluster}
+
+
+class TestClusterState:
+    def test_round_trip(self, tmp_path):
+        state = tmp_path / "state"
+        dump_cluster_state(_cluster(), state)
+        clusters = load_cluster_state(state)
+
+        node = clusters["ceph"][0]
+        assert json.loads(state.read_text())["version"] == 1
+        assert clusters["ceph"].networks == {"public": ["10.0.0.0/24"]}
+        assert node.vmname == "node1.example.com"
+        assert isinstance(node.vm_node, VMNodeReference)
+        assert node.vm_node.osd_scenario == 1
+        assert [obj.role for obj in node.ceph_object_list] == [
+            "installer",
+            "mon",
+            "osd",
+            "osd",
+        ]
+        osds = node.get_ceph_objects("osd")
+        assert isinstance(osds[0], CephOsd) and osds[0].device == "/dev/vdb"
+        assert not node.get_free_volumes()
+        assert node.connection.ip_address == "10.0.0.1"
+
+    def test_pickle_fallback(self, tmp_path):
+        state = tmp_path / "state"
+        state.write_bytes(pickle.dumps({"ceph": "cluster"}))
+
+        assert load_cluster_state(state) == {"ceph": "cluster"}
+
+    def test_newer_version(self, tmp_path):
+        state = tmp_path / "state"
+        state.write_text(json.dumps({"format": "cephci-cluster-state", "version": 99}))
+
+        with pytest.raises(ClusterStateError):
+            load_cluster_state(state)
+
+    def test_credentials_referenced(self, tmp_path, monkeypatch):
+        clusters = _cluster()
+        node = clusters["ceph"][0]
+        node.root_passwd = "s3cret"
+        node.private_key_password = "k3y"
+        node.vm_node.params = {"root_password": "s3cret"}
+        node.added_later = "value"
+        state = tmp_path / "state"
+        dump_cluster_state(clusters, state)
+
+        content = state.read_text()
+        assert "s3cret" not in content and "k3y" not in content
+        assert "added_later" not in content
+
+        monkeypatch.setenv("CEPHCI_ROOT_PASSWORD", "s3cret")
+        node = load_cluster_state(state)["ceph"][0]
+        assert node.root_passwd == "s3cret"
+        assert node.root_connection.password == "s3cret"
+        assert node.password == "cephuser"
+        assert node.private_key_password is None
+
+    def test_required_credential_missing(self, tmp_path, monkeypatch):
+        clusters = _cluster()
+        clusters["ceph"][0].root_passwd = "s3cret"
+        state = tmp_path / "state"
+        dump_cluster_state(clusters, state)
+
+        monkeypatch.delenv("CEPHCI_ROOT_PASSWORD", raising=False)
+        with pytest.raises(ClusterStateError, match="CEPHCI_ROOT_PASSWORD is not set"):
+            load_cluster_state(state)
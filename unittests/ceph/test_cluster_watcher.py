@@ -0,0 +1,207 @@
+import json
+import queue
+import threading
+
+import pytest
+
+from ceph.cluster_watcher import (
+    ClusterState,
+    ClusterWatcher,
+    get_watcher,
+    stop_watchers,
+)
+from utility.poll import deadline
+
+
+def _status(health="HEALTH_OK", checks=(), pgs=None, osds=(3, 3, 3)):
+    pgs = pgs or {"active+clean": 8}
+    return "status " + json.dumps(
+        {
+            "health": {"status": health, "checks": {c: {} for c in checks}},
+            "pgmap": {
+                "num_pgs": sum(pgs.values()),
+                "pgs_by_state": [{"state_name": k, "count": v} for k, v in pgs.items()],
+            },
+            "osdmap": dict(zip(("num_osds", "num_up_osds", "num_in_osds"), osds)),
+        }
+    )
+
+
+def _pgs(states):
+    pools = [{"poolnum": 1, "poolname": ".mgr"}, {"poolnum": 2, "poolname": "rbd"}]
+    pg_stats = [{"pgid": k, "state": v} for k, v in states.items()]
+    return ["pools " + json.dumps(pools), "pgs " + json.dumps({"pg_stats": pg_stats})]
+
+
+class FakeStream:
+    def __init__(self, lines):
+        self.lines = lines
+        self.closed = False
+
+    def __iter__(self):
+        while not self.closed:
+            try:
+                line = self.lines.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            if line is None:
+                return
+            yield line
+
+    def close(self):
+        self.closed = True
+
+
+class FakeNode:
+    hostname = "node1"
+
+    def __init__(self):
+        self.lines = queue.Queue()
+        self.commands = []
+
+    def exec_stream(self, cmd, **kw):
+        self.commands.append(cmd)
+        return FakeStream(self.lines)
+
+    def send(self, *lines):
+        for line in lines:
+            self.lines.put(line)
+
+    def send_later(self, *lines):
+        """Sends the lines once the wait started, earlier states are not accepted."""
+        threading.Timer(0.1, self.send, args=lines).start()
+
+
+@pytest.fixture
+def node():
+    return FakeNode()
+
+
+@pytest.fixture
+def watcher(node):
+    with ClusterWatcher(node, interval=1) as _watcher:
+        yield _watcher
+
+
+def test_state():
+    state = ClusterState(1, json.loads(_status(pgs={"active+clean": 4})[7:]))
+    assert state.health_ok()
+    assert state.pgs_clean()
+    assert (state.num_osds, state.num_up_osds, state.num_in_osds) == (3, 3, 3)
+
+    scrubbing = {"active+clean": 3, "active+clean+scrubbing+deep": 1}
+    state = ClusterState(1, json.loads(_status(pgs=scrubbing)[7:]))
+    assert state.pgs_clean()
+
+    state = ClusterState(
+        2,
+        json.loads(_status("HEALTH_WARN", ["OSD_DOWN"], {"active+undersized": 4})[7:]),
+    )
+    assert not state.health_ok()
+    assert state.health_ok(ignore=["OSD_DOWN"])
+    assert not state.pgs_clean()
+    assert not ClusterState().pgs_clean()
+
+
+def test_await_health_ok(node, watcher):
+    assert "cephadm shell -- bash -c" in watcher.command
+    node.send(_status("HEALTH_WARN", ["OSD_DOWN", "PG_DEGRADED"]))
+    node.send_later(_status())
+
+    assert watcher.await_health_ok(timeout=5)
+    assert watcher.state.version == 2
+
+    node.send_later(_status("HEALTH_WARN", ["OSD_DOWN"]))
+    assert watcher.await_health_ok(ignore=["OSD_DOWN"], timeout=1)
+
+
+def test_wait_for_fresh_state(node, watcher):
+    node.send_later(_status())
+    assert watcher.await_health_ok(timeout=5)
+
+    # The healthy state precedes the wait, it is not accepted
+    assert not watcher.await_health_ok(timeout=0.3)
+    node.send_later(_status())
+    assert watcher.await_health_ok(timeout=5)
+
+
+def test_reset_on_broken_stream(node, watcher):
+    node.send_later(_status(), *_pgs({"1.0": "active+clean"}))
+    assert watcher.await_pgs_clean(pool=".mgr", timeout=5)
+
+    node.send(None)
+    assert watcher.wait_for(lambda state: True, timeout=0.3) is False
+    assert watcher.state.version == 0 and watcher.state.pools is None
+
+
+def test_await_pgs_clean_pool(node, watcher):
+    node.send_later(
+        _status(pgs={"active+clean": 2, "peering": 1}),
+        *_pgs({"1.0": "active+clean", "2.0": "active+clean", "2.1": "peering"}),
+    )
+    assert watcher.await_pgs_clean(pool=".mgr", timeout=2)
+    assert not watcher.await_pgs_clean(pool="rbd", timeout=0.3)
+
+    node.send_later(
+        *_pgs({"1.0": "active+clean", "2.0": "active+clean", "2.1": "active+clean"})
+    )
+    assert watcher.await_pgs_clean(pool="rbd", timeout=2)
+
+    node.send_later(_status(pgs={"active+clean": 3}))
+    assert watcher.await_pgs_clean(pool=2, timeout=2)
+
+
+def test_await_osds_timeout_and_deadline(node, watcher):
+    node.send(_status(osds=(3, 2, 3)))
+    assert not watcher.await_osds(up=3, timeout=0.2)
+
+    with deadline(0.2):
+        assert not watcher.await_osds(up=3, timeout=30)
+
+
+def test_reconnect(node, watcher):
+    node.send(None)
+    node.send_later(_status())
+    assert watcher.await_health_ok(timeout=5)
+    assert len(node.commands) == 2
+
+
+def test_get_watcher(node):
+    class FakeCluster:
+        def get_nodes(self, role=None):
+            return [node] if role == "client" else []
+
+    cluster = FakeCluster()
+    watcher = get_watcher(cluster)
+    try:
+        assert watcher is get_watcher(cluster)
+        assert not watcher.cephadm and watcher.alive
+    finally:
+        stop_watchers()
+
+    assert not watcher.alive
+
+
+def test_pool_clean_from_status(node, watcher):
+    assert "$((i % 30))" in watcher.command
+    assert "$((i % 6))" in ClusterWatcher(node).command
+    node.send(*_pgs({"1.0": "active+clean", "2.0": "peering"}))
+    node.send_later(_status(pgs={"active+clean": 2}))
+    # The PG dump is stale, the status reports the cluster clean
+    assert watcher.await_pgs_clean(pool="rbd", timeout=2)
+    assert not watcher.await_pgs_clean(pool="missing", timeout=0.2)
+
+
+def test_stop_close_failure(node):
+    class BrokenStream(FakeStream):
+        def close(self):
+            super().close()
+            raise ValueError("generator already executing")
+
+    node.exec_stream = lambda cmd, **kw: BrokenStream(node.lines)
+    watcher = ClusterWatcher(node).start()
+    node.send_later(_status())
+    assert watcher.await_health_ok(timeout=5)
+
+    watcher.stop()
+    assert not watcher.alive
@@ -0,0 +1,86 @@
+import json
+import threading
+
+import pytest
+
+from ceph.command_metrics import CommandMetrics, command_template, percentile
+
+
+@pytest.mark.parametrize(
+    "cmd, template",
+    [
+        ("ceph pg 1.2f query", "ceph pg N.Nf query"),
+        ("ping -c 3 10.0.0.12", "ping -c N IP"),
+        (
+            "ceph fs subvolume rm cephfs 'sub vol 1'",
+            "ceph fs subvolume rm cephfs '?'",
+        ),
+        (
+            "cephadm rm-cluster --fsid 0b4f3a3c-8c0e-11ee-9a2b-fa163e1d2a10",
+            "cephadm rm-cluster --fsid UUID",
+        ),
+    ],
+)
+def test_command_template(cmd, template):
+    assert command_template(cmd) == template
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([4], 95) == 4
+    assert percentile([], 50) == 0.0
+
+
+def test_summary_and_export(tmp_path):
+    metrics = CommandMetrics()
+    metrics.test_name = "test1"
+    for pg in range(10):
+        metrics.record("node1", "root", f"ceph pg 1.{pg} query", 1.0, 0, 100, 0)
+    metrics.record("node2", "cephuser", "uptime", 5.0, 1, 10, 2)
+    metrics.test_name = "test2"
+    metrics.record("node1", "root", "uptime", 3.0, 0, 10, 0)
+
+    summary = metrics.summary("test1")
+    assert summary["commands"] == 11
+    assert list(summary["templates"]) == ["ceph pg N.N query", "uptime"]
+    pg_query = summary["templates"]["ceph pg N.N query"]
+    assert pg_query["count"] == 10
+    assert pg_query["duration"]["total"] == 10.0
+    assert pg_query["stdout_bytes"] == 1000
+    assert summary["templates"]["uptime"]["failures"] == 1
+
+    file_name = metrics.export(str(tmp_path / "metrics" / "run.json"))
+    with open(file_name) as metrics_file:
+        run = json.load(metrics_file)
+    assert run["commands"] == 12
+    assert run["templates"]["uptime"]["nodes"] == ["node1", "node2"]
+
+    assert metrics.export(str(tmp_path / "none.json"), test="test3") is None
+
+
+def test_bound_to_test_and_cluster(tmp_path):
+    metrics = CommandMetrics()
+    previous = metrics.bind("test1", "ceph")
+    assert previous == (None, None)
+    metrics.record("node1", "root", "uptime", 1.0, 0, 10, 0)
+
+    def worker():
+        metrics.record("node1", "root", "uptime", 2.0, 0, 10, 0)
+
+    # Pool threads record under the binding of the spawning thread
+    run = metrics.propagate(worker)
+    assert metrics.bind("test1", "ceph2") == ("test1", "ceph")
+    metrics.record("node2", "root", "uptime", 4.0, 0, 10, 0)
+    metrics.bind(*previous)
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+
+    assert metrics.summary("test1", "ceph")["duration"] == 3.0
+    assert metrics.summary("test1", "ceph2")["duration"] == 4.0
+    assert metrics.summary("test1")["commands"] == 3
+    file_name = metrics.export(str(tmp_path / "test1-ceph2.json"), "test1", "ceph2")
+    with open(file_name) as metrics_file:
+        assert json.load(metrics_file)["cluster"] == "ceph2"
@@ -0,0 +1,93 @@
+import threading
+from concurrent.futures import TimeoutError
+from time import monotonic, sleep
+
+import pytest
+
+from ceph.parallel import parallel
+
+
+def _task(value, delay=0.0, fail=False):
+    sleep(delay)
+    if fail:
+        raise ValueError(value)
+    return value
+
+
+def test_results_without_polling_delay():
+    start = monotonic()
+    with parallel() as p:
+        for value in range(5):
+            p.spawn(_task, value, delay=0.05)
+
+    assert p.results == [0, 1, 2, 3, 4]
+    assert monotonic() - start < 1
+
+
+def test_exception_is_raised():
+    with pytest.raises(ValueError):
+        with parallel() as p:
+            p.spawn(_task, 1)
+            p.spawn(_task, 2, fail=True)
+
+
+def test_iteration_and_as_completed():
+    with pytest.raises(ValueError):
+        with parallel() as p:
+            p.spawn(_task, "slow", delay=0.2)
+            p.spawn(_task, "fast")
+            p.spawn(_task, "bad", fail=True)
+            streamed = list(p.as_completed())
+            ordered = list(p)
+
+    assert streamed[-1] == "slow"
+    assert ordered[:2] == ["slow", "fast"]
+    assert isinstance(ordered[2], ValueError)
+
+
+def test_task_timeout():
+    start = monotonic()
+    with pytest.raises(TimeoutError):
+        with parallel() as p:
+            p.spawn(_task, 1)
+            p.spawn_task(_task, 2, delay=5, task_timeout=0.2)
+
+    assert monotonic() - start < 3
+    assert isinstance(list(p)[1], TimeoutError)
+
+
+def test_timeout():
+    start = monotonic()
+    with pytest.raises(TimeoutError):
+        with parallel(timeout=0.2) as p:
+            p.spawn(_task, 1, delay=5)
+
+    assert monotonic() - start < 3
+
+
+def test_fail_fast():
+    start = monotonic()
+    with pytest.raises(ValueError):
+        with parallel(max_workers=2, fail_fast=True) as p:
+            p.spawn(_task, 1, fail=True)
+            p.spawn(_task, 2, delay=2)
+            for value in range(3, 10):
+                p.spawn(_task, value, delay=2)
+
+    assert monotonic() - start < 1.5
+    assert sum(1 for _f in p._futures if _f.cancelled()) >= 6
+
+
+def test_threads_created_on_demand():
+    names = set()
+
+    def _task():
+        names.add(threading.current_thread().name)
+
+    with parallel() as p:
+        for _ in range(5):
+            p.spawn(_task)
+            # the next task finds the worker idle
+            sleep(0.05)
+
+    assert len(names) == 1
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from ceph.rados import pg_analytics
+
+np = pytest.importorskip("numpy")
+
+OSDS_BY_HOST = {"node1": [0, 1], "node2": [2, 3]}
+
+
+def _pg(pgid, acting, num_bytes=100):
+    return {
+        "pgid": pgid,
+        "state": "active+clean",
+        "acting": acting,
+        "acting_primary": acting[0],
+        "stat_sum": {"num_bytes": num_bytes, "num_objects": 1},
+    }
+
+
+PG_STATS = [
+    _pg("1.0", [0, 1]),
+    _pg("1.1", [0, 2]),
+    _pg("1.2", [0, 1]),
+    _pg("1.3", [1, 0]),
+    _pg("2.0", [2, 2147483647, 0], num_bytes=50),
+]
+
+
+@pytest.fixture
+def distribution():
+    return pg_analytics.PGDistribution(PG_STATS, osds_by_host=OSDS_BY_HOST)
+
+
+def test_counts(distribution):
+    assert distribution.osd_ids.tolist() == [0, 1, 2, 3]
+    assert distribution.acting.shape == (5, 3)
+    assert distribution.pg_counts().tolist() == [5, 3, 2, 0]
+    assert distribution.primary_counts().tolist() == [3, 1, 1, 0]
+    assert distribution.osd_bytes().tolist() == [450, 300, 150, 0]
+    assert distribution.pg_stddev() == pytest.approx(np.std([5, 3, 2, 0]), abs=1e-4)
+    assert distribution.primary_skew() == pytest.approx(3 / 1.25, abs=1e-4)
+
+
+def test_read_balance_scores(distribution):
+    # pool 1: 4 primaries over 3 OSDs, at most 3 on osd.0
+    average = 4 / 3
+    expected = (3 / average) / (2 / average)
+    assert distribution.read_balance_scores() == {1: expected, 2: 1.0}
+    assert distribution.pool(2).pgids == ["2.0"]
+    assert distribution.pool(1).pg_counts().tolist() == [4, 3, 1, 0]
+
+
+def test_hosts(distribution):
+    assert distribution.host_pg_counts() == {"node1": 8, "node2": 2}
+    assert distribution.host_imbalance() == {"node1": 1.6, "node2": 0.4}
+
+
+def test_summary_diff(distribution):
+    before = json.loads(json.dumps(distribution.summary()))
+    after = pg_analytics.PGDistribution(
+        PG_STATS[:3] + [_pg("1.3", [3, 0]), PG_STATS[4]], osds_by_host=OSDS_BY_HOST
+    ).summary()
+
+    changes = pg_analytics.diff(before, after)
+    assert changes["primary_counts"] == {
+        "1": {"before": 1, "after": 0},
+        "3": {"before": 0, "after": 1},
+    }
+    assert changes["pg_counts"]["3"] == {"before": 0, "after": 1}
+    assert "pgs" not in changes and "bytes" not in changes
+    assert pg_analytics.diff(before, before) == {}
+
+
+def test_empty():
+    distribution = pg_analytics.PGDistribution([])
+    assert distribution.pg_stddev() == 0.0
+    assert distribution.summary()["pgs"] == 0
@@ -0,0 +1,90 @@
+import pytest
+
+from ceph.rados.core_workflows import RadosOrchestrator
+from ceph.rados.pg_states import PGStates
+
+PG_STATS = [
+    {"pgid": "1.0", "state": "active+clean", "acting": [0, 1], "acting_primary": 0},
+    {
+        "pgid": "2.0",
+        "state": "active+clean+scrubbing+deep",
+        "acting": [1, 2],
+        "acting_primary": 1,
+    },
+    {
+        "pgid": "2.1",
+        "state": "active+undersized+degraded",
+        "acting": [2, 2147483647],
+        "acting_primary": 2,
+    },
+    {"pgid": "2.2", "state": "unknown", "acting": [], "acting_primary": -1},
+    {"pgid": "2.3", "state": "peering+new_state", "acting": [0], "acting_primary": 0},
+]
+
+
+@pytest.fixture
+def pg_states():
+    return PGStates(PG_STATS)
+
+
+def test_queries(pg_states):
+    assert len(pg_states) == 5 and "2.1" in pg_states
+    assert pg_states.not_active() == ["2.2", "2.3"]
+    assert pg_states.not_clean() == ["2.1", "2.2", "2.3"]
+    assert pg_states.with_any("scrubbing degraded") == ["2.0", "2.1"]
+    assert pg_states.with_any(["unknown"]) == ["2.2"]
+    assert pg_states.with_all("active clean") == ["1.0", "2.0"]
+    assert pg_states.with_all("active missing") == []
+    assert pg_states.without("active") == ["2.2", "2.3"]
+    assert pg_states.with_any("new_state") == ["2.3"]
+    assert pg_states.in_pool(2) == ["2.0", "2.1", "2.2", "2.3"]
+    assert pg_states.on_osd(2) == ["2.0", "2.1"]
+    assert pg_states.on_osd(0) == ["1.0", "2.3"]
+    assert pg_states.primary_on(0) == ["1.0", "2.3"]
+
+
+def test_state_strings(pg_states):
+    assert pg_states.state("2.0") == "active+clean+scrubbing+deep"
+    assert pg_states.state("2.3") == "peering+new_state"
+    assert pg_states.state("9.0") is None
+    assert pg_states.counts()["active+clean"] == 1
+    assert sum(pg_states.counts().values()) == 5
+
+
+@pytest.mark.parametrize(
+    "out, count",
+    [
+        ({"pg_stats": PG_STATS, "pg_ready": True}, 5),
+        (PG_STATS, 5),
+        ({"pg_stats": None}, 0),
+    ],
+)
+def test_fetch(out, count):
+    cmds = []
+
+    class FakeRados:
+        def run_ceph_command(self, cmd, client_exec=False):
+            cmds.append(cmd)
+            return out
+
+    assert len(PGStates.fetch(FakeRados(), pool_name="rbd")) == count
+    assert cmds == ["ceph pg ls-by-pool rbd"]
+
+    PGStates.fetch(FakeRados())
+    assert cmds[-1] == "ceph pg dump pgs_brief"
+
+
+def test_check_inactive_pgs_on_pool():
+    rados_obj = RadosOrchestrator.__new__(RadosOrchestrator)
+    cmds = []
+
+    def run_ceph_command(cmd, client_exec=False):
+        cmds.append(cmd)
+        return {"pg_stats": PG_STATS[:2]}
+
+    rados_obj.run_ceph_command = run_ceph_command
+    assert rados_obj.check_inactive_pgs_on_pool(pool_name="rbd")
+
+    rados_obj.run_ceph_command = lambda cmd, client_exec: {"pg_stats": PG_STATS}
+    assert not rados_obj.check_inactive_pgs_on_pool(pool_name="rbd")
+    assert cmds == ["ceph pg ls-by-pool rbd"]
@@ -0,0 +1,111 @@
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import mock
+import pytest
+
+from ceph.remote_agent import (
+    AGENT_SOURCE,
+    RemoteAgent,
+    RemoteAgentTimeout,
+    RemoteAgentUnavailable,
+)
+
+
+class LocalChannel:
+    """paramiko.Channel stand-in running the agent as a local process."""
+
+    def __init__(self):
+        self.closed = False
+        self._proc = None
+
+    def exec_command(self, cmd):
+        path = cmd.split()[-1]
+        self._proc = subprocess.Popen(
+            [sys.executable, "-u", path],
+            # isolate the login shells from the profile of the host
+            env=dict(os.environ, HOME=tempfile.gettempdir()),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+
+    def sendall(self, data):
+        self._proc.stdin.write(data)
+        self._proc.stdin.flush()
+
+    def recv(self, nbytes):
+        return os.read(self._proc.stdout.fileno(), nbytes)
+
+    def close(self):
+        self.closed = True
+        self._proc.stdin.close()
+        self._proc.wait()
+
+
+@pytest.fixture
+def agent():
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "agent.py")
+    with open(path, "w") as agent_file:
+        agent_file.write(AGENT_SOURCE)
+
+    client = mock.MagicMock()
+    client.get_transport.return_value.open_session.return_value = LocalChannel()
+    with mock.patch.object(RemoteAgent, "_install", return_value=path):
+        _agent = RemoteAgent(lambda: client)
+        _agent.start()
+
+    yield _agent
+
+    _agent.close()
+    assert not os.path.exists(directory)
+
+
+class TestRemoteAgent:
+    def test_execute(self, agent):
+        out, err, rc, duration = agent.execute("echo out; echo err >&2; exit 4")
+
+        assert (out, err, rc) == ("out\n", "err\n", 4)
+        assert duration >= 0
+
+    def test_multiplexed_requests(self, agent):
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            futures = [
+                executor.submit(agent.execute, f"sleep 0.5; echo {idx}")
+                for idx in range(10)
+            ]
+            results = sorted(int(f.result()[0]) for f in futures)
+
+        assert results == list(range(10))
+
+    def test_timeout(self, agent):
+        with pytest.raises(RemoteAgentTimeout):
+            agent.execute("sleep 10", timeout=1)
+
+        assert agent.execute("true")[2] == 0
+
+    def test_bash_login_shell(self, agent):
+        out, _, rc, _ = agent.execute("[[ -n $BASH_VERSION ]] && shopt -q login_shell")
+
+        assert rc == 0
+
+
+@pytest.mark.parametrize("rc, directory", [(0, b"/root/.cephci-agent.a1\n"), (1, b"")])
+def test_mktemp_releases_channel(rc, directory):
+    channel = mock.MagicMock()
+    channel.makefile.return_value.read.return_value = directory
+    channel.makefile_stderr.return_value.read.return_value = b"No space left"
+    channel.recv_exit_status.return_value = rc
+    connection = mock.Mock()
+    connection.open_channel.return_value = channel
+    _agent = RemoteAgent(mock.MagicMock, connection=connection)
+
+    if rc:
+        with pytest.raises(RemoteAgentUnavailable, match="No space left"):
+            _agent._mktemp(mock.MagicMock())
+    else:
+        assert _agent._mktemp(mock.MagicMock()) == "/root/.cephci-agent.a1"
+    connection.release_channel.assert_called_once_with(channel)
@@ -0,0 +1,159 @@
+import logging
+
+import pytest
+
+from ceph.ceph import CommandFailed
+from ceph.rados.core_workflows import RadosOrchestrator
+from ceph.rados.scrub_tracker import TRIGGER_BATCH, ScrubTracker
+
+OLD = "2026-01-01T10:00:00.000000+0000"
+NEW = "2026-01-01T11:00:00.000000+0000"
+
+
+class FakeClient:
+    def __init__(self, rc=0):
+        self.batches = []
+        self.rc = rc
+
+    def exec_batch(self, cmds, **kw):
+        self.batches.append(cmds)
+        return [("", "Error ENOENT" if self.rc else "", self.rc, 0.1) for _ in cmds]
+
+
+class FakeRados:
+    """Scrubs the given number of PGs of the pool every snapshot."""
+
+    def __init__(self, num_pgs=6, per_snapshot=2):
+        self.client = FakeClient()
+        self.cmds = []
+        self.per_snapshot = per_snapshot
+        self.stamps = {f"3.{i:x}": OLD for i in range(num_pgs)}
+
+    def run_ceph_command(self, cmd, client_exec=False, spool_size=None):
+        self.cmds.append(cmd)
+        if cmd == "ceph osd pool ls detail":
+            return [{"pool_id": 3, "pool_name": "rbd", "pg_num": len(self.stamps)}]
+
+        pg_stats = [
+            {
+                "pgid": pgid,
+                "state": "active+clean" if stamp == NEW else "active+clean+scrubbing",
+                "last_scrub_stamp": stamp,
+                "last_deep_scrub_stamp": OLD,
+            }
+            for pgid, stamp in self.stamps.items()
+        ]
+        pending = [pgid for pgid, stamp in self.stamps.items() if stamp == OLD]
+        for pgid in pending[: self.per_snapshot]:
+            self.stamps[pgid] = NEW
+        return {"pg_stats": pg_stats}
+
+
+def test_pool_tracking():
+    rados_obj = FakeRados()
+    tracker = ScrubTracker(rados_obj, pool_name="rbd")
+    tracker.start()
+
+    assert rados_obj.client.batches == [["ceph osd pool scrub rbd"]]
+    assert len(tracker.baseline) == 6
+
+    progress = tracker.progress()
+    assert (progress.total, progress.completed) == (6, 2)
+    assert progress.pending == ["3.2", "3.3", "3.4", "3.5"]
+    assert progress.scrubbing == progress.pending
+    assert list(tracker.stragglers(limit=2)) == ["3.2", "3.3"]
+
+    assert tracker.wait(timeout=30, interval=0.01)
+    assert set(rados_obj.cmds) == {"ceph pg ls-by-pool rbd"}
+
+
+def test_pgids_and_timeout():
+    rados_obj = FakeRados(per_snapshot=0)
+    tracker = ScrubTracker(rados_obj, pgids=["3.0", "3.1", "9.0"], deep=True)
+    tracker.start()
+
+    assert rados_obj.client.batches == [
+        ["ceph pg deep-scrub 3.0", "ceph pg deep-scrub 3.1", "ceph pg deep-scrub 9.0"]
+    ]
+    assert list(tracker.baseline) == ["3.0", "3.1"]
+    assert not tracker.wait(timeout=0.1, interval=0.01)
+    assert {"ceph osd pool ls detail", "ceph pg ls 3", "ceph pg ls 9"} == set(
+        rados_obj.cmds
+    )
+    assert tracker.stragglers()["3.0"]["last_deep_scrub_stamp"] == OLD
+
+
+def test_trigger_pool_of_pgids():
+    rados_obj = FakeRados(num_pgs=2 * TRIGGER_BATCH)
+    tracker = ScrubTracker(rados_obj, pgids=list(rados_obj.stamps))
+    tracker.trigger()
+    assert rados_obj.client.batches == [["ceph osd pool scrub rbd"]]
+
+    # The PGs of a partially tracked pool are scrubbed in several sessions
+    rados_obj.client.batches.clear()
+    tracker = ScrubTracker(rados_obj, pgids=list(rados_obj.stamps)[1:])
+    tracker.trigger()
+    assert [len(batch) for batch in rados_obj.client.batches] == [
+        TRIGGER_BATCH,
+        TRIGGER_BATCH - 1,
+    ]
+    assert rados_obj.client.batches[0][0] == "ceph pg scrub 3.1"
+
+
+def test_trigger_failure():
+    rados_obj = FakeRados()
+    rados_obj.client = FakeClient(rc=2)
+    tracker = ScrubTracker(rados_obj, pool_name="rbd")
+    with pytest.raises(CommandFailed, match="ceph osd pool scrub rbd : Error ENOENT"):
+        tracker.start()
+
+
+def test_pg_stats_logged(caplog):
+    rados_obj = FakeRados(num_pgs=1, per_snapshot=0)
+    tracker = ScrubTracker(rados_obj, pool_name="rbd")
+    tracker.start()
+    with caplog.at_level(logging.DEBUG):
+        assert not tracker.wait(timeout=0.05, interval=0.01)
+    assert f"last_scrub_stamp : {OLD}" in caplog.text
+    # The stats are logged again only when the progress moves
+    assert caplog.text.count("pgid : 3.0") == 1
+
+    rados_obj.per_snapshot = 1
+    caplog.clear()
+    with caplog.at_level(logging.DEBUG):
+        assert tracker.wait(timeout=5, interval=0.01)
+    assert f"Final last_scrub_stamp of 3.0: {NEW}" in caplog.text
+
+
+def test_scheduled_with_baseline():
+    rados_obj = FakeRados(num_pgs=2)
+    tracker = ScrubTracker(rados_obj, pool_name="rbd")
+    tracker.start(trigger=False, baseline={"3.0": {"last_scrub_stamp": OLD}})
+
+    assert not rados_obj.client.batches
+    assert tracker.wait(timeout=5, interval=0.01)
+    assert tracker.progress().total == 1
+
+
+@pytest.mark.parametrize("user_initiated, batches", [(True, 1), (False, 0)])
+def test_start_check_scrub_complete(user_initiated, batches):
+    client = FakeClient()
+    rados_obj = RadosOrchestrator.__new__(RadosOrchestrator)
+    rados_obj.client = client
+    pg_dump = {
+        "state": "active+clean",
+        "last_scrub": "1'1",
+        "last_scrub_stamp": OLD,
+        "last_scrub_duration": 1,
+        "objects_scrubbed": 0,
+        "scrub_schedule": "periodic scrub scheduled",
+        "scrub_duration": 1,
+    }
+    rados_obj.run_ceph_command = lambda **kw: {
+        "pg_stats": [dict(pg_dump, pgid="3.0", last_scrub_stamp=NEW)]
+    }
+
+    assert rados_obj.start_check_scrub_complete(
+        pg_id="3.0", pg_dump=pg_dump, user_initiated=user_initiated, wait_time=5
+    )
+    assert len(client.batches) == batches
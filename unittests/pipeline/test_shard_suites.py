@@ -0,0 +1,93 @@
+import pytest
+import yaml
+
+from pipeline.scripts.ci.shard_suites import SuitePlan, load_durations, units
+from utility.scheduler import SuiteScheduler
+
+XUNIT = """<?xml version="1.0" encoding="UTF-8"?>
+<testsuites>
+  <testsuite name="run">
+    <properties>
+      <property name="suite-name" value="suites/squid/rados/tier-2.yaml"/>
+    </properties>
+    <testcase name="deploy" time="600"/>
+    <testcase name="pool tests" time="120"/>
+    <testcase name="pool tests" time="120"/>
+    <testcase name="skipped"/>
+  </testsuite>
+</testsuites>
+"""
+
+
+def _suite(*tests):
+    return [{"test": test} for test in tests]
+
+
+@pytest.fixture
+def suite_file(tmp_path):
+    tests = _suite(
+        {"name": "deploy", "module": "test_cephadm.py", "abort-on-fail": True},
+        {"name": "a", "module": "test_a.py"},
+        {"name": "b", "module": "test_b.py", "concurrency-group": "io"},
+        {"name": "c", "module": "test_c.py"},
+        {"name": "d", "module": "test_d.py", "depends-on": "a"},
+        {"name": "e", "module": "test_e.py", "concurrency-group": "io"},
+        {"name": "f", "module": "test_f.py", "depends-on": ["d"]},
+        {"name": "g", "module": "test_g.py"},
+    )
+    path = tmp_path / "tier-2.yaml"
+    path.write_text(yaml.safe_dump({"tests": tests}))
+    return str(path)
+
+
+def test_load_durations(tmp_path):
+    (tmp_path / "run-1").mkdir()
+    (tmp_path / "run-1" / "xunit.xml").write_text(XUNIT)
+    (tmp_path / "broken.xml").write_text("<testsuites>")
+
+    by_suite, by_name = load_durations([str(tmp_path), str(tmp_path / "broken.xml")])
+    # Repeated test cases count once, tests without time are ignored
+    assert by_suite == {
+        ("tier-2", "deploy"): [600.0],
+        ("tier-2", "pool tests"): [120.0],
+    }
+    assert by_name == {"deploy": [600.0], "pool tests": [120.0]}
+
+
+def test_units():
+    tests = _suite(
+        {"name": "a"},
+        {"name": "b", "concurrency-group": "io"},
+        {"name": "c", "depends-on": "a"},
+        {"name": "a"},
+        {"name": "d", "depends-on": ["a", "missing"]},
+        {"name": "e", "concurrency-group": "io"},
+        {"name": "f"},
+    )
+    # d depends on the latest test named a
+    assert units(tests) == [[0, 2], [1, 5], [3, 4], [6]]
+
+
+def test_layout_keeps_units(suite_file):
+    plan = SuitePlan(suite_file, None, {}, {}, 100.0)
+    plan.shards = 4
+    groups, loads = plan.layout()
+
+    assert plan.prefix_duration == 100.0
+    assert groups == [[0, 3, 5], [1, 4], [2], [6]]
+    assert sorted(loads) == [200.0, 200.0, 300.0, 400.0]
+
+    # Every shard is accepted by the scheduler
+    for group in groups:
+        SuiteScheduler(plan.prefix + [plan.body[i] for i in group])
+
+
+def test_write(suite_file, tmp_path):
+    plan = SuitePlan(suite_file, None, {}, {}, 100.0)
+    plan.shards = 2
+    shards = plan.write(str(tmp_path))
+
+    assert [shard["estimated_duration"] for shard in shards] == [500, 400]
+    with open(shards[1]["suite"]) as _file:
+        names = [t["test"]["name"] for t in yaml.safe_load(_file)["tests"]]
+    assert names == ["deploy", "b", "c", "e"]
@@ -0,0 +1,80 @@
+import subprocess
+import sys
+
+import pytest
+
+from run import merge_test_details, preflight_import, suite_modules
+
+
+def _suite(*tests):
+    return [{"test": test} for test in tests]
+
+
+@pytest.fixture
+def test_modules(tmp_path, monkeypatch):
+    (tmp_path / "preflight_valid.py").write_text("def run(**kw):\n    return 0\n")
+    (tmp_path / "preflight_no_run.py").write_text("VALUE = 1\n")
+    (tmp_path / "preflight_broken.py").write_text("import preflight_missing_dep\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield tmp_path
+    for name in ("preflight_valid", "preflight_no_run"):
+        sys.modules.pop(name, None)
+
+
+def test_suite_modules():
+    tests = _suite(
+        {"name": "a", "module": "test_a.py"},
+        {
+            "name": "b",
+            "module": "test_parallel.py",
+            "parallel": _suite(
+                {"name": "c", "module": "test_c.py"},
+                {"name": "d", "module": "test_a.py"},
+            ),
+        },
+        {"name": "e"},
+    )
+    assert suite_modules(tests) == ["test_a", "test_parallel", "test_c"]
+
+
+def test_merge_test_details():
+    tc = {"name": "a", "comments": "suite"}
+    first = dict(tc, comments="suite\nartifact-1")
+    second = dict(
+        tc, comments="suite\nartifact-2", err_type="error", err_msg="failed-2"
+    )
+    third = dict(tc, err_type="exception", err_msg="failed-3")
+    merge_test_details(tc, [first, second, third])
+    assert tc == {
+        "name": "a",
+        "comments": "suite\nartifact-1\nartifact-2",
+        "err_type": "error",
+        "err_msg": "failed-2",
+    }
+
+
+def test_preflight_import(test_modules):
+    tests = _suite(
+        {"name": "valid", "module": "preflight_valid.py"},
+        {"name": "no run", "module": "preflight_no_run.py"},
+        {"name": "broken", "module": "preflight_broken.py"},
+    )
+    errors = preflight_import(tests)
+
+    assert sorted(errors) == ["preflight_broken", "preflight_no_run"]
+    assert "preflight_missing_dep" in errors["preflight_broken"]
+    assert "preflight_valid" in sys.modules
+
+
+def test_lazy_imports():
+    """The cloud SDKs and reporting tools are not imported at startup."""
+    lazy = ["ibm_vpc", "htmllistparse", "jinja_markdown", "junitparser"]
+    out = subprocess.check_output(
+        [
+            sys.executable,
+            "-c",
+            f"import sys, run; print([m for m in {lazy} if m in sys.modules])",
+        ],
+        text=True,
+    )
+    assert out.strip() == "[]"
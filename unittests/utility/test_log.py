@@ -5,6 +5,7 @@ This test module uses pytest to unit test the sensitive data log filter
 """
 
 import os
+import threading
 from copy import deepcopy
 
 import pytest
@@ -116,3 +117,26 @@ def test_log_list_of_dictionaries(logger):
     assert list_dict_data[1]["test"]["module"] in log_contents
     assert "masked" not in log_contents
     assert None not in _test_data
+
+
+def test_concurrent_test_loggers(tmp_path):
+    """Records of a thread bound to a test reach only that test and its parent."""
+    log = Log("concurrent")
+    _, parent = log.add_test_logger("parent", str(tmp_path))
+
+    def _child(name):
+        _, handlers = log.add_test_logger(name, str(tmp_path), parent="parent")
+        log.info(f"message from {name}")
+        log.remove_test_logger(handlers)
+
+    threads = [threading.Thread(target=_child, args=(n,)) for n in ("c1", "c2")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    log.remove_test_logger(parent)
+
+    c1_log = (tmp_path / "c1.log").read_text()
+    parent_log = (tmp_path / "parent.log").read_text()
+    assert "message from c1" in c1_log and "message from c2" not in c1_log
+    assert "message from c1" in parent_log and "message from c2" in parent_log
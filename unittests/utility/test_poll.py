@@ -0,0 +1,116 @@
+import gc
+import threading
+import time
+
+import pytest
+
+from ceph.parallel import parallel
+from ceph.waiter import WaitUntil
+from utility.poll import WAIT_METRICS, Poller, deadline, remaining, wake
+from utility.retry import retry
+
+
+@pytest.fixture(autouse=True)
+def metrics():
+    WAIT_METRICS.clear()
+    yield WAIT_METRICS
+    WAIT_METRICS.clear()
+
+
+def _attempt_times(poller):
+    start = time.monotonic()
+    return [time.monotonic() - start for _ in poller]
+
+
+def test_adaptive_delays():
+    poller = Poller(timeout=1, interval=0.4, min_interval=0.05, jitter=0)
+    times = _attempt_times(poller)
+    delays = [b - a for a, b in zip(times, times[1:])]
+
+    assert poller.expired
+    assert delays[:4] == pytest.approx([0.05, 0.1, 0.2, 0.4], abs=0.03)
+    assert times[-1] == pytest.approx(1, abs=0.05)
+
+
+def test_wait_until_compatible():
+    for w in WaitUntil(timeout=5, interval=0.1):
+        if w.attempts == 3:
+            break
+
+    assert not w.expired
+    assert w.timeout == 5 and w.interval == 0.1
+    assert w.elapsed < 1
+
+
+def test_deadline():
+    assert remaining() is None
+    with deadline(0.3):
+        with deadline(10):
+            assert remaining() <= 0.3
+
+        with parallel() as p:
+            p.spawn(remaining)
+        assert 0 < p.results[0] <= 0.3
+
+        times = _attempt_times(Poller(timeout=10, interval=0.05))
+        assert times[-1] == pytest.approx(0.3, abs=0.05)
+
+    assert remaining() is None
+
+
+def test_wake():
+    poller = Poller(timeout=10, interval=5, min_interval=5, site="test:wake")
+    waker = threading.Timer(0.2, wake, kwargs={"site": "test:wake"})
+    waker.start()
+    times = [time.monotonic() for _ in zip(range(2), poller)]
+    waker.join()
+
+    assert times[1] - times[0] < 1
+
+
+def test_metrics(metrics):
+    poller = Poller(timeout=0.1, interval=0.02, site="test:metrics")
+    list(poller)
+    with deadline(0.05):
+        list(Poller(timeout=5, interval=0.02, site="test:metrics"))
+    for w in Poller(timeout=5, interval=0.02, site="test:metrics"):
+        break
+
+    del poller, w
+    gc.collect()
+    stats = metrics.summary()["test:metrics"]
+    assert stats["calls"] == 3
+    assert stats["outcomes"] == {"timeout": 1, "deadline": 1, "completed": 1}
+    assert stats["attempts"] > 3
+    assert stats["waited"] > 0.1
+
+
+def test_retry(metrics):
+    calls = []
+
+    @retry(ValueError, tries=4, delay=0.01)
+    def flaky():
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            raise ValueError("not yet")
+        return "done"
+
+    assert flaky() == "done"
+    assert len(calls) == 3
+
+    gc.collect()
+    stats = metrics.summary()[f"{__name__}:test_retry.<locals>.flaky"]
+    assert stats["attempts"] == 3
+
+
+def test_retry_gives_up():
+    calls = []
+
+    @retry(ValueError, tries=3, delay=0.01)
+    def failing():
+        calls.append(1)
+        raise ValueError("always")
+
+    with pytest.raises(ValueError):
+        failing()
+    assert len(calls) == 3
@@ -0,0 +1,99 @@
+import threading
+from time import sleep
+
+import pytest
+
+from utility.scheduler import SchedulerError, SuiteScheduler, is_concurrent
+
+
+def _suite(*tests):
+    return [{"test": test} for test in tests]
+
+
+class Recorder:
+    def __init__(self, delay=0.1, fail=()):
+        self.delay = delay
+        self.fail = fail
+        self.running = set()
+        self.overlaps = []
+        self.order = []
+        self._lock = threading.Lock()
+
+    def execute(self, test):
+        with self._lock:
+            if self.running:
+                self.overlaps.append((test["name"], sorted(self.running)))
+            self.running.add(test["name"])
+            self.order.append(test["name"])
+
+        sleep(self.delay)
+        with self._lock:
+            self.running.discard(test["name"])
+
+        status = "Failed" if test["name"] in self.fail else "Pass"
+        return {"name": test["name"], "status": status}, test.get("abort-on-fail")
+
+    @staticmethod
+    def skip(test, reason):
+        return {"name": test["name"], "status": "Skipped"}
+
+
+def test_is_concurrent():
+    assert not is_concurrent(_suite({"name": "a"}, {"name": "b"}))
+    assert is_concurrent(_suite({"name": "a"}, {"name": "b", "resources": []}))
+
+
+def test_sequential_by_default():
+    recorder = Recorder(delay=0.01)
+    tests = _suite({"name": "a"}, {"name": "b"}, {"name": "c"})
+    results = SuiteScheduler(tests).run(recorder.execute, recorder.skip)
+
+    assert [tc["name"] for tc in results] == ["a", "b", "c"]
+    assert recorder.overlaps == []
+
+
+def test_resources_and_barriers():
+    recorder = Recorder()
+    tests = _suite(
+        {"name": "deploy"},
+        {"name": "rbd", "resources": {"pools": ["rbd"]}},
+        {"name": "cephfs", "resources": ["pool:cephfs"]},
+        {"name": "rbd-2", "resources": ["pool:rbd"]},
+        {"name": "exclusive", "resources": {"exclusive": True}},
+        {"name": "other-group", "concurrency-group": "upgrade"},
+        {"name": "cleanup"},
+    )
+    results = SuiteScheduler(tests).run(recorder.execute, recorder.skip)
+
+    assert [tc["name"] for tc in results] == [t["test"]["name"] for t in tests]
+    assert recorder.order[0] == "deploy" and recorder.order[-1] == "cleanup"
+    overlapped = {name for name, _ in recorder.overlaps}
+    assert ("cephfs", ["rbd"]) in recorder.overlaps
+    assert overlapped <= {"cephfs", "rbd-2"}
+    assert ("rbd-2", ["rbd"]) not in recorder.overlaps
+
+
+def test_failed_dependency_is_skipped():
+    recorder = Recorder(delay=0.01, fail=("a",))
+    tests = _suite(
+        {"name": "a", "resources": ["pool:a"]},
+        {"name": "b", "depends-on": "a"},
+        {"name": "c", "depends-on": ["b"]},
+        {"name": "d", "resources": ["pool:d"]},
+    )
+    results = SuiteScheduler(tests).run(recorder.execute, recorder.skip)
+
+    assert [tc["status"] for tc in results] == ["Failed", "Skipped", "Skipped", "Pass"]
+
+
+def test_abort_on_fail():
+    recorder = Recorder(delay=0.01, fail=("b",))
+    tests = _suite({"name": "a"}, {"name": "b", "abort-on-fail": True}, {"name": "c"})
+    results = SuiteScheduler(tests).run(recorder.execute, recorder.skip)
+
+    assert [tc["name"] for tc in results] == ["a", "b"]
+
+
+def test_unknown_dependency():
+    with pytest.raises(SchedulerError):
+        SuiteScheduler(_suite({"name": "a", "depends-on": "b"}, {"name": "b"}))
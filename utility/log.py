@@ -2,6 +2,7 @@ import logging
 import logging.handlers
 import os
 import re
+import threading
 from copy import deepcopy
 from typing import Dict
 
@@ -14,6 +15,10 @@ LOG_FORMAT = (
 magna_server = "http://magna002.ceph.redhat.com"
 magna_url = f"{magna_server}/cephci-jenkins/"
 
+# Names of the test (and its parent) executed by the current thread when
+# tests run concurrently
+_test_context = threading.local()
+
 
 class LoggerInitializationException(Exception):
     """Exception raised for logger initialization errors."""
@@ -121,13 +126,39 @@ class Log(logging.Logger):
 
         log_format = logging.Formatter(self.log_format)
         full_log_name = f"{test_name}.log"
-        test_logfile = os.path.join(run_dir, full_log_name)
-        self._logger.info(f"Test logfile: {test_logfile}")
 
         if disable_console_log:
             self._logger.propagate = False
 
-        _handler = logging.FileHandler(test_logfile)
+        for _handler in self._file_handlers(test_name, run_dir):
+            self._logger.addHandler(_handler)
+
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(log_format)
+        console_handler.addFilter(pass_filter)
+        if not any(isinstance(h, logging.StreamHandler) for h in self._logger.handlers):
+            self._logger.addHandler(console_handler)
+
+        self._logger.debug("Completed log configuration")
+
+        return self._log_url(run_dir, full_log_name)
+
+    def _log_url(self, run_dir, file_name):
+        url_base = (
+            magna_url + run_dir.split("/")[-1]
+            if "/ceph/cephci-jenkins" in run_dir
+            else run_dir
+        )
+        return f"{url_base}/{file_name}"
+
+    def _file_handlers(self, test_name, run_dir):
+        """Returns the log and error file handlers of the test."""
+        pass_filter = SensitiveLogFilter(name="cephci_filter")
+        log_format = logging.Formatter(self.log_format)
+        test_logfile = os.path.join(run_dir, f"{test_name}.log")
+        self._logger.info(f"Test logfile: {test_logfile}")
+
         _handler = logging.handlers.RotatingFileHandler(
             test_logfile,
             maxBytes=10 * 1024 * 1024,  # Set the maximum log file size to 10 MB
@@ -135,7 +166,6 @@ class Log(logging.Logger):
         )
         _handler.setFormatter(log_format)
         _handler.addFilter(pass_filter)
-        self._logger.addHandler(_handler)
 
         # error file handler
         err_logfile = os.path.join(run_dir, f"{test_name}.err")
@@ -143,24 +173,42 @@ class Log(logging.Logger):
         _err_handler.setFormatter(log_format)
         _err_handler.setLevel(logging.ERROR)
         _err_handler.addFilter(pass_filter)
-        self._logger.addHandler(_err_handler)
 
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
-        console_handler.setFormatter(log_format)
-        console_handler.addFilter(pass_filter)
-        if not any(isinstance(h, logging.StreamHandler) for h in self._logger.handlers):
-            self._logger.addHandler(console_handler)
+        return [_handler, _err_handler]
 
-        url_base = (
-            magna_url + run_dir.split("/")[-1]
-            if "/ceph/cephci-jenkins" in run_dir
-            else run_dir
-        )
-        log_url = f"{url_base}/{full_log_name}"
-        self._logger.debug("Completed log configuration")
+    def add_test_logger(self, test_name, run_dir, parent=None):
+        """Adds the file handlers of a test executing concurrently with others.
+
+        The calling thread is bound to the test and the handlers only receive
+        the records of threads bound to the test. Records of unbound threads,
+        like the ones spawned by the test itself, are written to every test log.
 
-        return log_url
+        Args:
+            test_name: name of the test being executed.
+            run_dir: directory where logs are being placed
+            parent: name of the test whose logs also receive the records
+
+        Returns:
+            tuple of the log URL and the handlers to be passed to remove_test_logger
+        """
+        if not os.path.isdir(run_dir):
+            return None, []
+
+        _test_context.test_names = (test_name, parent)
+        handlers = self._file_handlers(test_name, run_dir)
+        for _handler in handlers:
+            _handler.addFilter(TestLogFilter(test_name))
+            self._logger.addHandler(_handler)
+
+        return self._log_url(run_dir, f"{test_name}.log"), handlers
+
+    def remove_test_logger(self, handlers):
+        """Removes the handlers added by add_test_logger and unbinds the thread."""
+        for _handler in handlers:
+            _handler.close()
+            self._logger.removeHandler(_handler)
+
+        _test_context.test_names = None
 
     def close_and_remove_filehandlers(self):
         """Close FileHandlers and then remove them from the logger's handlers list."""
@@ -171,6 +219,18 @@ class Log(logging.Logger):
                 self._logger.removeHandler(handler)
 
 
+class TestLogFilter(logging.Filter):
+    """Passes the records of the threads bound to the test or to no test."""
+
+    def __init__(self, test_name):
+        super().__init__()
+        self.test_name = test_name
+
+    def filter(self, record):
+        test_names = getattr(_test_context, "test_names", None)
+        return not test_names or self.test_name in test_names
+
+
 class SensitiveLogFilter(logging.Filter):
     """Filter known sensitive data from being logged."""
 
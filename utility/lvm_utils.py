@@ -1,14 +1,32 @@
+def pvcreate_cmd(devices):
+    return "sudo pvcreate -ff %s" % devices
+
+
+def vgcreate_cmd(vg_name, devices):
+    return "sudo vgcreate %s %s" % (vg_name, devices)
+
+
+def lvcreate_cmd(lv_name, vg_name, size):
+    return "sudo lvcreate -n %s -l %s %s " % (lv_name, size, vg_name)
+
+
+def make_partition_cmd(device, start=None, end=None, gpt=False):
+    if gpt:
+        return "sudo parted --script %s mklabel gpt" % device
+    return "sudo parted --script %s mkpart primary %s %s" % (device, start, end)
+
+
 def pvcreate(osd, devices):
-    osd.exec_command(cmd="sudo pvcreate -ff %s" % devices)
+    osd.exec_command(cmd=pvcreate_cmd(devices))
 
 
 def vgcreate(osd, vg_name, devices):
-    osd.exec_command(cmd="sudo vgcreate %s %s" % (vg_name, devices))
+    osd.exec_command(cmd=vgcreate_cmd(vg_name, devices))
     return vg_name
 
 
 def lvcreate(osd, lv_name, vg_name, size):
-    osd.exec_command(cmd="sudo lvcreate -n %s -l %s %s " % (lv_name, size, vg_name))
+    osd.exec_command(cmd=lvcreate_cmd(lv_name, vg_name, size))
     return lv_name
 
 
@@ -43,13 +61,7 @@ def lvm_uncache(osd, vg_name):
 
 
 def make_partition(osd, device, start=None, end=None, gpt=False):
-    (
-        osd.exec_command(cmd="sudo parted --script %s mklabel gpt" % device)
-        if gpt
-        else osd.exec_command(
-            cmd="sudo parted --script %s mkpart primary %s %s" % (device, start, end)
-        )
-    )
+    osd.exec_command(cmd=make_partition_cmd(device, start, end, gpt))
 
 
 def osd_scenario1(osd, devices_dict, dmcrypt=False):
@@ -63,57 +75,30 @@ def osd_scenario1(osd, devices_dict, dmcrypt=False):
         generated scenario, dmcrypt
     """
 
-    pvcreate(osd, devices_dict.get("devices"))
-    vgname = vgcreate(
-        osd, osd.LvmConfig.vg_name % "1", devices_dict.get("devices")
-    )  # all /dev/vd{b,c,d,e}
-    data_lv1 = lvcreate(
-        osd,
-        osd.LvmConfig.data_lv % "1",
-        osd.LvmConfig.vg_name % "1",
-        osd.LvmConfig.size.format(20),
-    )
-    data_lv2 = lvcreate(
-        osd,
-        osd.LvmConfig.data_lv % "2",
-        osd.LvmConfig.vg_name % "1",
-        osd.LvmConfig.size.format(20),
-    )
-    data_lv3 = lvcreate(
-        osd,
-        osd.LvmConfig.data_lv % "3",
-        osd.LvmConfig.vg_name % "1",
-        osd.LvmConfig.size.format(20),
-    )
-    data_lv4 = lvcreate(
-        osd,
-        osd.LvmConfig.data_lv % "4",
-        osd.LvmConfig.vg_name % "1",
-        osd.LvmConfig.size.format(20),
-    )
-    db_lv1 = lvcreate(
-        osd,
-        osd.LvmConfig.db_lv % "1",
-        osd.LvmConfig.vg_name % "1",
-        osd.LvmConfig.size.format(8),
-    )
-    db_lv2 = lvcreate(
-        osd,
-        osd.LvmConfig.db_lv % "2",
-        osd.LvmConfig.vg_name % "1",
-        osd.LvmConfig.size.format(8),
-    )
-    wal_lv1 = lvcreate(
-        osd,
-        osd.LvmConfig.wal_lv % "1",
-        osd.LvmConfig.vg_name % "1",
-        osd.LvmConfig.size.format(2),
-    )
-    wal_lv2 = lvcreate(
-        osd,
-        osd.LvmConfig.wal_lv % "2",
-        osd.LvmConfig.vg_name % "1",
-        osd.LvmConfig.size.format(2),
+    vgname = osd.LvmConfig.vg_name % "1"
+    data_lv1, data_lv2, data_lv3, data_lv4 = [
+        osd.LvmConfig.data_lv % i for i in ("1", "2", "3", "4")
+    ]
+    db_lv1, db_lv2 = [osd.LvmConfig.db_lv % i for i in ("1", "2")]
+    wal_lv1, wal_lv2 = [osd.LvmConfig.wal_lv % i for i in ("1", "2")]
+    osd.exec_batch(
+        [
+            pvcreate_cmd(devices_dict.get("devices")),
+            vgcreate_cmd(vgname, devices_dict.get("devices")),  # all /dev/vd{b,c,d,e}
+        ]
+        + [
+            lvcreate_cmd(lv_name, vgname, osd.LvmConfig.size.format(size))
+            for lv_name, size in (
+                (data_lv1, 20),
+                (data_lv2, 20),
+                (data_lv3, 20),
+                (data_lv4, 20),
+                (db_lv1, 8),
+                (db_lv2, 8),
+                (wal_lv1, 2),
+                (wal_lv2, 2),
+            )
+        ]
     )
 
     scenario = (
@@ -167,12 +152,16 @@ def osd_scenario2(osd, devices_dict, dmcrypt=False):
     Returns:
         generated scenario, dmcrypt
     """
-    make_partition(osd, devices_dict.get("device1"), gpt=True)
-    make_partition(osd, devices_dict.get("device1"), "1", "80%")
-    make_partition(osd, devices_dict.get("device1"), "80%", "85%")
-    make_partition(osd, devices_dict.get("device1"), "85%", "90%")
-    make_partition(osd, devices_dict.get("device1"), "90%", "95%")
-    make_partition(osd, devices_dict.get("device1"), "95%", "100%")
+    osd.exec_batch(
+        [
+            make_partition_cmd(devices_dict.get("device1"), gpt=True),
+            make_partition_cmd(devices_dict.get("device1"), "1", "80%"),
+            make_partition_cmd(devices_dict.get("device1"), "80%", "85%"),
+            make_partition_cmd(devices_dict.get("device1"), "85%", "90%"),
+            make_partition_cmd(devices_dict.get("device1"), "90%", "95%"),
+            make_partition_cmd(devices_dict.get("device1"), "95%", "100%"),
+        ]
+    )
 
     scenario = (
         "{{'data':'{vdb1}','db':'{vdb2}','wal':'{vdb3}'}},"
@@ -218,32 +207,25 @@ def osd_scenario3(osd, devices_dict, dmcrypt=False):
     Returns:
         generated scenario, dmcrypt
     """
-    pvcreate(osd, devices_dict.get("devices"))
     devs = "{a} {b}".format(
         a=devices_dict.get("device0"), b=devices_dict.get("device2")
     )  # vdb vdd
-    vgname = vgcreate(osd, osd.LvmConfig.vg_name % "1", devs)
-    make_partition(osd, devices_dict.get("device3"), gpt=True)  # vde
-    make_partition(osd, devices_dict.get("device3"), "1", "80%")
-    make_partition(osd, devices_dict.get("device3"), "80%", "90%")
-    make_partition(osd, devices_dict.get("device3"), "90%", "100%")
-    data_lv1 = lvcreate(
-        osd,
-        osd.LvmConfig.data_lv % "1",
-        osd.LvmConfig.vg_name % "1",
-        osd.LvmConfig.size.format(80),
-    )
-    db_lv1 = lvcreate(
-        osd,
-        osd.LvmConfig.db_lv % "1",
-        osd.LvmConfig.vg_name % "1",
-        osd.LvmConfig.size.format(10),
-    )
-    wal_lv1 = lvcreate(
-        osd,
-        osd.LvmConfig.wal_lv % "1",
-        osd.LvmConfig.vg_name % "1",
-        osd.LvmConfig.size.format(10),
+    vgname = osd.LvmConfig.vg_name % "1"
+    data_lv1 = osd.LvmConfig.data_lv % "1"
+    db_lv1 = osd.LvmConfig.db_lv % "1"
+    wal_lv1 = osd.LvmConfig.wal_lv % "1"
+    osd.exec_batch(
+        [
+            pvcreate_cmd(devices_dict.get("devices")),
+            vgcreate_cmd(vgname, devs),
+            make_partition_cmd(devices_dict.get("device3"), gpt=True),  # vde
+            make_partition_cmd(devices_dict.get("device3"), "1", "80%"),
+            make_partition_cmd(devices_dict.get("device3"), "80%", "90%"),
+            make_partition_cmd(devices_dict.get("device3"), "90%", "100%"),
+            lvcreate_cmd(data_lv1, vgname, osd.LvmConfig.size.format(80)),
+            lvcreate_cmd(db_lv1, vgname, osd.LvmConfig.size.format(10)),
+            lvcreate_cmd(wal_lv1, vgname, osd.LvmConfig.size.format(10)),
+        ]
     )
     # To-Do remove disk name references like /vdb /vdd to avoid confusion when more disks are added
     scenario = (
@@ -0,0 +1,284 @@
+"""
+Adaptive polling engine used by the waiters and the retry decorator.
+
+A Poller is an iterable yielding an attempt at a time, it sleeps between the
+attempts. The first checks are made quickly and the delay grows exponentially,
+with jitter, up to the interval of the caller, hence a condition which becomes
+true early is noticed early while long waits do not poll more often than the
+caller asked for::
+
+    for w in Poller(timeout=600, interval=30):
+        if cluster_is_healthy():
+            break
+    if w.expired:
+        raise TimeoutError
+
+The waits of a thread are bounded by its deadline, run.py sets it from the
+timeout of the executing test and ceph.parallel hands it over to the tasks it
+spawns. Sleeping pollers can be woken up using wake(), e.g. when an event
+signalling a state change is received, so that the condition is checked
+immediately.
+
+Every poller is accounted to its call site in WAIT_METRICS i.e. the module and
+function which created it. run.py exports the summary of the run as JSON.
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from functools import wraps
+
+from utility.log import Log
+
+log = Log(__name__)
+
+DEFAULT_MIN_INTERVAL = 1
+DEFAULT_BACKOFF = 2
+DEFAULT_JITTER = 0.1
+
+# Modules whose frames are skipped when resolving the call site
+INTERNAL_MODULES = {__name__, "ceph.waiter", "cli.utilities.waiter", "utility.retry"}
+
+_context = threading.local()
+_pollers = weakref.WeakSet()
+_pollers_lock = threading.Lock()
+
+
+def call_site(depth=1):
+    """Returns module:function of the first caller outside the polling modules."""
+    frame = sys._getframe(depth)
+    while frame and frame.f_globals.get("__name__") in INTERNAL_MODULES:
+        frame = frame.f_back
+
+    if not frame:
+        return "unknown"
+
+    return f"{frame.f_globals.get('__name__')}:{frame.f_code.co_name}"
+
+
+def remaining():
+    """Returns the seconds left before the deadline of the thread, None if unbound."""
+    _deadline = getattr(_context, "deadline", None)
+    if _deadline is None:
+        return None
+
+    return max(_deadline - time.monotonic(), 0)
+
+
+@contextmanager
+def deadline(seconds):
+    """Bounds the waits of the calling thread to the given seconds.
+
+    A nested deadline can only be earlier than the enclosing one, None keeps
+    the enclosing deadline.
+    """
+    previous = getattr(_context, "deadline", None)
+    if seconds is not None:
+        _deadline = time.monotonic() + float(seconds)
+        _context.deadline = min(_deadline, previous or _deadline)
+
+    try:
+        yield
+    finally:
+        _context.deadline = previous
+
+
+def propagate(fun):
+    """Returns a callable executing fun under the deadline of the calling thread."""
+    _deadline = getattr(_context, "deadline", None)
+    if _deadline is None:
+        return fun
+
+    @wraps(fun)
+    def _run(*args, **kwargs):
+        previous = getattr(_context, "deadline", None)
+        _context.deadline = _deadline
+        try:
+            return fun(*args, **kwargs)
+        finally:
+            _context.deadline = previous
+
+    return _run
+
+
+def wake(site=None):
+    """Wakes up the sleeping pollers to check their condition immediately.
+
+    Args:
+        site (str): wake only the pollers whose call site contains the string
+    """
+    with _pollers_lock:
+        pollers = list(_pollers)
+
+    for poller in pollers:
+        if site is None or site in poller.site:
+            poller.wake()
+
+
+class WaitMetrics:
+    """Thread safe registry of the waits per call site."""
+
+    def __init__(self):
+        self._sites = dict()
+        self._lock = threading.Lock()
+
+    def record(self, site, attempts, waited, outcome):
+        """Accounts a completed wait.
+
+        Args:
+            site (str): module:function which waited
+            attempts (int): number of attempts
+            waited (float): seconds spent sleeping
+            outcome (str): completed, timeout or deadline
+        """
+        with self._lock:
+            stats = self._sites.setdefault(
+                site, {"calls": 0, "attempts": 0, "waited": 0.0, "outcomes": {}}
+            )
+            stats["calls"] += 1
+            stats["attempts"] += attempts
+            stats["waited"] = round(stats["waited"] + waited, 3)
+            stats["outcomes"][outcome] = stats["outcomes"].get(outcome, 0) + 1
+
+    def summary(self):
+        """Returns the statistics of the call sites, longest waits first."""
+        with self._lock:
+            sites = {site: dict(stats) for site, stats in self._sites.items()}
+
+        return dict(sorted(sites.items(), key=lambda x: x[1]["waited"], reverse=True))
+
+    def export(self, file_name):
+        """Writes the summary to the file."""
+        summary = self.summary()
+        if not summary:
+            return None
+
+        os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
+        with open(file_name, "w", encoding="utf-8") as metrics_file:
+            json.dump(summary, metrics_file, indent=2)
+
+        log.info(f"Wait metrics of {len(summary)} call sites written to {file_name}")
+        return file_name
+
+    def clear(self):
+        with self._lock:
+            self._sites = dict()
+
+
+WAIT_METRICS = WaitMetrics()
+
+
+def _record(stats):
+    if stats["attempts"]:
+        WAIT_METRICS.record(**stats)
+
+
+class Poller:
+    """A wait-retry loop as iterable with adaptive delays."""
+
+    def __init__(
+        self,
+        timeout=60,
+        interval=1,
+        min_interval=None,
+        backoff=DEFAULT_BACKOFF,
+        jitter=DEFAULT_JITTER,
+        site=None,
+    ):
+        """Initialize the poller.
+
+        Args:
+            timeout (float): seconds after which the poller expires.
+            interval (float): maximum delay between the attempts.
+            min_interval (float): delay before the second attempt.
+            backoff (float): multiplier of the delay after every attempt.
+            jitter (float): fraction of the delay randomly taken off.
+            site (str): call site accounted in the metrics.
+        """
+        self.timeout = timeout
+        self.interval = interval
+        self.min_interval = min(
+            interval, DEFAULT_MIN_INTERVAL if min_interval is None else min_interval
+        )
+        self.backoff = backoff
+        self.jitter = jitter
+        self.site = site or call_site(2)
+        self.expired = False
+        self._attempt = 0
+        self._start = None
+        self._expiry = None
+        self._by_deadline = False
+        self._wakeup = threading.Event()
+        self._stats = {
+            "site": self.site,
+            "attempts": 0,
+            "waited": 0.0,
+            "outcome": "completed",
+        }
+        weakref.finalize(self, _record, self._stats)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        now = time.monotonic()
+        if self._start is None:
+            self._start = now
+            self._expiry = now + self.timeout
+            _remaining = remaining()
+            if _remaining is not None and now + _remaining < self._expiry:
+                self._expiry = now + _remaining
+                self._by_deadline = True
+
+            with _pollers_lock:
+                _pollers.add(self)
+
+        if self._attempt != 0:
+            if self.expired or now >= self._expiry:
+                self._expire()
+
+            self._sleep(min(self.delay(), self._expiry - now))
+
+        self._attempt += 1
+        self._stats["attempts"] = self._attempt
+        return self
+
+    def _expire(self):
+        self.expired = True
+        self._stats["outcome"] = "deadline" if self._by_deadline else "timeout"
+
+        with _pollers_lock:
+            _pollers.discard(self)
+
+        raise StopIteration()
+
+    def _sleep(self, seconds):
+        _start = time.monotonic()
+        self._wakeup.wait(max(seconds, 0))
+        self._wakeup.clear()
+        self._stats["waited"] += time.monotonic() - _start
+
+    def delay(self):
+        """Returns the delay before the next attempt."""
+        _delay = min(
+            self.min_interval * self.backoff ** (self._attempt - 1), self.interval
+        )
+        return _delay * (1 - self.jitter * random.random())
+
+    def wake(self):
+        """Ends the current sleep, the next attempt is made immediately."""
+        self._wakeup.set()
+
+    @property
+    def elapsed(self):
+        """Seconds since the first attempt."""
+        return time.monotonic() - self._start if self._start else 0
+
+    @property
+    def attempts(self):
+        return self._attempt
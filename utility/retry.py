@@ -1,8 +1,8 @@
-import time
 import traceback
 from functools import wraps
 
 from utility.log import Log
+from utility.poll import Poller
 
 logger = Log(__name__)
 
@@ -16,13 +16,26 @@ def retry(exception_to_check, tries=4, delay=3, backoff=2):
         tries: number of times to try (not retry) before giving up
         delay: initial delay between retries in seconds
         backoff: backoff multiplier e.g. value of 2 will double the delay each retry
+
+    The delays are taken off by a random jitter and the retries stop at the
+    deadline of the executing test, the last try is then made immediately.
     """
 
     def deco_retry(f):
         @wraps(f)
         def f_retry(*args, **kwargs):
-            mtries, mdelay = tries, delay
-            while mtries > 1:
+            poller = Poller(
+                timeout=float("inf"),
+                interval=float("inf"),
+                min_interval=delay,
+                backoff=backoff,
+                site=f"{f.__module__}:{f.__qualname__}",
+            )
+            for attempt in poller:
+                if attempt.attempts >= tries:
+                    break
+
+                mdelay = delay * backoff ** (attempt.attempts - 1)
                 try:
                     return f(*args, **kwargs)
                 except exception_to_check as e:
@@ -47,7 +60,7 @@ def retry(exception_to_check, tries=4, delay=3, backoff=2):
                     logger.warning(
                         f"{caller_info} raised {exception_name}, "
                         f"Retrying in {mdelay} seconds... "
-                        f"(Attempt {tries - mtries + 1}/{tries})"
+                        f"(Attempt {attempt.attempts}/{tries})"
                     )
 
                     # Log full exception details at debug level
@@ -63,10 +76,6 @@ def retry(exception_to_check, tries=4, delay=3, backoff=2):
                         logger.debug(
                             f"Exception in {caller_info}: {exception_name} - {str(e)}"
                         )
-
-                    time.sleep(mdelay)
-                    mtries -= 1
-                    mdelay *= backoff
             return f(*args, **kwargs)
 
         return f_retry
@@ -0,0 +1,218 @@
+"""
+Dependency aware scheduler executing the tests of a suite concurrently.
+
+By default the tests of a suite execute one after the other. A suite test can
+opt into concurrent execution using the below keys, the scheduler then runs it
+alongside the other tests which it does not conflict with.
+
+    depends-on (str | list)         Names of the preceding tests which must be
+                                    completed. When a dependency fails or is
+                                    skipped, the test is skipped.
+    resources (list | dict)         Cluster resources used by the test, tests
+                                    sharing a resource never overlap. Either a
+                                    list like ["pool:rbd", "host:node1"] or a
+                                    dict with pools, hosts, daemons lists and
+                                    the exclusive flag.
+    concurrency-group (str)         Tests overlap only with the tests of the
+                                    same group, "default" when not provided.
+
+A resource named "exclusive" makes the test run alone. A test without any of
+the keys is a barrier: it starts after all the preceding tests complete and
+the tests following it start after it completes, which is the sequential
+behaviour. Tests destroying or recreating the cluster are always barriers.
+
+Example::
+
+    tests:
+      - test:
+          name: deploy cluster
+          module: test_cephadm.py
+      - test:
+          name: rbd pool tests
+          module: test_rbd.py
+          resources:
+            pools: [rbd]
+          concurrency-group: io
+      - test:
+          name: cephfs tests
+          module: test_cephfs.py
+          resources: ["pool:cephfs.data", "daemon:mds"]
+          concurrency-group: io
+      - test:
+          name: rbd mirror checks
+          module: test_mirror.py
+          depends-on: rbd pool tests
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utility.log import Log
+
+log = Log(__name__)
+
+SCHEDULING_KEYS = ("depends-on", "resources", "concurrency-group")
+BARRIER_KEYS = ("destroy-cluster", "recreate-cluster")
+DEFAULT_GROUP = "default"
+DEFAULT_MAX_WORKERS = 4
+
+
+class SchedulerError(Exception):
+    """The suite cannot be scheduled."""
+
+    pass
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _resources(value):
+    """Returns the set of resource identifiers declared by the test."""
+    if not isinstance(value, dict):
+        return set(_as_list(value))
+
+    resources = set()
+    for kind in ("pools", "hosts", "daemons"):
+        resources.update(f"{kind[:-1]}:{item}" for item in _as_list(value.get(kind)))
+
+    if value.get("exclusive"):
+        resources.add("exclusive")
+
+    return resources
+
+
+def is_concurrent(tests):
+    """Returns True when a test of the suite uses the scheduling keys."""
+    return any(key in test.get("test", {}) for test in tests for key in SCHEDULING_KEYS)
+
+
+class SuiteTest:
+    """A test of the suite and its scheduling constraints."""
+
+    def __init__(self, index, test):
+        self.index = index
+        self.test = test
+        self.name = test.get("name")
+        self.barrier = not any(key in test for key in SCHEDULING_KEYS) or any(
+            test.get(key) for key in BARRIER_KEYS
+        )
+        self.resources = _resources(test.get("resources"))
+        self.group = test.get("concurrency-group", DEFAULT_GROUP)
+
+        # Explicit dependencies must pass, implicit ones only need to complete
+        self.requires = set()
+        self.after = set()
+
+    def conflicts(self, other):
+        """Returns True when the tests must not execute at the same time."""
+        if self.barrier or other.barrier:
+            return True
+
+        if "exclusive" in self.resources or "exclusive" in other.resources:
+            return True
+
+        return self.group != other.group or bool(self.resources & other.resources)
+
+    def __repr__(self):
+        return f"SuiteTest({self.index}, {self.name})"
+
+
+class SuiteScheduler:
+    """Executes the suite tests honouring their dependencies and resources."""
+
+    def __init__(self, tests, max_workers=DEFAULT_MAX_WORKERS):
+        """Initialize the scheduler.
+
+        Args:
+            tests (list): suite tests i.e. the list of {"test": {...}} entries.
+            max_workers (int): maximum number of tests executing at a time.
+
+        Raises:
+            SchedulerError: when a test depends on an unknown or later test.
+        """
+        self.max_workers = max(int(max_workers), 1)
+        self.tests = [SuiteTest(idx, test["test"]) for idx, test in enumerate(tests)]
+
+        last_barrier = None
+        for suite_test in self.tests:
+            previous = self.tests[: suite_test.index]
+            if suite_test.barrier:
+                suite_test.after = {t.index for t in previous}
+                last_barrier = suite_test.index
+            elif last_barrier is not None:
+                suite_test.after = {last_barrier}
+
+            for name in _as_list(suite_test.test.get("depends-on")):
+                matches = [t.index for t in previous if t.name == name]
+                if not matches:
+                    raise SchedulerError(
+                        f"{suite_test.name} depends on {name} which is not a preceding test"
+                    )
+                suite_test.requires.add(matches[-1])
+
+            suite_test.after |= suite_test.requires
+
+    def run(self, execute, skip):
+        """Executes the tests.
+
+        Args:
+            execute (callable): called with the test dict, returns a tuple of
+                                the test case result and the abort flag.
+            skip (callable): called with the test dict and the reason, returns
+                             the test case result of a skipped test.
+
+        Returns:
+            list of test case results in the suite order, the tests remaining
+            after an abort are not included.
+        """
+        pending = list(self.tests)
+        running = dict()
+        results = dict()
+        completed = dict()  # index of the completed tests and if they passed
+        aborted = False
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for suite_test in list(pending) if not aborted else []:
+                    if not suite_test.after.issubset(completed):
+                        continue
+
+                    failed = [
+                        self.tests[idx].name
+                        for idx in suite_test.requires
+                        if not completed[idx]
+                    ]
+                    if failed:
+                        pending.remove(suite_test)
+                        reason = f"dependencies {', '.join(failed)} did not pass"
+                        log.info(f"Skipping {suite_test.name}, {reason}")
+                        results[suite_test.index] = skip(suite_test.test, reason)
+                        completed[suite_test.index] = False
+                        continue
+
+                    if len(running) >= self.max_workers or any(
+                        suite_test.conflicts(other) for other in running.values()
+                    ):
+                        continue
+
+                    pending.remove(suite_test)
+                    log.info(f"Scheduling {suite_test.name}")
+                    future = executor.submit(execute, suite_test.test)
+                    running[future] = suite_test
+
+                if not running:
+                    if pending and not aborted:
+                        raise SchedulerError(f"Unable to schedule {pending}")
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    suite_test = running.pop(future)
+                    tc, abort = future.result()
+                    results[suite_test.index] = tc
+                    completed[suite_test.index] = tc.get("status") == "Pass"
+                    aborted = aborted or abort
+
+        return [results[idx] for idx in sorted(results)]
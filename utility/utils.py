@@ -18,13 +18,7 @@ from typing import Any, Dict, Optional, Tuple
 
 import requests
 import yaml
-from cryptography import x509
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
-from cryptography.x509.oid import NameOID
 from jinja2 import Environment, FileSystemLoader, select_autoescape
-from jinja_markdown import MarkdownExtension
 from packaging.version import InvalidVersion, Version
 
 from cli.exceptions import ConfigError
@@ -1226,6 +1220,9 @@ def create_html_file(test_result) -> str:
     project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     template_dir = os.path.join(project_dir, "templates")
 
+    # Lazy import: markdown rendering is only needed for the result mail
+    from jinja_markdown import MarkdownExtension
+
     jinja_env = Environment(
         extensions=[MarkdownExtension],
         loader=FileSystemLoader(template_dir),
@@ -1407,6 +1404,9 @@ def generate_node_name(cluster_name, instance_name, run_id, node, role):
 
 def get_cephqe_ca() -> Tuple[Optional[Any], Optional[Any]]:
     """Retrieve CephCI QE CA certificate and key from the cloned configs repo."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import serialization
+
     try:
         repo_dict = get_cephci_config()["repos"]["rgw_configs"]
     except KeyError:
@@ -1468,6 +1468,12 @@ def generate_self_signed_certificate(subject: Dict) -> Tuple:
     Returns:
         device_key, device_cert, ca_cert   Tuple as strings
     """
+    from cryptography import x509
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+
     ca_key, ca_cert = get_cephqe_ca()
 
     # Generate the private key